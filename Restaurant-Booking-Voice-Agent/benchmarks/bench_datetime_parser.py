@@ -0,0 +1,68 @@
+"""Microbenchmark for the booking date/time parser.
+
+    python benchmarks/bench_datetime_parser.py [--number 20000]
+
+Reports the per-call cost of parse_booking_datetime for a mix of inputs,
+both warm (LRU cache hit, the common case within a call) and cold (cache
+cleared before every call), next to the strptime path it replaced.
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import datetime_parser
+from datetime_parser import parse_booking_datetime
+
+NOW = datetime(2025, 10, 8, 15, 0)
+
+CASES = [
+    ("2025-10-15", "19:00"),
+    ("10/15/2025", "19:00"),
+    ("tomorrow", "7pm"),
+    ("next Friday", "half past seven"),
+    ("October 15th", "seven o'clock"),
+    ("15. Oktober", "19 Uhr"),
+    ("morgen", "halb acht"),
+    ("nächsten Freitag", "um 7 abends"),
+]
+
+
+def _clear_caches() -> None:
+    datetime_parser._parse_date.cache_clear()
+    datetime_parser._parse_time.cache_clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    baseline = timeit.timeit(
+        lambda: datetime.strptime("2025-10-15 19:00", "%Y-%m-%d %H:%M"), number=args.number
+    )
+    print(f"{'strptime baseline':<40} {baseline / args.number * 1e6:8.2f} µs")
+
+    for date_text, time_text in CASES:
+        warm = timeit.timeit(
+            lambda d=date_text, t=time_text: parse_booking_datetime(d, t, now=NOW), number=args.number
+        )
+
+        def cold(d: str = date_text, t: str = time_text) -> None:
+            _clear_caches()
+            parse_booking_datetime(d, t, now=NOW)
+
+        cold_total = timeit.timeit(cold, number=args.number // 10)
+        label = f"{date_text!r} {time_text!r}"
+        print(
+            f"{label:<40} {warm / args.number * 1e6:8.2f} µs warm"
+            f" {cold_total / (args.number // 10) * 1e6:8.2f} µs cold"
+        )
+
+
+if __name__ == "__main__":
+    main()
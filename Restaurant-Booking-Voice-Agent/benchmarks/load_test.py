@@ -0,0 +1,252 @@
+"""Offline load test for the booking path.
+
+    python benchmarks/load_test.py [--sessions 200] [--concurrency 50]
+        [--airtable-latency 0.2] [--airtable-error-rate 0.05]
+        [--n8n-latency 0.3] [--n8n-error-rate 0.05] [--llm-latency 0.0]
+        [--repeat-rate 0.2] [--fail-p95-ms 250]
+
+Runs local stand-ins for Airtable and n8n (see standins.py), then drives
+`--sessions` RestaurantiaAgent sessions, `--concurrency` at a time, through
+an availability turn (check_availability, which holds the slot), a booking
+turn (book_table) and a goodbye turn (end_call) in text mode with a
+scripted LLM. No LiveKit server, OpenAI key or Airtable base is needed.
+With --repeat-rate, that share of sessions has the LLM repeat the booking
+call (as a retry would), which must not write a second row.
+
+Reports throughput, per-turn tail latency, the per-stage spans recorded by
+`tracing`, event-loop lag, and what reached the stand-ins after the outbox
+and webhook queues were drained. With --fail-p95-ms the script exits
+non-zero when the booking turn's p95 exceeds the budget.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents import AgentSession
+from scripted_llm import ScriptedLLM, ToolStep
+from standins import Faults, start_airtable, start_n8n
+
+import tracing
+from agent import RestaurantiaAgent
+from airtable_client import AsyncAirtableClient
+from booking_outbox import BookingOutbox
+from customers import CustomerDirectory
+from rate_limiter import SharedRateLimiter
+from reservation_ids import ReservationIdAllocator
+from slot_holds import SlotHolds
+from slot_index import SlotIndex
+from webhook_dispatcher import WebhookDispatcher
+
+TURNS = [
+    ("Is a table free then?", "check_availability"),
+    ("I'd like to book a table", "book_table"),
+    ("That's all, bye", "end_call"),
+]
+REPEAT_TURN = ("Did that go through? Please book it again", "book_table_repeat")
+
+
+def _steps(i: int, guests: int) -> list[ToolStep]:
+    # Spread bookings over four weeks of lunch and dinner slots
+    day = date.today() + timedelta(days=1 + i % 28)
+    minutes = 12 * 60 + (i // 28 % 16) * 30
+    booking = {
+        "customer_name": f"Guest {i}",
+        "date": day.isoformat(),
+        "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+        "guests": guests,
+        "special_requests": "",
+    }
+    return [
+        ToolStep("table free", "check_availability", {k: booking[k] for k in ("date", "time", "guests")}),
+        ToolStep("book a", "book_table", booking),
+        ToolStep("book it again", "book_table", booking),
+        ToolStep("bye", "end_call", {}),
+    ]
+
+
+async def _run_session(i: int, args: argparse.Namespace, resources: dict) -> bool:
+    confirmed = False
+    async with (
+        ScriptedLLM(_steps(i, args.guests), latency=args.llm_latency) as fake_llm,
+        AgentSession(llm=fake_llm) as session,
+    ):
+        await session.start(
+            RestaurantiaAgent(customer_phone=f"+49151{i:07d}", language="en", **resources)
+        )
+        turns = TURNS
+        if i < args.sessions * args.repeat_rate:
+            turns = [TURNS[0], TURNS[1], REPEAT_TURN, TURNS[2]]
+        for text, tool in turns:
+            started = time.perf_counter()
+            result = await session.run(user_input=text)
+            tracing.observe(f"turn.{tool}", time.perf_counter() - started)
+            if tool == "book_table":
+                confirmed = any(
+                    ev.type == "function_call_output" and "confirmed" in ev.item.output
+                    for ev in result.events
+                )
+    return confirmed
+
+
+async def _monitor_loop_lag(interval: float = 0.01) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        tracing.observe("event_loop.lag", time.perf_counter() - started - interval)
+
+
+def _row(stage: str) -> str | None:
+    p = tracing.REGISTRY.percentiles(stage)
+    if not p:
+        return None
+    return f"  {stage:<28} p50 {p[0.5] * 1000:8.2f}ms  p95 {p[0.95] * 1000:8.2f}ms  p99 {p[0.99] * 1000:8.2f}ms"
+
+
+async def main(args: argparse.Namespace) -> int:
+    airtable_api = await start_airtable(
+        Faults(args.airtable_latency, args.airtable_latency / 2, args.airtable_error_rate)
+    )
+    n8n_api = await start_n8n(Faults(args.n8n_latency, args.n8n_latency / 2, args.n8n_error_rate))
+    workdir = tempfile.mkdtemp(prefix="restaurantia-load-")
+
+    airtable = AsyncAirtableClient(
+        "bench-token",
+        "appBench",
+        "Order Summary",
+        api_url=airtable_api.url,
+        limiter=SharedRateLimiter("airtable-appBench", args.airtable_rate, directory=workdir),
+    )
+    outbox = BookingOutbox(
+        os.path.join(workdir, "outbox.db"), airtable, flush_interval=0.2, base_backoff=0.1, max_backoff=1
+    )
+    webhooks = WebhookDispatcher(
+        n8n_api.url,
+        base_backoff=0.05,
+        max_backoff=0.5,
+        dead_letter_path=os.path.join(workdir, "webhook_dead_letter.jsonl"),
+        limiter=SharedRateLimiter("n8n", args.n8n_rate, burst=5, directory=workdir),
+    )
+    slots = SlotIndex()
+    ids = ReservationIdAllocator(os.path.join(workdir, "reservation_ids.db"))
+    customers = CustomerDirectory(outbox)
+    holds = SlotHolds(slots, outbox.path, name="bench")
+    resources = {
+        "airtable": airtable, "outbox": outbox, "slots": slots, "holds": holds, "webhooks": webhooks, "ids": ids,
+        "customers": customers,
+    }
+    outbox.start()
+    slots.start(airtable, interval=5)
+    holds.start()
+    lag_monitor = asyncio.create_task(_monitor_loop_lag())
+
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(i: int) -> bool:
+        async with limit:
+            return await _run_session(i, args, resources)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(i) for i in range(args.sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    lag_monitor.cancel()
+    await holds.aclose()
+
+    drain_started = time.perf_counter()
+    pending = await outbox.drain(timeout=30)
+    await webhooks.drain(timeout=30)
+    drain_elapsed = time.perf_counter() - drain_started
+    await airtable.aclose()
+    await outbox.aclose()
+    await ids.aclose()
+    await airtable_api.close()
+    await n8n_api.close()
+
+    failures = [r for r in results if isinstance(r, BaseException)]
+    confirmed = sum(1 for r in results if r is True)
+    print(f"sessions      {args.sessions} ({args.concurrency} concurrent), {elapsed:.2f}s")
+    print(f"throughput    {args.sessions / elapsed:.1f} sessions/s, {confirmed} bookings confirmed")
+    if failures:
+        print(f"errors        {len(failures)} sessions raised, first: {failures[0]!r}")
+    print("latency")
+    stages = [
+        "turn.check_availability",
+        "turn.book_table",
+        "turn.book_table_repeat",
+        "turn.end_call",
+        "book_table",
+        "book_table.parse",
+        "book_table.capacity_check",
+        "book_table.allocate_id",
+        "book_table.journal",
+        "book_table.webhook_enqueue",
+        "airtable.batch_upsert",
+        "n8n.post",
+        "ratelimit.airtable-appBench",
+        "ratelimit.n8n",
+        "event_loop.lag",
+    ]
+    for stage in stages:
+        row = _row(stage)
+        if row:
+            print(row)
+    print(
+        f"slot holds    {holds.events['placed']} placed, {holds.events['converted']} converted, "
+        f"{holds.events['contended']} contended, {holds.events['expired']} expired"
+    )
+    dead_letters = os.path.join(workdir, "webhook_dead_letter.jsonl")
+    dead = 0
+    if os.path.exists(dead_letters):
+        with open(dead_letters) as f:
+            dead = sum(1 for _ in f)
+    print(f"drain         {drain_elapsed:.2f}s, {pending} reservations still pending")
+    print(
+        f"airtable      {len(airtable_api.received)} rows written, "
+        f"{airtable_api.requests} requests, {airtable_api.errors} injected errors"
+    )
+    print(
+        f"n8n           {len(n8n_api.received)} events, "
+        f"{n8n_api.requests} requests, {n8n_api.errors} injected errors, {dead} dead-lettered"
+    )
+
+    if failures:
+        return 1
+    if args.fail_p95_ms is not None:
+        p95_ms = tracing.REGISTRY.percentiles("turn.book_table").get(0.95, 0) * 1000
+        if p95_ms > args.fail_p95_ms:
+            print(f"FAIL: booking turn p95 {p95_ms:.1f}ms exceeds {args.fail_p95_ms}ms")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--guests", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per scripted LLM reply")
+    parser.add_argument("--airtable-latency", type=float, default=0.2)
+    parser.add_argument("--airtable-error-rate", type=float, default=0.0)
+    parser.add_argument("--n8n-latency", type=float, default=0.3)
+    parser.add_argument("--n8n-error-rate", type=float, default=0.0)
+    parser.add_argument("--airtable-rate", type=float, default=5, help="calls/s, 0 disables the limiter")
+    parser.add_argument("--n8n-rate", type=float, default=20, help="calls/s, 0 disables the limiter")
+    parser.add_argument("--repeat-rate", type=float, default=0.0, help="share of sessions that repeat book_table")
+    parser.add_argument("--fail-p95-ms", type=float, default=None)
+    parser.add_argument("--verbose", action="store_true", help="keep the agent's INFO logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("agent").setLevel(logging.WARNING)
+        # Deliveries cut off at the end of the drain show up as server-side resets
+        logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)
+    sys.exit(asyncio.run(main(args)))
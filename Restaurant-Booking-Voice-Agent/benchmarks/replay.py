@@ -0,0 +1,385 @@
+"""Replay recorded conversations against the agent, offline.
+
+    python benchmarks/replay.py benchmarks/transcripts [more files or dirs]
+        [--processes 4] [--concurrency 5] [--llm-latency 0.0]
+        [--baseline benchmarks/transcripts/baseline.json] [--write-baseline]
+        [--latency-tolerance 0.5] [--latency-floor-ms 5]
+
+Calls that went wrong on the phone (see agent_log.txt) could not be re-run,
+and tests/test_agent.py needs live inference. This drives RestaurantiaAgent
+in text mode through recorded calls instead: the user's words go in turn by
+turn, and a `ReplayLLM` issues the tool calls recorded for that turn, so
+every run takes the same path through the agent. Turns without recorded
+calls get the stub LLM's text reply. Airtable and n8n are the local
+stand-ins from standins.py.
+
+Transcripts are .jsonl files (or directories of them), one call per line:
+
+    {"id": "en-book", "language": "en", "phone": "+4915100000001",
+     "reservations": [{"date": "{day+1}", "time": "19:00", "guests": 38}],
+     "turns": [
+       {"user": "Table for four tomorrow at seven?",
+        "calls": [{"tool": "check_availability",
+                   "arguments": {"date": "{day+1}", "time": "19:00", "guests": 4}}],
+        "expect_output": "fully booked"}]}
+
+- `reservations` are already booked before the call starts; each call gets
+  its own slot index, so calls running side by side don't fill each other's
+  slots
+- `calls` are the LLM's recorded tool calls, issued in order
+- `expect` lists the tools that must run in the turn, in order (default:
+  the recorded calls), and `expect_output` text (or a list of texts) the
+  tool results must contain, ignoring case
+- `{day+N}` is today plus N days in the restaurant's timezone, and
+  `{reservation_id}` the last reservation ID a tool returned in this call
+
+Conversations are spread over `--processes` worker processes, each with its
+own stand-ins, `--concurrency` at a time. The report shows per-tool and
+per-turn latency percentiles and every turn whose tools or results were
+wrong. With --baseline, each turn's tools and results are compared with the
+stored run (dates and reservation IDs are normalized, so a baseline stays
+valid on later days) and tool p95 latencies more than --latency-tolerance
+above the baseline's are reported; --write-baseline stores this run instead.
+The script exits non-zero on wrong turns, baseline differences or latency
+regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents import AgentSession
+from scripted_llm import ReplayLLM, ToolStep
+from standins import start_airtable, start_n8n
+
+import tracing
+from agent import RestaurantiaAgent
+from airtable_client import AsyncAirtableClient
+from booking_outbox import BookingOutbox
+from customers import CustomerDirectory
+from datetime_parser import parse_booking_datetime, restaurant_now
+from reservation_ids import ALPHABET, ID_LENGTH, ReservationIdAllocator
+from slot_holds import SlotHolds
+from slot_index import CapacityRules, SlotIndex
+from webhook_dispatcher import WebhookDispatcher
+
+_DAY = re.compile(r"\{day\+(\d+)\}")
+_ID = re.compile(rf"\b[{ALPHABET}]{{{ID_LENGTH}}}\b")
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_US_DATE = re.compile(r"\b(\d{2})/(\d{2})/(\d{4})\b")
+
+
+@dataclass
+class TurnResult:
+    conversation: str
+    index: int
+    user: str
+    tools: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    latencies: list[tuple[str, float]] = field(default_factory=list)
+    seconds: float = 0.0
+    problems: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def record(self) -> dict:
+        """What the baseline keeps of this turn."""
+        return {"tools": self.tools, "outputs": self.outputs, "ok": self.ok}
+
+
+def load_transcripts(paths: list[str]) -> list[dict]:
+    files: list[Path] = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.jsonl")) if path.is_dir() else [path])
+    conversations = []
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    conversation = json.loads(line)
+                    conversation.setdefault("id", f"{file.stem}:{line_no}")
+                    conversations.append(conversation)
+    ids = [c["id"] for c in conversations]
+    duplicates = sorted({i for i in ids if ids.count(i) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate transcript ids: {', '.join(duplicates)}")
+    return conversations
+
+
+def _fill(value, today: date, reservation_id: str):
+    """Expand {day+N} and {reservation_id} in a transcript value."""
+    if isinstance(value, str):
+        value = _DAY.sub(lambda m: (today + timedelta(days=int(m.group(1)))).isoformat(), value)
+        return value.replace("{reservation_id}", reservation_id)
+    if isinstance(value, dict):
+        return {key: _fill(item, today, reservation_id) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, today, reservation_id) for item in value]
+    return value
+
+
+def normalize(text: str, today: date) -> str:
+    """Make a tool result comparable across days and runs."""
+
+    def day(year: str, month: str, dom: str) -> str:
+        try:
+            return f"{{day+{(date(int(year), int(month), int(dom)) - today).days}}}"
+        except ValueError:
+            return f"{year}-{month}-{dom}"
+
+    text = _ISO_DATE.sub(lambda m: day(m.group(1), m.group(2), m.group(3)), text)
+    text = _US_DATE.sub(lambda m: day(m.group(3), m.group(1), m.group(2)), text)
+    return _ID.sub("<ID>", text)
+
+
+def _slot_index(conversation: dict, today: date) -> SlotIndex:
+    slots = SlotIndex(CapacityRules())
+    for i, seed in enumerate(conversation.get("reservations", [])):
+        seed = _fill(seed, today, "")
+        start = parse_booking_datetime(seed["date"], seed["time"])
+        slots.add(f"seed:{i}", start.date(), start.hour * 60 + start.minute, int(seed["guests"]))
+    return slots
+
+
+async def replay_conversation(n: int, conversation: dict, resources: dict, llm_latency: float = 0.0) -> list[TurnResult]:
+    today = restaurant_now().date()
+    slots = _slot_index(conversation, today)
+    results = []
+    reservation_id = ""
+    async with (
+        ReplayLLM(latency=llm_latency) as replay_llm,
+        AgentSession(llm=replay_llm) as session,
+    ):
+        await session.start(
+            RestaurantiaAgent(
+                customer_name=conversation.get("customer_name"),
+                customer_phone=conversation.get("phone", f"+49151{n:07d}"),
+                language=conversation.get("language", "en"),
+                slots=slots,
+                holds=SlotHolds(slots, name=conversation["id"]),
+                **resources,
+            )
+        )
+        for index, turn in enumerate(conversation["turns"]):
+            turn = _fill(turn, today, reservation_id)
+            calls = turn.get("calls", [])
+            result = TurnResult(conversation["id"], index, turn["user"])
+            replay_llm.queue([ToolStep("", call["tool"], call.get("arguments", {})) for call in calls])
+            started = time.perf_counter()
+            try:
+                run = await session.run(user_input=turn["user"])
+            except Exception as e:
+                result.problems.append(f"raised {e!r}")
+                results.append(result)
+                break
+            result.seconds = time.perf_counter() - started
+
+            called = {}
+            for event in run.events:
+                if event.type == "function_call":
+                    called[event.item.call_id] = event.item
+                elif event.type == "function_call_output":
+                    output = event.item
+                    call = called.get(output.call_id)
+                    result.tools.append(output.name)
+                    result.outputs.append(normalize(output.output, today))
+                    if call is not None:
+                        result.latencies.append((output.name, output.created_at - call.created_at))
+                    if output.is_error:
+                        result.problems.append(f"{output.name} failed: {output.output}")
+                    reservation_id = next(iter(_ID.findall(output.output)[-1:]), reservation_id)
+
+            expected = turn.get("expect", [call["tool"] for call in calls])
+            if result.tools != expected:
+                result.problems.append(f"called {result.tools}, expected {expected}")
+            wanted = turn.get("expect_output", [])
+            for text in [wanted] if isinstance(wanted, str) else wanted:
+                if not any(text.lower() in output.lower() for output in result.outputs):
+                    result.problems.append(f"no tool result contains {text!r}")
+            results.append(result)
+    return results
+
+
+async def replay_all(conversations: list[tuple[int, dict]], concurrency: int, llm_latency: float) -> list[TurnResult]:
+    """Replay conversations in this process against its own stand-ins."""
+    airtable_api = await start_airtable()
+    n8n_api = await start_n8n()
+    workdir = tempfile.mkdtemp(prefix="restaurantia-replay-")
+    airtable = AsyncAirtableClient("replay-token", "appReplay", "Order Summary", api_url=airtable_api.url)
+    outbox = BookingOutbox(os.path.join(workdir, "outbox.db"), airtable, flush_interval=0.2)
+    webhooks = WebhookDispatcher(n8n_api.url, dead_letter_path=os.path.join(workdir, "webhook_dead_letter.jsonl"))
+    ids = ReservationIdAllocator(os.path.join(workdir, "reservation_ids.db"))
+    resources = {
+        "airtable": airtable, "outbox": outbox, "webhooks": webhooks, "ids": ids, "customers": CustomerDirectory(outbox),
+    }
+    outbox.start()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def bounded(n: int, conversation: dict) -> list[TurnResult]:
+        async with limit:
+            try:
+                return await replay_conversation(n, conversation, resources, llm_latency)
+            except Exception as e:
+                return [TurnResult(conversation["id"], 0, "", problems=[f"raised {e!r}"])]
+
+    try:
+        results = await asyncio.gather(*(bounded(n, c) for n, c in conversations))
+    finally:
+        await outbox.drain(timeout=5)
+        await webhooks.drain(timeout=5)
+        await airtable.aclose()
+        await outbox.aclose()
+        await ids.aclose()
+        await airtable_api.close()
+        await n8n_api.close()
+    return [turn for turns in results for turn in turns]
+
+
+def _quiet() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("agent").setLevel(logging.WARNING)
+    logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)
+
+
+def _worker(conversations: list[tuple[int, dict]], concurrency: int, llm_latency: float, quiet: bool) -> list[dict]:
+    if quiet:
+        _quiet()
+    return [asdict(turn) for turn in asyncio.run(replay_all(conversations, concurrency, llm_latency))]
+
+
+def run(conversations: list[dict], processes: int, concurrency: int, llm_latency: float = 0.0, quiet: bool = True) -> list[TurnResult]:
+    """Replay in `processes` worker processes (1 runs in this process)."""
+    numbered = list(enumerate(conversations))
+    if processes <= 1:
+        return asyncio.run(replay_all(numbered, concurrency, llm_latency))
+    chunks = [numbered[i::processes] for i in range(processes) if numbered[i::processes]]
+    # Spawned, not forked: each worker starts clean of the parent's threads and loop
+    with ProcessPoolExecutor(len(chunks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_worker, chunk, concurrency, llm_latency, quiet) for chunk in chunks]
+        turns = [TurnResult(**turn) for future in futures for turn in future.result()]
+    order = {c["id"]: n for n, c in numbered}
+    return sorted(turns, key=lambda t: (order[t.conversation], t.index))
+
+
+def latencies(turns: list[TurnResult]) -> tuple[tracing.LatencyRegistry, list[str]]:
+    """Per-tool and per-turn latencies of a run, and the stages in report order."""
+    registry = tracing.LatencyRegistry()
+    for turn in turns:
+        registry.observe("turn", turn.seconds)
+        for tool, seconds in turn.latencies:
+            registry.observe(tool, seconds)
+    return registry, [*sorted({tool for turn in turns for tool, _ in turn.latencies}), "turn"]
+
+
+def latency_p95_ms(turns: list[TurnResult]) -> dict[str, float]:
+    registry, stages = latencies(turns)
+    return {stage: round(registry.percentiles(stage).get(0.95, 0) * 1000, 2) for stage in stages}
+
+
+def baseline_of(turns: list[TurnResult]) -> dict:
+    conversations: dict[str, list[dict]] = {}
+    for turn in turns:
+        conversations.setdefault(turn.conversation, []).append(turn.record())
+    return {
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "conversations": conversations,
+        "latency_p95_ms": latency_p95_ms(turns),
+    }
+
+
+def diff_baseline(turns: list[TurnResult], baseline: dict, tolerance: float, floor_ms: float) -> list[str]:
+    """Differences from a stored run, one line each."""
+    current = baseline_of(turns)
+    lines = []
+    before, after = baseline["conversations"], current["conversations"]
+    for conversation in sorted(before.keys() - after.keys()):
+        lines.append(f"{conversation}: not replayed")
+    for conversation in sorted(after.keys() - before.keys()):
+        lines.append(f"{conversation}: not in baseline")
+    for conversation in sorted(before.keys() & after.keys()):
+        old, new = before[conversation], after[conversation]
+        if len(old) != len(new):
+            lines.append(f"{conversation}: {len(old)} turns -> {len(new)}")
+        for index, (was, now) in enumerate(zip(old, new)):
+            for key in ("tools", "outputs", "ok"):
+                if was[key] != now[key]:
+                    lines.append(f"{conversation}#{index} {key}: {was[key]!r} -> {now[key]!r}")
+    for stage, now_ms in current["latency_p95_ms"].items():
+        was_ms = baseline.get("latency_p95_ms", {}).get(stage)
+        if was_ms is not None and now_ms > was_ms * (1 + tolerance) and now_ms - was_ms > floor_ms:
+            lines.append(f"{stage} p95 {was_ms:.2f}ms -> {now_ms:.2f}ms")
+    return lines
+
+
+def _row(registry: tracing.LatencyRegistry, stage: str) -> str:
+    p = registry.percentiles(stage)
+    return f"  {stage:<28} p50 {p[0.5] * 1000:8.2f}ms  p95 {p[0.95] * 1000:8.2f}ms  p99 {p[0.99] * 1000:8.2f}ms"
+
+
+def main(args: argparse.Namespace) -> int:
+    conversations = load_transcripts(args.transcripts)
+    processes = max(1, min(args.processes, len(conversations)))
+    started = time.perf_counter()
+    turns = run(conversations, processes, args.concurrency, args.llm_latency, quiet=not args.verbose)
+    elapsed = time.perf_counter() - started
+
+    registry, stages = latencies(turns)
+    wrong = [turn for turn in turns if not turn.ok]
+    print(f"conversations {len(conversations)} in {processes} processes ({args.concurrency} concurrent each), {elapsed:.2f}s")
+    print(f"turns         {len(turns)}, {len(turns) - len(wrong)} correct")
+    print("latency")
+    for stage in stages:
+        print(_row(registry, stage))
+    if wrong:
+        print("wrong turns")
+        for turn in wrong:
+            print(f"  {turn.conversation}#{turn.index} {turn.user!r}: {'; '.join(turn.problems)}")
+
+    differences = []
+    if args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_of(turns), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"baseline      written to {args.baseline}")
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            differences = diff_baseline(turns, json.load(f), args.latency_tolerance, args.latency_floor_ms)
+        print(f"baseline      {len(differences)} differences from {args.baseline}")
+        for line in differences:
+            print(f"  {line}")
+    return 1 if wrong or differences else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcripts", nargs="+", help=".jsonl transcript files or directories of them")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=5, help="conversations at a time per process")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per replayed LLM reply")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare with (or write)")
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="allowed p95 growth, 0.5 = +50%%")
+    parser.add_argument("--latency-floor-ms", type=float, default=5.0, help="ignore p95 growth below this")
+    parser.add_argument("--verbose", action="store_true", help="keep the agent's INFO logs")
+    args = parser.parse_args()
+    if args.write_baseline and not args.baseline:
+        parser.error("--write-baseline needs --baseline")
+
+    if not args.verbose:
+        _quiet()
+    sys.exit(main(args))
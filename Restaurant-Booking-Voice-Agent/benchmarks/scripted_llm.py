@@ -0,0 +1,125 @@
+"""A deterministic stand-in LLM that answers from a script.
+
+The last item in the chat context decides the reply:
+
+- a user message containing one of the script's triggers produces that
+  trigger's tool call (e.g. "book" -> book_table(...)),
+- a tool result is acknowledged with a short text reply,
+- anything else gets `fallback` text.
+
+`ReplayLLM` instead issues the tool calls recorded for the current turn,
+one per request, in order; once they are used up it acknowledges the last
+tool result. The replay harness (replay.py) queues each turn's calls before
+sending the user's words.
+
+Replies are streamed after `latency` seconds, so sessions driven by it spend
+their time in the agent's own code and the stand-in services, not in
+inference.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from livekit.agents import llm
+from livekit.agents.types import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    APIConnectOptions,
+)
+
+
+@dataclass(frozen=True)
+class ToolStep:
+    trigger: str
+    tool: str
+    arguments: dict[str, Any]
+
+
+class ScriptedLLM(llm.LLM):
+    def __init__(
+        self,
+        steps: list[ToolStep],
+        *,
+        latency: float = 0.0,
+        fallback: str = "How can I help you?",
+    ) -> None:
+        super().__init__()
+        self.steps = steps
+        self.latency = latency
+        self.fallback = fallback
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list[llm.FunctionTool | llm.RawFunctionTool] | None = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        parallel_tool_calls=NOT_GIVEN,
+        tool_choice=NOT_GIVEN,
+        extra_kwargs=NOT_GIVEN,
+    ) -> ScriptedStream:
+        return ScriptedStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+    def reply_for(self, chat_ctx: llm.ChatContext) -> llm.ChoiceDelta:
+        last = chat_ctx.items[-1] if chat_ctx.items else None
+        if last is not None and last.type == "function_call_output":
+            return llm.ChoiceDelta(role="assistant", content=f"Done. {last.output}")
+        if last is not None and last.type == "message" and last.role == "user":
+            said = (last.text_content or "").lower()
+            for step in self.steps:
+                if step.trigger in said:
+                    call = llm.FunctionToolCall(
+                        name=step.tool,
+                        arguments=json.dumps(step.arguments),
+                        call_id=f"call_{uuid.uuid4().hex[:12]}",
+                    )
+                    return llm.ChoiceDelta(role="assistant", tool_calls=[call])
+        return llm.ChoiceDelta(role="assistant", content=self.fallback)
+
+
+class ReplayLLM(ScriptedLLM):
+    def __init__(self, *, latency: float = 0.0, fallback: str = "How can I help you?") -> None:
+        super().__init__([], latency=latency, fallback=fallback)
+        self.pending: deque[ToolStep] = deque()
+
+    def queue(self, calls: list[ToolStep]) -> None:
+        """Recorded calls for the next user turn; leftovers from the last turn are dropped."""
+        self.pending = deque(calls)
+
+    def reply_for(self, chat_ctx: llm.ChatContext) -> llm.ChoiceDelta:
+        last = chat_ctx.items[-1] if chat_ctx.items else None
+        answering = last is not None and (
+            last.type == "function_call_output" or (last.type == "message" and last.role == "user")
+        )
+        if answering and self.pending:
+            step = self.pending.popleft()
+            call = llm.FunctionToolCall(
+                name=step.tool,
+                arguments=json.dumps(step.arguments),
+                call_id=f"call_{uuid.uuid4().hex[:12]}",
+            )
+            return llm.ChoiceDelta(role="assistant", tool_calls=[call])
+        return super().reply_for(chat_ctx)
+
+
+class ScriptedStream(llm.LLMStream):
+    async def _run(self) -> None:
+        assert isinstance(self._llm, ScriptedLLM)
+        if self._llm.latency:
+            await asyncio.sleep(self._llm.latency)
+        request_id = f"scripted_{uuid.uuid4().hex[:12]}"
+        self._event_ch.send_nowait(
+            llm.ChatChunk(id=request_id, delta=self._llm.reply_for(self._chat_ctx))
+        )
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                id=request_id,
+                usage=llm.CompletionUsage(completion_tokens=0, prompt_tokens=0, total_tokens=0),
+            )
+        )
@@ -0,0 +1,135 @@
+"""Local stand-ins for the Airtable REST API and the n8n webhook.
+
+Both are plain aiohttp apps bound to 127.0.0.1 on a free port. Each takes a
+`Faults` describing injected latency (mean plus uniform jitter) and the
+share of requests answered with an error status, so the booking path can be
+exercised under slow or flaky dependencies without touching the real ones.
+
+Point the agent at them with AIRTABLE_API_URL and N8N_WEBHOOK_URL.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+
+@dataclass
+class Faults:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    async def apply(self) -> web.Response | None:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.json_response({"error": "injected"}, status=self.error_status)
+        return None
+
+
+@dataclass
+class StandIn:
+    runner: web.AppRunner
+    url: str
+    requests: int = 0
+    errors: int = 0
+    received: list[dict] = field(default_factory=list)
+
+    async def close(self) -> None:
+        await self.runner.cleanup()
+
+
+async def _serve(app: web.Application) -> tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+async def start_airtable(faults: Faults | None = None) -> StandIn:
+    """Serve list, create, upsert and delete for any base/table under `<url>/v0`."""
+    faults = faults or Faults()
+    records: dict[str, dict] = {}
+    app = web.Application()
+
+    async def write(request: web.Request) -> web.Response:
+        stand_in.requests += 1
+        failed = await faults.apply()
+        if failed is not None:
+            stand_in.errors += 1
+            return failed
+        body = await request.json()
+        merge_on = body.get("performUpsert", {}).get("fieldsToMergeOn", [])
+        written = []
+        for record in body.get("records", [{"fields": body.get("fields", {})}]):
+            fields = record["fields"]
+            key = "|".join(str(fields.get(name)) for name in merge_on) or f"rec{len(records)}"
+            existing = records.get(key)
+            record_id = existing["id"] if existing else f"rec{len(records):06d}"
+            records[key] = {"id": record_id, "fields": fields}
+            written.append(records[key])
+        stand_in.received.extend(r["fields"] for r in written)
+        if "records" not in body:
+            return web.json_response(written[0])
+        return web.json_response({"records": written})
+
+    async def delete(request: web.Request) -> web.Response:
+        stand_in.requests += 1
+        failed = await faults.apply()
+        if failed is not None:
+            stand_in.errors += 1
+            return failed
+        record_ids = set(request.query.getall("records[]", []))
+        for key in [key for key, record in records.items() if record["id"] in record_ids]:
+            del records[key]
+        return web.json_response({"records": [{"id": rid, "deleted": True} for rid in record_ids]})
+
+    async def list_records(request: web.Request) -> web.Response:
+        stand_in.requests += 1
+        failed = await faults.apply()
+        if failed is not None:
+            stand_in.errors += 1
+            return failed
+        # Filters are not evaluated; callers get every row
+        page_size = int(request.query.get("pageSize", "100"))
+        start = int(request.query.get("offset", "0"))
+        rows = list(records.values())
+        page: dict = {"records": rows[start : start + page_size]}
+        if start + page_size < len(rows):
+            page["offset"] = str(start + page_size)
+        return web.json_response(page)
+
+    app.router.add_get("/v0/{base}/{table}", list_records)
+    app.router.add_post("/v0/{base}/{table}", write)
+    app.router.add_patch("/v0/{base}/{table}", write)
+    app.router.add_delete("/v0/{base}/{table}", delete)
+    runner, url = await _serve(app)
+    stand_in = StandIn(runner, f"{url}/v0")
+    return stand_in
+
+
+async def start_n8n(faults: Faults | None = None) -> StandIn:
+    """Accept booking events at `<url>/webhook/restaurant-booking`."""
+    faults = faults or Faults()
+    app = web.Application()
+
+    async def webhook(request: web.Request) -> web.Response:
+        stand_in.requests += 1
+        failed = await faults.apply()
+        if failed is not None:
+            stand_in.errors += 1
+            return failed
+        body = await request.json()
+        stand_in.received.extend(body.get("events", [body]))
+        return web.json_response({"ok": True})
+
+    app.router.add_post("/webhook/restaurant-booking", webhook)
+    runner, url = await _serve(app)
+    stand_in = StandIn(runner, f"{url}/webhook/restaurant-booking")
+    return stand_in
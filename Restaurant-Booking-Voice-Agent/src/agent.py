@@ -1,12 +1,15 @@
-import logging
-import aiohttp
-import json
+from __future__ import annotations
+
+import time
+
+# Import times are part of the startup breakdown (see startup.py)
+_imports_started = time.perf_counter()
+
 import asyncio
+import json
+import logging
 import os
-import random
-import string
-from datetime import datetime, timedelta
-from pyairtable import Api
+from datetime import datetime
 
 from dotenv import load_dotenv
 from livekit.agents import (
@@ -21,31 +24,155 @@ from livekit.agents import (
     metrics,
 )
 from livekit.agents.llm import function_tool
-from livekit.plugins import noise_cancellation, silero, openai
+
+_livekit_imported = time.perf_counter()
+
+# Plugins register themselves with the worker on import, so they stay at module level
+from livekit.plugins import noise_cancellation, openai, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
-logger = logging.getLogger("agent")
-logging.basicConfig(level=logging.INFO)  # Add this for better debugging
+_plugins_imported = time.perf_counter()
 
+# Before the app modules read the environment, and before the log redactor does
 load_dotenv(".env.local")
 
+import tracing
+from airtable_client import AsyncAirtableClient
+from booking_dedupe import BookingDeduper, booking_key
+from booking_outbox import BookingOutbox
+from context_compaction import BookingState, ContextCompactor
+from customers import CustomerDirectory, CustomerProfile, normalize_phone
+from datetime_parser import parse_booking_datetime, restaurant_now
+from load_control import LoadMonitor, ProcessStatusWriter, publish_worker_pid
+from reservation_ids import ReservationIdAllocator
+from reservation_store import Reservation, ReservationNotFoundError, ReservationStore
+from restaurant_info import RestaurantInfo
+from slot_holds import Hold, SlotHolds
+from slot_index import CapacityRules, SlotIndex
+from startup import StartupTimer, process_started_at
+from structured_logging import bind_log_fields, configure_logging
+from tenants import TenantRegistry, TenantResources, UnknownTenantError
+from tts_cache import PhraseAudioCache
+from usage_ledger import OUTCOMES, SessionUsage, UsageLedger
+from webhook_dispatcher import WebhookDispatcher
+
+STARTUP = StartupTimer.from_env()
+STARTUP.record("import.livekit", _livekit_imported - _imports_started)
+STARTUP.record("import.plugins", _plugins_imported - _livekit_imported)
+STARTUP.record("import.app", time.perf_counter() - _plugins_imported)
+
+logger = logging.getLogger("agent")
+configure_logging()
+
 # Configuration from environment variables
 AIRTABLE_API_TOKEN = os.getenv("AIRTABLE_API_TOKEN")
 AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID", "app7SapLnw8VfBDjQ")
 AIRTABLE_TABLE_NAME = os.getenv("AIRTABLE_TABLE_NAME", "Order Summary")
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+# "booking" runs the built-in booking agent, "n8n" speaks replies from an n8n AI-agent workflow
+AGENT_MODE = os.getenv("AGENT_MODE", "booking").lower()
+# How long the first turn waits for the returning-caller lookup
+CUSTOMER_LOOKUP_TIMEOUT = float(os.getenv("CUSTOMER_LOOKUP_TIMEOUT", "0.5"))
+# How long a capacity answer waits for the slot index warm-up before reading the day directly
+SLOT_INDEX_WARM_TIMEOUT = float(os.getenv("SLOT_INDEX_WARM_TIMEOUT", "2"))
 
 # Debug logging
-logger.info(f"🔍 AIRTABLE_API_TOKEN: {'✅ Set' if AIRTABLE_API_TOKEN else '❌ Missing'}")
-logger.info(f"🔍 AIRTABLE_BASE_ID: {AIRTABLE_BASE_ID}")
-logger.info(f"🔍 AIRTABLE_TABLE_NAME: {AIRTABLE_TABLE_NAME}")
-logger.info(f"🔍 N8N_WEBHOOK_URL: {N8N_WEBHOOK_URL}")
+logger.info(
+    "🔍 Airtable token %s, base %s, table %s; n8n webhook %s",
+    "set" if AIRTABLE_API_TOKEN else "missing",
+    AIRTABLE_BASE_ID,
+    AIRTABLE_TABLE_NAME,
+    "set" if N8N_WEBHOOK_URL else "not set",
+)
+
+
+# Lines the agent says word for word; their audio is served from the TTS cache
+PHRASES = {
+    "en": {
+        "greeting": "Hi there! Welcome to Restaurantia. How can I help you today?",
+        "goodbye_booked": "Thank you for booking with us! We look forward to seeing you. Have a great day! Goodbye!",
+        "closing": "Thank you for calling! We look forward to seeing you. Goodbye!",
+        "save_failed": "I'm sorry, there was a technical issue saving your reservation. Please call us directly at our phone number to book.",
+        "bad_datetime": "I had trouble understanding the date or time format. Could you please provide the date (like October 15th or 10/15) and time (like 7 PM or 19:00)?",
+        "booking_error": "I encountered an error while making the reservation. Please try again or call us directly.",
+        "n8n_unavailable": "There was an internal error connecting to the booking system.",
+    },
+    "de": {
+        "greeting": "Hallo! Willkommen bei Restaurantia. Wie kann ich dir heute helfen?",
+        "goodbye_booked": "Danke für deine Buchung bei uns! Wir freuen uns auf dich. Einen schönen Tag noch! Auf Wiedersehen!",
+        "closing": "Danke für deinen Anruf! Wir freuen uns auf dich. Auf Wiedersehen!",
+        "save_failed": "Entschuldigung, es gab ein technisches Problem beim Speichern deiner Reservierung. Bitte rufe uns direkt an unter unserer Telefonnummer.",
+        "bad_datetime": "Ich hatte Schwierigkeiten, das Datums- oder Zeitformat zu verstehen. Bitte gib das Datum (wie 15. Oktober oder 10/15) und die Uhrzeit (wie 19 Uhr oder 19:00) an.",
+        "booking_error": "Ich bin auf einen Fehler bei der Reservierung gestoßen. Bitte versuche es erneut oder rufe uns an.",
+        "n8n_unavailable": "Es gab einen internen Fehler bei der Verbindung zum Buchungssystem.",
+    },
+}
+# Said by the agent itself rather than written by the LLM, so their audio can be cached
+SPOKEN_PHRASES = ("greeting", "goodbye_booked", "closing")
+FIXED_PHRASES = {
+    language: [phrases[key] for key in SPOKEN_PHRASES] for language, phrases in PHRASES.items()
+}
+
+
+def _name_key(name: str | None) -> str:
+    return " ".join((name or "").casefold().split())
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
 
 class RestaurantiaAgent(Agent):
-    def __init__(self, customer_name: str = None, customer_phone: str = None, language: str = "en") -> None:
+    def __init__(
+        self,
+        customer_name: str | None = None,
+        customer_phone: str | None = None,
+        language: str = "en",
+        airtable: AsyncAirtableClient | None = None,
+        outbox: BookingOutbox | None = None,
+        slots: SlotIndex | None = None,
+        webhooks: WebhookDispatcher | None = None,
+        tts_cache: PhraseAudioCache | None = None,
+        restaurant_name: str = "Restaurantia",
+        instructions: dict | None = None,
+        tts_voice: str = TTS_VOICE,
+        ids: ReservationIdAllocator | None = None,
+        customers: CustomerDirectory | None = None,
+        caller: asyncio.Task | None = None,
+        reservations: ReservationStore | None = None,
+        info: RestaurantInfo | None = None,
+        holds: SlotHolds | None = None,
+    ) -> None:
         self.customer_name = customer_name or None
         self.customer_phone = customer_phone or "Unknown"
         self.language = language.lower()
+        self.airtable = airtable or AsyncAirtableClient.from_env()
+        self.outbox = outbox or BookingOutbox.from_env(self.airtable)
+        self.slots = slots or SlotIndex(CapacityRules.from_env())
+        self.holds = holds if holds is not None else SlotHolds.from_env(self.slots, path=self.outbox.path)
+        # Seats held for this caller since their last successful availability check
+        self.hold: Hold | None = None
+        self.webhooks = webhooks or WebhookDispatcher.from_env()
+        self.ids = ids or ReservationIdAllocator.from_env()
+        self.customers = customers or CustomerDirectory.from_env(self.outbox, self.airtable)
+        self.caller = caller
+        self.reservations = reservations or ReservationStore(self.outbox, self.slots, self.holds)
+        # Reservations this caller made or proved are theirs, by ID
+        self.owned: set[str] = set()
+        self.info = info or RestaurantInfo.from_env()
+        self.tts_cache = tts_cache
+        self.tts_voice = tts_voice
+        self.bookings = BookingDeduper.from_env()
+        self.booking_state = BookingState()
+        # What the call achieved, for the usage ledger
+        self.outcome = "none"
+        self.booked = 0
+        self.context = ContextCompactor.from_env()
+        self.phrases = {
+            key: phrase.replace("Restaurantia", restaurant_name)
+            for key, phrase in PHRASES["de" if self.language == "de" else "en"].items()
+        }
         
         en_instructions = """You are Restaurantia – a friendly AI assistant for a restaurant.
 
@@ -56,7 +183,7 @@ When speaking:
 - Listen first, don't push - let the conversation flow naturally
 
 Your approach:
-- Start with a warm greeting: "Hi there! Welcome to Restaurantia. How can I help you today?"
+- The call opens with a greeting that is played for you: "Hi there! Welcome to Restaurantia. How can I help you today?" - don't greet again
 - Be friendly and welcoming
 - DON'T immediately assume they want a reservation
 - They might be calling to:
@@ -67,24 +194,33 @@ Your approach:
   * Just have questions
   * Or yes, make a reservation
 - Feel the conversation flow and respond to what THEY want
+- For questions about opening hours, the menu, prices, allergens, specials or directions, use the lookup_restaurant_info function and answer in one or two short sentences from what it returns; if it has no answer, say so instead of guessing
 
 Only if they mention wanting to book, reserve, or get a table:
 - Ask for their name if you don't have it
 - Then naturally guide them through: date, time, number of guests
 - Ask casually: "Will you be joining us for breakfast, lunch, dinner, or just coffee?"
+- Once you know the date, time and number of guests, use the check_availability function
+- If the slot is full, offer the suggested alternative times
 - Confirm all details before booking
 - Use the book_table function to create the reservation
 - Confirm with a friendly summary
 
+If they want to check, change or cancel a reservation they already have:
+- Use the find_reservation function, with their reservation ID if they have it and the name it was booked under
+- Make sure you both mean the same reservation and confirm what should change
+- Use modify_reservation to change the date, time or number of guests, or cancel_reservation to cancel it
+
 IMPORTANT - Call Ending:
 - After the reservation is successfully created and confirmed, end the call professionally
-- Say something like: "Thank you for booking with us! We look forward to seeing you. Have a great day! Goodbye!"
-- Then call the end_call function to gracefully disconnect
+- Call the end_call function; it says goodbye for you ("Thank you for booking with us! We look forward to seeing you. Have a great day! Goodbye!")
 - Do NOT continue the conversation after booking is confirmed
 
 Your capabilities:
-- Answer general questions about the restaurant
+- Answer general questions about the restaurant (using lookup_restaurant_info function)
+- Check free tables (using check_availability function)
 - Help with reservations when needed (using book_table function)
+- Look up, change and cancel existing reservations (using find_reservation, modify_reservation and cancel_reservation)
 - End calls after reservation completion (using end_call function)
 - Provide helpful information
 - Be genuinely helpful, not pushy
@@ -106,7 +242,7 @@ Beim Sprechen:
 - Zuhören zuerst, nicht drängen - lass das Gespräch natürlich fließen
 
 Dein Ansatz:
-- Beginne mit einer warmen Begrüßung: "Hallo! Willkommen bei Restaurantia. Wie kann ich dir heute helfen?"
+- Der Anruf beginnt mit einer Begrüßung, die für dich abgespielt wird: "Hallo! Willkommen bei Restaurantia. Wie kann ich dir heute helfen?" - begrüße nicht noch einmal
 - Sei freundlich und gastfreundlich
 - Nimm NICHT sofort an, dass sie einen Tisch reservieren möchten
 - Sie könnten anrufen, um:
@@ -117,24 +253,33 @@ Dein Ansatz:
   * Nur Fragen zu haben
   * Oder ja, einen Tisch zu reservieren
 - Spüre den Gesprächsverlauf und reagiere auf das, was SIE möchten
+- Bei Fragen zu Öffnungszeiten, Speisekarte, Preisen, Allergenen, Tagesgerichten oder Anfahrt nutze die lookup_restaurant_info Funktion und antworte in ein bis zwei kurzen Sätzen mit dem, was sie liefert; hat sie keine Antwort, sag das, statt zu raten
 
 Nur wenn sie erwähnen, buchen, reservieren oder einen Tisch möchten:
 - Frag nach ihrem Namen, wenn du ihn nicht hast
 - Führe sie dann natürlich durch: Datum, Uhrzeit, Anzahl der Gäste
 - Frag beiläufig: "Kommst du zum Frühstück, Mittagessen, Abendessen oder nur für einen Kaffee zu uns?"
+- Sobald Datum, Uhrzeit und Anzahl der Gäste bekannt sind, nutze die check_availability Funktion
+- Wenn der Zeitpunkt ausgebucht ist, biete die vorgeschlagenen Alternativen an
 - Bestätige alle Details vor der Buchung
 - Nutze die book_table Funktion, um die Reservierung zu erstellen
 - Bestätige mit einer freundlichen Zusammenfassung
 
+Wenn sie eine bestehende Reservierung prüfen, ändern oder stornieren möchten:
+- Nutze die find_reservation Funktion, mit ihrer Reservierungs-ID, falls sie sie haben, und dem Namen, auf den gebucht wurde
+- Stell sicher, dass ihr dieselbe Reservierung meint, und bestätige, was sich ändern soll
+- Nutze modify_reservation, um Datum, Uhrzeit oder Gästezahl zu ändern, oder cancel_reservation zum Stornieren
+
 WICHTIG - Anruf Beendigung:
 - Nach erfolgreicher Reservierungserstellung und Bestätigung den Anruf professionell beenden
-- Sag etwas wie: "Danke für deine Buchung bei uns! Wir freuen uns auf dich. Einen schönen Tag noch! Auf Wiedersehen!"
-- Dann die end_call Funktion aufrufen, um die Verbindung ordnungsgemäß zu unterbrechen
+- Ruf die end_call Funktion auf; sie verabschiedet sich für dich ("Danke für deine Buchung bei uns! Wir freuen uns auf dich. Einen schönen Tag noch! Auf Wiedersehen!")
 - NICHT nach bestätigter Buchung das Gespräch fortsetzen
 
 Deine Fähigkeiten:
-- Beantworte allgemeine Fragen zum Restaurant
+- Beantworte allgemeine Fragen zum Restaurant (mit der lookup_restaurant_info Funktion)
+- Prüfe freie Tische (mit der check_availability Funktion)
 - Hilf bei Reservierungen bei Bedarf (mit der book_table Funktion)
+- Finde, ändere und storniere bestehende Reservierungen (mit find_reservation, modify_reservation und cancel_reservation)
 - Beende Anrufe nach erfolgreicher Reservierungserstellung (mit der end_call Funktion)
 - Bereitstellung hilfreicher Informationen
 - Sei wirklich hilfreich, nicht aufdringlich
@@ -147,10 +292,139 @@ Denke daran:
 - Wenn der Kunde eine Reservierung machen möchte, frag zuerst nach seinem Namen, dann collect Buchungsdetails
 - IMMER den Anruf nach erfolgreicher Buchung beenden"""
 
+        # Tenants may replace the persona outright or just rename the restaurant
+        custom = (instructions or {}).get("de" if self.language == "de" else "en")
         instructions = de_instructions if self.language == "de" else en_instructions
+        instructions = custom or instructions.replace("Restaurantia", restaurant_name)
         
         super().__init__(instructions=instructions)
 
+    async def on_enter(self) -> None:
+        self._say("greeting")
+        # The lookup started with the call; wait only briefly so a slow disk never delays the first reply
+        caller = self.caller or self.customers.prefetch(self.customer_phone)
+        try:
+            with tracing.span("customer_lookup"):
+                profile: CustomerProfile | None = await asyncio.wait_for(
+                    asyncio.shield(caller), timeout=CUSTOMER_LOOKUP_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Caller lookup took longer than %.1fs, continuing without it", CUSTOMER_LOOKUP_TIMEOUT)
+            return
+        except Exception as e:
+            logger.warning("⚠️ Caller lookup failed: %s", e)
+            return
+        if profile is None:
+            return
+        logger.info("👋 Returning caller %s (%s earlier bookings)", profile.name, len(profile.bookings))
+        self.customer_name = self.customer_name or profile.name
+        self.booking_state.update(customer_name=self.customer_name)
+        await self.update_instructions(self.instructions + profile.context_note(self.language))
+
+    async def on_exit(self) -> None:
+        # Confirmations are only reused within this call
+        self.bookings.clear()
+        await self.holds.release(self.hold)
+        self.hold = None
+        self.context.report()
+
+    def llm_node(self, chat_ctx, tools, model_settings):
+        # Past the token budget, older turns give way to a summary of the booking so far
+        chat_ctx = self.context.compact(chat_ctx, self.booking_state, self.language)
+        return Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+
+    def _say(self, key: str):
+        # Fixed phrases are spoken from the TTS cache when it has them
+        text = self.phrases[key]
+        tts = self.session.tts
+        if self.tts_cache is None or tts is None:
+            return self.session.say(text)
+
+        async def synthesize(text: str):
+            async with tts.synthesize(text) as stream:
+                async for audio in stream:
+                    yield audio.frame
+
+        return self.session.say(
+            text, audio=self.tts_cache.speak(self.tts_voice, self.language, text, synthesize)
+        )
+
+    def _record_outcome(self, outcome: str) -> None:
+        if OUTCOMES.index(outcome) > OUTCOMES.index(self.outcome):
+            self.outcome = outcome
+
+    async def _slots_ready(self, day) -> None:
+        # Capacity answers must not come from an index Airtable has not filled yet
+        try:
+            with tracing.span("slot_index.ready"):
+                await self.slots.ready(day, SLOT_INDEX_WARM_TIMEOUT)
+        except Exception as e:
+            logger.warning("⚠️ Could not read %s from Airtable, answering from local bookings: %s", day, e)
+
+    def _slot_alternatives(self, start_datetime: datetime, guests: int) -> str:
+        suggestions = self.slots.suggest(start_datetime.date(), start_datetime.hour * 60 + start_datetime.minute, guests)
+        return ", ".join(format_minutes(m) for m in suggestions)
+
+    @function_tool
+    async def lookup_restaurant_info(self, question: str):
+        """Look up facts about the restaurant: opening hours, menu items, prices, allergens, specials, address and directions.
+
+        Args:
+            question: What the customer wants to know, in their words (e.g. "open on Sunday", "vegan dishes", "was kostet das Tiramisu")
+        """
+        with tracing.span("lookup_restaurant_info"):
+            await self.info.refresh()
+            snippets = self.info.lookup(question, self.language)
+        logger.info("📖 Info lookup %r: %s snippets", question, len(snippets))
+        if snippets:
+            return " ".join(snippets)
+        if self.language == "de":
+            return "Dazu habe ich keine Informationen. Sag das dem Gast ehrlich und biete an, dass das Restaurant zurückruft."
+        return "I don't have information on that. Tell the customer honestly and offer a call back from the restaurant."
+
+    @function_tool
+    async def check_availability(self, date: str, time: str, guests: int):
+        """Check whether a table is free for the given date, time and party size.
+        
+        Use this as soon as the customer has given a date, time and number of guests, before booking.
+        
+        Args:
+            date: Date as YYYY-MM-DD, or as the customer said it (e.g. 2025-10-15, "tomorrow", "next Friday", "15. Oktober")
+            time: Time as HH:MM, or as the customer said it (e.g. 19:00, "7pm", "half past seven", "19 Uhr")
+            guests: Number of guests (1-20)
+        """
+        with tracing.span("check_availability"):
+            try:
+                start_datetime = parse_booking_datetime(date, time)
+            except ValueError as e:
+                logger.error("❌ Date/time parsing error: %s", e)
+                if self.language == "de":
+                    return "Ich konnte das Datum oder die Uhrzeit nicht verstehen. Bitte nenne beides noch einmal."
+                return "I couldn't understand that date or time. Could you say both again?"
+
+            minutes = start_datetime.hour * 60 + start_datetime.minute
+            time = start_datetime.strftime("%H:%M")
+            self.booking_state.update(date=start_datetime.strftime("%Y-%m-%d"), time=time, guests=guests)
+            await self._slots_ready(start_datetime.date())
+            # Keep the seats for this caller until they book, so nobody else takes them meanwhile
+            await self.holds.release(self.hold)
+            self.hold = await self.holds.place(start_datetime.date(), minutes, guests)
+            if self.hold is not None:
+                logger.info("📅 Slot available and held: %s %s for %s", date, time, guests)
+                if self.language == "de":
+                    return f"Ja, am {start_datetime.strftime('%m/%d/%Y')} um {time} Uhr ist ein Tisch für {guests} Personen frei."
+                return f"Yes, a table for {guests} is available on {start_datetime.strftime('%m/%d/%Y')} at {time}."
+
+            alternatives = self._slot_alternatives(start_datetime, guests)
+            logger.info("📅 Slot full: %s %s for %s, alternatives: %s", date, time, guests, alternatives or "none")
+            if self.language == "de":
+                if alternatives:
+                    return f"Um {time} Uhr ist leider nichts frei. Freie Zeiten an diesem Tag: {alternatives}."
+                return "An diesem Tag ist leider kein Tisch mehr frei. Möchtest du einen anderen Tag probieren?"
+            if alternatives:
+                return f"Sorry, {time} is fully booked. Free times that day: {alternatives}."
+            return "Sorry, we're fully booked that day. Would you like to try another day?"
+
     @function_tool
     async def book_table(
         self,
@@ -166,134 +440,335 @@ Denke daran:
         
         Args:
             customer_name: The customer's name
-            date: Date in format YYYY-MM-DD or M/D/YYYY (e.g. 2025-10-15 or 10/15/2025)
-            time: Time in HH:MM format (e.g., 19:00 for 7pm)
+            date: Date as YYYY-MM-DD, or as the customer said it (e.g. 2025-10-15, "tomorrow", "next Friday", "15. Oktober")
+            time: Time as HH:MM, or as the customer said it (e.g. 19:00, "7pm", "half past seven", "19 Uhr")
             guests: Number of guests (1-20)
             special_requests: Any special requests like "coffee and pastries", "lunch reservation", "birthday dinner", etc.
         """
-        logger.info(f"🎯 BOOKING STARTED: {customer_name}, {date}, {time}, {guests} guests")
+        with tracing.span("book_table"):
+            logger.info("🎯 BOOKING STARTED: %s, %s, %s, %s guests", customer_name, date, time, guests)
         
-        try:
-            # Parse date and time
-            start_datetime = None
-            if "-" in date:
-                start_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
-            else:
-                start_datetime = datetime.strptime(f"{date} {time}", "%m/%d/%Y %H:%M")
-            
-            # Convert date to M/D/YYYY format for Airtable
-            airtable_date = start_datetime.strftime("%m/%d/%Y")
-            
-            # Generate unique 5-character Reservation ID
-            reservation_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
-            
-            logger.info(f"📅 Parsed date: {airtable_date}, Reservation ID: {reservation_id}")
-            
-            # Prepare Airtable record - EXACT field names from your table
-            airtable_record = {
-                "Reservation ID": reservation_id,
-                "Customer Name": customer_name,
-                "Reservation Time": time,
-                "Reservation Date": airtable_date,
-                "Reservation Summary": f"{guests} guests. {special_requests}" if special_requests else f"{guests} guests"
-            }
-            
-            logger.info(f"📝 Airtable record prepared: {airtable_record}")
-            
-            # Save to Airtable
-            airtable_success = False
-            airtable_error_msg = None
-            
             try:
-                logger.info(f"🔐 Using Airtable token: {AIRTABLE_API_TOKEN[:20]}...")
-                logger.info(f"📊 Base ID: {AIRTABLE_BASE_ID}, Table: {AIRTABLE_TABLE_NAME}")
-                
-                api = Api(AIRTABLE_API_TOKEN)
-                table = api.table(AIRTABLE_BASE_ID, AIRTABLE_TABLE_NAME)
-                
-                logger.info("💾 Attempting to create record in Airtable...")
-                airtable_result = table.create(airtable_record)
-                
-                logger.info(f"✅ SUCCESS! Saved to Airtable with ID: {airtable_result['id']}")
-                airtable_success = True
-                
-            except Exception as e:
-                airtable_error_msg = str(e)
-                logger.error(f"❌ AIRTABLE ERROR: {airtable_error_msg}")
-                logger.error(f"Error type: {type(e).__name__}")
-                airtable_success = False
+                # Parse date and time
+                with tracing.span("book_table.parse"):
+                    start_datetime = parse_booking_datetime(date, time)
+                # From here on use the normalized forms, whatever the caller said
+                date = start_datetime.strftime("%Y-%m-%d")
+                time = start_datetime.strftime("%H:%M")
+                self.booking_state.update(
+                    customer_name=customer_name, date=date, time=time, guests=guests, special_requests=special_requests
+                )
             
-            # Prepare booking data for n8n webhook
-            booking_data = {
-                "customerName": customer_name,
-                "customerPhone": self.customer_phone,
-                "reservationId": reservation_id,
-                "date": date,
-                "time": time,
-                "guests": guests,
-                "airtableDate": airtable_date,
-                "startTime": start_datetime.isoformat(),
-                "specialRequests": special_requests,
-                "service": "table_booking",
-                "airtableStatus": "saved" if airtable_success else "failed",
-                "airtableError": airtable_error_msg,
-                "language": self.language
-            }
-            
-            # Send to n8n webhook with better error handling
-            if N8N_WEBHOOK_URL:
-                async with aiohttp.ClientSession() as client:
-                    try:
-                        logger.info(f"📤 Sending to n8n: {N8N_WEBHOOK_URL}")
-                        logger.info(f"📊 Data: {json.dumps(booking_data, indent=2)}")
-                        
-                        async with client.post(N8N_WEBHOOK_URL, json=booking_data, timeout=10) as resp:
-                            response_text = await resp.text()
-                            logger.info(f"📨 n8n response status: {resp.status}")
-                            logger.info(f"📨 n8n response body: {response_text}")
-                            
-                            if resp.status in [200, 201]:
-                                logger.info(f"✅ n8n webhook success")
-                            else:
-                                logger.warning(f"⚠️ n8n returned status {resp.status}: {response_text}")
-                    except Exception as e:
-                        logger.warning(f"⚠️ n8n webhook failed: {e}")
+                # A repeated call for the same booking returns the first confirmation
+                key = booking_key(customer_name, date, time, guests, self.customer_phone)
+                return await self.bookings.run(
+                    key, lambda: self._book(customer_name, start_datetime, guests, special_requests)
+                )
+
+            except ValueError as e:
+                logger.error("❌ Date/time parsing error: %s", e)
+                return self.phrases["bad_datetime"]
+            except Exception as e:
+                logger.exception("❌ UNEXPECTED BOOKING ERROR: %s", e)
+                return self.phrases["booking_error"]
+
+    async def _book(self, customer_name: str, start_datetime: datetime, guests: int, special_requests: str) -> tuple[str, bool]:
+        """Check capacity, journal and announce one booking. Returns (reply, confirmed)."""
+        start_minutes = start_datetime.hour * 60 + start_datetime.minute
+        date = start_datetime.strftime("%Y-%m-%d")
+        time = start_datetime.strftime("%H:%M")
+
+        # A hold from check_availability already reserved these seats; otherwise
+        # hold them now, counting other calls' holds, and refuse before writing
+        # anything if the slot is already full
+        await self._slots_ready(start_datetime.date())
+        with tracing.span("book_table.capacity_check"):
+            hold = self.hold
+            if hold is None or not hold.matches(start_datetime.date(), start_minutes, guests) or not await self.holds.claim(hold):
+                # The details changed since the check, or the hold expired
+                await self.holds.release(hold)
+                hold = self.hold = await self.holds.place(start_datetime.date(), start_minutes, guests)
+                if hold is not None:
+                    await self.holds.claim(hold)
+        if hold is None:
+            alternatives = self._slot_alternatives(start_datetime, guests)
+            logger.info("📅 Slot full, not booking: %s %s for %s", date, time, guests)
+            if self.language == "de":
+                return f"Entschuldigung, um {time} Uhr ist kein Tisch für {guests} Personen mehr frei. Freie Zeiten: {alternatives or 'keine an diesem Tag'}.", False
+            return f"Sorry, there's no table for {guests} left at {time}. Free times: {alternatives or 'none that day'}.", False
+    
+        # Convert date to M/D/YYYY format for Airtable
+        airtable_date = start_datetime.strftime("%m/%d/%Y")
+    
+        # Unique 5-character Reservation ID, skipping any the slot index already knows
+        with tracing.span("book_table.allocate_id"):
+            reservation_id = await self.ids.allocate(taken=self.slots.__contains__)
+        bind_log_fields(reservation_id=reservation_id)
+    
+        logger.info("📅 Parsed date: %s, Reservation ID: %s", airtable_date, reservation_id)
+    
+        # Prepare Airtable record
+        airtable_record = Reservation(
+            reservation_id, customer_name, normalize_phone(self.customer_phone), start_datetime.date(), start_minutes, guests, special_requests
+        ).airtable_fields()
+    
+        logger.debug("📝 Airtable record prepared: %s", airtable_record)
+    
+        # Journal locally; the outbox flushes to Airtable in the background
+        airtable_success = False
+        airtable_error_msg = None
+    
+        try:
+            with tracing.span("book_table.journal"):
+                await self.outbox.enqueue(
+                    reservation_id,
+                    airtable_record,
+                    customer_phone=normalize_phone(self.customer_phone),
+                    language=self.language,
+                )
+            await self.holds.convert(hold, reservation_id)
+            self.hold = None
+        
+            logger.info("✅ SUCCESS! Reservation %s journaled, queued for Airtable", reservation_id)
+            airtable_success = True
+        
+        except Exception as e:
+            airtable_error_msg = str(e)
+            logger.error("❌ OUTBOX ERROR (%s): %s", type(e).__name__, airtable_error_msg)
+            airtable_success = False
+            await self.holds.release(hold)
+            self.hold = None
+    
+        # Prepare booking data for n8n webhook
+        booking_data = {
+            "customerName": customer_name,
+            "customerPhone": self.customer_phone,
+            "reservationId": reservation_id,
+            "date": date,
+            "time": time,
+            "guests": guests,
+            "airtableDate": airtable_date,
+            "startTime": start_datetime.isoformat(),
+            "specialRequests": special_requests,
+            "service": "table_booking",
+            "airtableStatus": "queued" if airtable_success else "failed",
+            "airtableError": airtable_error_msg,
+            "language": self.language
+        }
+    
+        # Hand off to the n8n dispatcher; delivery happens in the background
+        if self.webhooks.url:
+            logger.debug("📤 Queueing for n8n: %s", booking_data)
+            with tracing.span("book_table.webhook_enqueue"):
+                self.webhooks.submit(booking_data)
+        else:
+            logger.warning("⚠️ N8N_WEBHOOK_URL not set, skipping webhook")
+    
+        # Return success message
+        if airtable_success:
+            self.booking_state.add_reservation(reservation_id)
+            self.owned.add(reservation_id)
+            self.booked += 1
+            self._record_outcome("booked")
+            if self.language == "de":
+                summary = f"Perfekt! Deine Reservierung ist bestätigt für {customer_name} am {airtable_date} um {time} Uhr für {guests} Personen. Deine Reservierungs-ID ist {reservation_id}. Wir freuen uns auf dich!"
             else:
-                logger.warning("⚠️ N8N_WEBHOOK_URL not set, skipping webhook")
-            
-            # Return success message
-            if airtable_success:
+                summary = f"Perfect! Your reservation is confirmed for {customer_name} on {airtable_date} at {time} for {guests} guests. Your reservation ID is {reservation_id}. We look forward to seeing you!"
+        
+            if special_requests:
                 if self.language == "de":
-                    summary = f"Perfekt! Deine Reservierung ist bestätigt für {customer_name} am {airtable_date} um {time} Uhr für {guests} Personen. Deine Reservierungs-ID ist {reservation_id}. Wir freuen uns auf dich!"
+                    summary += f" Hinweis: {special_requests}"
+                else:
+                    summary += f" Note: {special_requests}"
+            return summary, True
+        else:
+            logger.error("❌ BOOKING FAILED - could not journal reservation: %s", airtable_error_msg)
+            return self.phrases["save_failed"], False
+
+    def _describe(self, reservation: Reservation) -> str:
+        day = reservation.day.strftime("%m/%d/%Y")
+        if self.language == "de":
+            text = f"Reservierung {reservation.reservation_id} für {reservation.customer_name} am {day} um {reservation.time} Uhr für {reservation.guests} Personen"
+            return text + (" (storniert)" if reservation.cancelled else "")
+        text = f"Reservation {reservation.reservation_id} for {reservation.customer_name} on {day} at {reservation.time} for {reservation.guests} guests"
+        return text + (" (cancelled)" if reservation.cancelled else "")
+
+    def _not_found(self, reservation_id: str) -> str:
+        if self.language == "de":
+            return f"Ich habe keine aktive Reservierung mit der ID {reservation_id} gefunden. Kannst du die ID noch einmal prüfen?"
+        return f"I couldn't find an active reservation with the ID {reservation_id}. Could you check the ID again?"
+
+    def _is_callers(self, reservation: Reservation, customer_name: str = "") -> bool:
+        """Whether the caller may hear about or change `reservation`: it was
+        booked from their number, or under the name they gave."""
+        if reservation.reservation_id in self.owned:
+            return True
+        phone = normalize_phone(self.customer_phone)
+        if phone is not None and normalize_phone(reservation.customer_phone) == phone:
+            return True
+        booked_as = _name_key(reservation.customer_name)
+        return bool(booked_as) and booked_as in {
+            _name_key(name) for name in (customer_name, self.customer_name) if name
+        }
+
+    def _not_callers(self, reservation_id: str) -> str:
+        if self.language == "de":
+            return f"Die Reservierung {reservation_id} kann ich deiner Nummer nicht zuordnen. Auf welchen Namen wurde sie gebucht?"
+        return f"I can't match reservation {reservation_id} to your number. What name was it booked under?"
+
+    def _announce_change(self, service: str, reservation: Reservation) -> None:
+        # Confirmations describe the old booking now
+        self.bookings.clear()
+        if not self.webhooks.url:
+            return
+        self.webhooks.submit({
+            "customerName": reservation.customer_name,
+            "customerPhone": self.customer_phone,
+            "reservationId": reservation.reservation_id,
+            "date": reservation.day.isoformat(),
+            "time": reservation.time,
+            "guests": reservation.guests,
+            "airtableDate": reservation.day.strftime("%m/%d/%Y"),
+            "specialRequests": reservation.special_requests,
+            "service": service,
+            "language": self.language,
+        })
+
+    @function_tool
+    async def find_reservation(self, reservation_id: str, date: str, customer_name: str):
+        """Look up an existing reservation of the caller.
+
+        Use this when the customer asks about, wants to change or wants to cancel a reservation they already made.
+
+        Args:
+            reservation_id: The 5-character reservation ID if the customer knows it, otherwise ""
+            date: The reservation date if the customer mentions one (e.g. "tomorrow", "15. Oktober"), otherwise ""
+            customer_name: The name the reservation was booked under if the customer says it, otherwise ""
+        """
+        with tracing.span("find_reservation"):
+            try:
+                if reservation_id:
+                    reservation = await self.reservations.get(reservation_id)
+                    found = [reservation] if reservation is not None else []
+                    if reservation is not None and not self._is_callers(reservation, customer_name):
+                        logger.warning("🔒 Reservation %s does not match the caller, not disclosed", reservation.reservation_id)
+                        return self._not_callers(reservation_id)
                 else:
-                    summary = f"Perfect! Your reservation is confirmed for {customer_name} on {airtable_date} at {time} for {guests} guests. Your reservation ID is {reservation_id}. We look forward to seeing you!"
-                
-                if special_requests:
-                    if self.language == "de":
-                        summary += f" Hinweis: {special_requests}"
+                    phone = normalize_phone(self.customer_phone)
+                    if phone is None:
+                        if self.language == "de":
+                            return "Ich kann deine Nummer nicht sehen. Wie lautet deine Reservierungs-ID?"
+                        return "I can't see your phone number. What's your reservation ID?"
+                    if date:
+                        day = parse_booking_datetime(date, "12:00").date()
+                        found = await self.reservations.upcoming(phone, start=day, end=day)
                     else:
-                        summary += f" Note: {special_requests}"
-                return summary
-            else:
-                logger.error(f"❌ BOOKING FAILED - Airtable save unsuccessful: {airtable_error_msg}")
+                        found = await self.reservations.upcoming(phone, start=restaurant_now().date())
+            except ValueError as e:
+                logger.error("❌ Date parsing error: %s", e)
+                return self.phrases["bad_datetime"]
+            except Exception as e:
+                logger.exception("❌ RESERVATION LOOKUP ERROR: %s", e)
+                return self.phrases["booking_error"]
+
+            logger.info("🔎 Reservation lookup (id=%r, date=%r): %s found", reservation_id, date, len(found))
+            for reservation in found:
+                self.booking_state.add_reservation(reservation.reservation_id)
+                self.owned.add(reservation.reservation_id)
+            if not found:
+                if reservation_id:
+                    return self._not_found(reservation_id)
                 if self.language == "de":
-                    return f"Entschuldigung, es gab ein technisches Problem beim Speichern deiner Reservierung. Bitte rufe uns direkt an unter unserer Telefonnummer."
-                else:
-                    return f"I'm sorry, there was a technical issue saving your reservation. Please call us directly at our phone number to book."
-                        
-        except ValueError as e:
-            logger.error(f"❌ Date/time parsing error: {e}")
+                    return "Ich habe unter deiner Nummer keine anstehende Reservierung gefunden. Hast du eine Reservierungs-ID?"
+                return "I couldn't find an upcoming reservation under your number. Do you have a reservation ID?"
+            return "; ".join(self._describe(r) for r in found) + "."
+
+    @function_tool
+    async def modify_reservation(self, reservation_id: str, date: str, time: str, guests: int):
+        """Change the date, time or number of guests of an existing reservation.
+
+        Use this ONLY after finding the reservation and confirming the change with the customer.
+
+        Args:
+            reservation_id: The 5-character reservation ID
+            date: The new date, or "" to keep the current one
+            time: The new time, or "" to keep the current one
+            guests: The new number of guests (1-20), or 0 to keep the current one
+        """
+        with tracing.span("modify_reservation"):
+            try:
+                reservation = await self.reservations.get(reservation_id)
+                if reservation is None or reservation.cancelled:
+                    return self._not_found(reservation_id)
+                if not self._is_callers(reservation):
+                    logger.warning("🔒 Not changing %s, it does not match the caller", reservation.reservation_id)
+                    return self._not_callers(reservation_id)
+                start_datetime = parse_booking_datetime(
+                    date or reservation.day.isoformat(), time or reservation.time
+                )
+                guests = guests or reservation.guests
+                minutes = start_datetime.hour * 60 + start_datetime.minute
+                await self._slots_ready(start_datetime.date())
+                # A call holds one slot at most; the change places its own hold
+                await self.holds.release(self.hold)
+                self.hold = None
+                updated = await self.reservations.modify(
+                    reservation, day=start_datetime.date(), minutes=minutes, guests=guests
+                )
+            except ValueError as e:
+                logger.error("❌ Date/time parsing error: %s", e)
+                return self.phrases["bad_datetime"]
+            except ReservationNotFoundError:
+                return self._not_found(reservation_id)
+            except Exception as e:
+                logger.exception("❌ RESERVATION CHANGE ERROR: %s", e)
+                return self.phrases["booking_error"]
+
+            time = start_datetime.strftime("%H:%M")
+            if updated is None:
+                alternatives = self._slot_alternatives(start_datetime, guests)
+                logger.info("📅 Slot full, not moving %s to %s %s for %s", reservation.reservation_id, start_datetime.date(), time, guests)
+                if self.language == "de":
+                    return f"Entschuldigung, um {time} Uhr ist kein Tisch für {guests} Personen frei. Deine Reservierung bleibt unverändert. Freie Zeiten: {alternatives or 'keine an diesem Tag'}."
+                return f"Sorry, there's no table for {guests} at {time}. Your reservation is unchanged. Free times: {alternatives or 'none that day'}."
+
+            logger.info("✏️ Reservation %s changed to %s %s for %s", updated.reservation_id, updated.day, updated.time, updated.guests)
+            self._announce_change("reservation_modified", updated)
+            self._record_outcome("modified")
             if self.language == "de":
-                return "Ich hatte Schwierigkeiten, das Datums- oder Zeitformat zu verstehen. Bitte gib das Datum (wie 15. Oktober oder 10/15) und die Uhrzeit (wie 19 Uhr oder 19:00) an."
-            else:
-                return "I had trouble understanding the date or time format. Could you please provide the date (like October 15th or 10/15) and time (like 7 PM or 19:00)?"
-        except Exception as e:
-            logger.error(f"❌ UNEXPECTED BOOKING ERROR: {e}")
-            logger.error(f"Error type: {type(e).__name__}")
+                return f"Erledigt! {self._describe(updated)}."
+            return f"Done! {self._describe(updated)}."
+
+    @function_tool
+    async def cancel_reservation(self, reservation_id: str):
+        """Cancel an existing reservation.
+
+        Use this ONLY after finding the reservation and the customer confirming they want to cancel it.
+
+        Args:
+            reservation_id: The 5-character reservation ID
+        """
+        with tracing.span("cancel_reservation"):
+            try:
+                reservation = await self.reservations.get(reservation_id)
+                if reservation is None or reservation.cancelled:
+                    return self._not_found(reservation_id)
+                if not self._is_callers(reservation):
+                    logger.warning("🔒 Not cancelling %s, it does not match the caller", reservation.reservation_id)
+                    return self._not_callers(reservation_id)
+                cancelled = await self.reservations.cancel(reservation)
+            except Exception as e:
+                logger.exception("❌ RESERVATION CANCEL ERROR: %s", e)
+                return self.phrases["booking_error"]
+            if not cancelled:
+                return self._not_found(reservation_id)
+
+            logger.info("🗑️ Reservation %s cancelled", reservation.reservation_id)
+            self._announce_change("reservation_cancelled", reservation)
+            self._record_outcome("cancelled")
             if self.language == "de":
-                return "Ich bin auf einen Fehler bei der Reservierung gestoßen. Bitte versuche es erneut oder rufe uns an."
-            else:
-                return "I encountered an error while making the reservation. Please try again or call us directly."
+                return f"Deine Reservierung {reservation.reservation_id} am {reservation.day.strftime('%m/%d/%Y')} ist storniert."
+            return f"Your reservation {reservation.reservation_id} on {reservation.day.strftime('%m/%d/%Y')} has been cancelled."
 
     @function_tool
     async def end_call(self):
@@ -303,19 +778,108 @@ Denke daran:
         """
         logger.info("📞 Ending call after successful booking")
         
+        self._say("goodbye_booked" if self.booked else "closing")
         if self.language == "de":
-            closing_message = "Danke für deinen Anruf! Wir freuen uns auf dich. Auf Wiedersehen!"
-        else:
-            closing_message = "Thank you for calling! We look forward to seeing you. Goodbye!"
-        
-        return closing_message
+            return "Die Verabschiedung wurde gesprochen. Sag nichts mehr."
+        return "The goodbye has been said. Don't say anything else."
+
+
+class N8nConversationAgent(Agent):
+    """Voice front end for the n8n workflow, which owns prompt, memory and tools."""
+
+    def __init__(self, language: str = "en") -> None:
+        self.language = language.lower()
+        super().__init__(instructions="Replies are generated by the n8n workflow.")
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    # Everything a call needs that does not depend on the call is loaded here,
+    # once per process, so idle processes are ready before the first call
+    with STARTUP.phase("prewarm.vad"):
+        proc.userdata["vad"] = silero.VAD.load()
+    with STARTUP.phase("prewarm.noise_cancellation"):
+        proc.userdata["noise_cancellation"] = noise_cancellation.BVC()
+    with STARTUP.phase("prewarm.openai"):
+        # The OpenAI clients import their HTTP transport on first construction (~60 ms)
+        import httpcore  # noqa: F401
+    if AGENT_MODE == "n8n":
+        with STARTUP.phase("prewarm.n8n"):
+            from n8n_chat import N8nChatClient
+
+            # One pooled n8n client per worker process, shared by all sessions
+            proc.userdata["n8n_chat"] = N8nChatClient.from_env()
+    with STARTUP.phase("prewarm.tenants"):
+        # Resolves each call's restaurant and builds its Airtable client, outbox, slot index and webhooks
+        tenants = TenantRegistry.from_env()
+        proc.userdata["tenants"] = tenants
+        # Loop lag and send backlog of this process, for the worker's load function
+        proc.userdata["load_status"] = ProcessStatusWriter.from_env(tenants.pending_io)
+
+    if os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true":
+        with STARTUP.phase("prewarm.tts_cache"):
+            tts_cache = PhraseAudioCache.from_env()
+            tts_cache.load()
+            proc.userdata["tts_cache"] = tts_cache
+    # Per-call usage for cost reports; written off the event loop when each call ends
+    proc.userdata["usage_ledger"] = UsageLedger.from_env()
+    STARTUP.report()
+
+
+def _turn_detector() -> MultilingualModel:
+    # The ONNX model runs in the worker's inference process and is loaded once at
+    # worker start. The detector talks to it through the job's inference executor,
+    # which does not exist yet in prewarm, so every call builds its own (reading
+    # the language thresholds from disk): each call gets a fresh job process.
+    with STARTUP.phase("turn_detector"):
+        return MultilingualModel()
+
+
+async def _start_booking_agent(ctx: JobContext, tenant: TenantResources, customer_name: str, customer_phone: str, language: str, caller: asyncio.Task | None = None) -> RestaurantiaAgent:
+    # Load the journal's bookings into the reservation index before the call is
+    # answered, then pick up reservations journaled by earlier jobs and warm and
+    # refresh the index from Airtable in the background
+    await tenant.start(
+        slot_refresh_interval=float(os.getenv("SLOT_INDEX_REFRESH_INTERVAL", "60")),
+        slot_full_refresh_interval=float(os.getenv("SLOT_INDEX_FULL_REFRESH_INTERVAL", "300")),
+    )
+
+    # Drain our reservations and n8n events before the job exits, then close the tenant
+    async def drain_tenant():
+        pending, _ = await asyncio.gather(
+            tenant.outbox.drain(timeout=float(os.getenv("BOOKING_OUTBOX_DRAIN_TIMEOUT", "5"))),
+            tenant.webhooks.drain(timeout=float(os.getenv("N8N_DRAIN_TIMEOUT", "5"))),
+        )
+        if pending:
+            logger.warning("⚠️ %s reservations still queued for Airtable at shutdown", pending)
+        await ctx.proc.userdata["tenants"].release(tenant)
+
+    ctx.add_shutdown_callback(drain_tenant)
+
+    config = tenant.config
+    return RestaurantiaAgent(
+        customer_name=customer_name,
+        customer_phone=customer_phone,
+        language=language,
+        airtable=tenant.airtable,
+        outbox=tenant.outbox,
+        slots=tenant.slots,
+        webhooks=tenant.webhooks,
+        ids=tenant.ids,
+        customers=tenant.customers,
+        reservations=tenant.reservations,
+        info=tenant.info,
+        holds=tenant.holds,
+        caller=caller,
+        tts_cache=ctx.proc.userdata.get("tts_cache"),
+        restaurant_name=config.restaurant_name,
+        instructions=config.instructions,
+        tts_voice=config.tts_voice,
+    )
 
 
 async def entrypoint(ctx: JobContext):
+    call_started = time.perf_counter()
+
     # Logging setup
     ctx.log_context_fields = {
         "room": ctx.room.name,
@@ -328,50 +892,122 @@ async def entrypoint(ctx: JobContext):
             customer_name = metadata.get("customerName", None)
             customer_phone = metadata.get("customerPhone", "Unknown")
             language = metadata.get("language", "en").lower()
+            tenant_id = metadata.get("tenantId")
         else:
             customer_name = None
             customer_phone = "Unknown"
             language = "en"
+            tenant_id = None
     except (json.JSONDecodeError, AttributeError):
         customer_name = None
         customer_phone = "Unknown"
         language = "en"
+        tenant_id = None
+
+    # Resolve the restaurant this call is for; its resources are built for this call
+    try:
+        tenant = await ctx.proc.userdata["tenants"].acquire(tenant_id)
+    except UnknownTenantError:
+        logger.error("❌ Unknown tenant %r, ending job", tenant_id)
+        ctx.shutdown(reason="unknown tenant")
+        return
+    ctx.log_context_fields["tenant"] = tenant.config.tenant_id
+
+    # Look the caller up in past reservations while the session starts
+    caller = tenant.customers.prefetch(customer_phone) if AGENT_MODE != "n8n" else None
+
+    # Label every latency observation made by this job, and expose /metrics
+    tracing.bind_labels(room=ctx.room.name, language=language)
+    await tracing.start_metrics_server()
+    ctx.proc.userdata["load_status"].start()
 
     # Set up voice AI pipeline
+    if AGENT_MODE == "n8n":
+        from n8n_chat import N8nLLM
+
+        # Per-room key, so every caller gets their own n8n memory window
+        session_llm = N8nLLM(
+            ctx.proc.userdata["n8n_chat"],
+            session_key=f"livekit_{ctx.room.name}",
+            fallback=PHRASES["de" if language == "de" else "en"]["n8n_unavailable"],
+        )
+        # The client's HTTP session is bound to this job's loop
+        ctx.add_shutdown_callback(ctx.proc.userdata["n8n_chat"].aclose)
+    else:
+        session_llm = openai.LLM(model="gpt-4o-mini")
+
     session = AgentSession(
         stt=openai.STT(language=language),
-        llm=openai.LLM(model="gpt-4o-mini"),
-        tts=openai.TTS(voice="alloy"),
-        turn_detection=MultilingualModel(),
+        llm=session_llm,
+        tts=openai.TTS(voice=tenant.config.tts_voice),
+        turn_detection=_turn_detector(),
         vad=ctx.proc.userdata["vad"],
-        preemptive_generation=True,
+        # A discarded preemptive turn would still land in n8n's memory
+        preemptive_generation=AGENT_MODE != "n8n",
     )
 
     # Metrics collection
     usage_collector = metrics.UsageCollector()
+    usage = SessionUsage(tenant.config.tenant_id, ctx.room.name, language)
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        usage.collect(ev.metrics)
+        tracing.observe_pipeline_metrics(ev.metrics)
+
+    if AGENT_MODE == "n8n":
+        agent = N8nConversationAgent(language=language)
+
+        async def release_tenant():
+            await ctx.proc.userdata["tenants"].release(tenant)
+
+        ctx.add_shutdown_callback(release_tenant)
+    else:
+        agent = await _start_booking_agent(ctx, tenant, customer_name, customer_phone, language, caller)
 
     async def log_usage():
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info("Usage: %s", summary)
+        ledger = ctx.proc.userdata.get("usage_ledger")
+        if ledger is not None:
+            try:
+                await ledger.append(
+                    usage, outcome=getattr(agent, "outcome", "none"), bookings=getattr(agent, "booked", 0)
+                )
+            except Exception as e:
+                logger.warning("⚠️ Could not write usage ledger: %s", e)
 
     ctx.add_shutdown_callback(log_usage)
 
     # Start the session
     await session.start(
-        agent=RestaurantiaAgent(customer_name=customer_name, customer_phone=customer_phone, language=language),
+        agent=agent,
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=ctx.proc.userdata["noise_cancellation"],
         ),
     )
     
     await ctx.connect()
+    STARTUP.call_answered(time.perf_counter() - call_started)
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    # Job processes inherit this, so their startup report counts from worker start
+    os.environ.setdefault("WORKER_STARTED_AT", str(process_started_at()))
+    # ... and know which worker to report their load to
+    publish_worker_pid()
+    load_monitor = LoadMonitor.from_env()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
+            # Stop taking calls before CPU, loop lag or the send backlog make turns slow
+            load_fnc=load_monitor,
+            load_threshold=load_monitor.threshold,
+            # How long SIGTERM waits for calls in progress during a rolling deploy
+            drain_timeout=int(os.getenv("DRAIN_TIMEOUT", "1800")),
+        )
+    )
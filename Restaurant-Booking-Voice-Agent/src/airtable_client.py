@@ -0,0 +1,212 @@
+"""Async Airtable REST client for one call's Airtable table.
+
+`pyairtable` is synchronous, so calling it from a function tool blocks the
+event loop (and with it VAD, STT and TTS for every other session in the
+process) for the whole HTTPS round trip. This client talks to the Airtable
+REST API directly over a pooled, keep-alive `aiohttp` session instead.
+
+Each job process serves one call, and `TenantResources.build` creates one
+instance for it, closed when the call ends; the connection pool is reused by
+the requests within that call (the warm-up, refreshes, outbox batches). The
+underlying `ClientSession` is opened lazily on first use, because it has to
+be bound to the job's running event loop; a session left over from another
+loop is closed before a new one is opened. Requests wait for a slot from the
+base's host-wide `SharedRateLimiter` first, so the job processes on a host
+together stay under Airtable's per-base limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+from collections.abc import AsyncIterator
+from typing import Any
+from urllib.parse import quote
+
+import aiohttp
+
+from rate_limiter import RateLimitTimeoutError, SharedRateLimiter
+
+AIRTABLE_API_URL = "https://api.airtable.com/v0"
+
+# Airtable rejects create/update requests carrying more than 10 records
+MAX_RECORDS_PER_REQUEST = 10
+
+
+class AirtableError(Exception):
+    """Raised when Airtable answers with a non-2xx status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"Airtable returned {status}: {message}")
+        self.status = status
+        self.message = message
+
+    @property
+    def retryable(self) -> bool:
+        # 429 is rate limiting, 5xx are transient server errors
+        return self.status == 429 or self.status >= 500
+
+
+class AsyncAirtableClient:
+    def __init__(
+        self,
+        api_token: str | None,
+        base_id: str,
+        table_name: str,
+        *,
+        api_url: str = AIRTABLE_API_URL,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        pool_size: int = 10,
+        keepalive_timeout: float = 30.0,
+        limiter: SharedRateLimiter | None = None,
+    ) -> None:
+        self.base_id = base_id
+        self.table_name = table_name
+        self._api_token = api_token
+        self._table_url = f"{api_url.rstrip('/')}/{base_id}/{quote(table_name, safe='')}"
+        self._timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._limiter = limiter
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+
+    @classmethod
+    def from_env(
+        cls, *, base_id: str | None = None, table_name: str | None = None
+    ) -> AsyncAirtableClient:
+        """Build a client from the AIRTABLE_* environment variables."""
+        base_id = base_id or os.getenv("AIRTABLE_BASE_ID", "app7SapLnw8VfBDjQ")
+        return cls(
+            os.getenv("AIRTABLE_API_TOKEN"),
+            base_id,
+            table_name or os.getenv("AIRTABLE_TABLE_NAME", "Order Summary"),
+            api_url=os.getenv("AIRTABLE_API_URL", AIRTABLE_API_URL),
+            timeout=float(os.getenv("AIRTABLE_TIMEOUT", "10")),
+            connect_timeout=float(os.getenv("AIRTABLE_CONNECT_TIMEOUT", "3")),
+            pool_size=int(os.getenv("AIRTABLE_POOL_SIZE", "10")),
+            # Airtable's limit is per base, so tables of one base share a bucket
+            limiter=SharedRateLimiter.from_env(f"airtable-{base_id}", "AIRTABLE", rate=5),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._api_token)
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._session_loop is not loop:
+            # Its transports belong to a loop that has ended, which may refuse the close
+            with contextlib.suppress(RuntimeError):
+                await self._session.close()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                keepalive_timeout=self._keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self._timeout,
+                headers={"Authorization": f"Bearer {self._api_token}"},
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def _request(
+        self,
+        method: str,
+        *,
+        path: str = "",
+        params: dict[str, Any] | list[tuple[str, str]] | None = None,
+        json: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        if self._limiter is not None:
+            try:
+                await self._limiter.acquire()
+            except RateLimitTimeoutError as e:
+                # Surfaces like Airtable's own 429, so callers retry it the same way
+                raise AirtableError(429, str(e)) from e
+        session = await self._ensure_session()
+        async with session.request(
+            method, self._table_url + path, params=params, json=json
+        ) as resp:
+            if resp.status >= 400:
+                raise AirtableError(resp.status, await resp.text())
+            return await resp.json()
+
+    async def create(self, fields: dict[str, Any]) -> dict[str, Any]:
+        """Create a single record and return it (including its Airtable `id`)."""
+        return await self._request("POST", json={"fields": fields})
+
+    async def batch_create(self, records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Create up to MAX_RECORDS_PER_REQUEST records in one request."""
+        if len(records) > MAX_RECORDS_PER_REQUEST:
+            raise ValueError(
+                f"Airtable accepts at most {MAX_RECORDS_PER_REQUEST} records per request"
+            )
+        payload = {"records": [{"fields": fields} for fields in records]}
+        result = await self._request("POST", json=payload)
+        return result["records"]
+
+    async def batch_upsert(
+        self, records: list[dict[str, Any]], *, merge_on: list[str]
+    ) -> list[dict[str, Any]]:
+        """Create-or-update up to MAX_RECORDS_PER_REQUEST records in one request.
+
+        Records are matched on the `merge_on` fields, so replaying the same
+        batch updates the existing rows instead of creating duplicates.
+        """
+        if len(records) > MAX_RECORDS_PER_REQUEST:
+            raise ValueError(
+                f"Airtable accepts at most {MAX_RECORDS_PER_REQUEST} records per request"
+            )
+        payload = {
+            "performUpsert": {"fieldsToMergeOn": merge_on},
+            "records": [{"fields": fields} for fields in records],
+        }
+        result = await self._request("PATCH", json=payload)
+        return result["records"]
+
+    async def batch_delete(self, record_ids: list[str]) -> list[dict[str, Any]]:
+        """Delete up to MAX_RECORDS_PER_REQUEST records by Airtable record id."""
+        if len(record_ids) > MAX_RECORDS_PER_REQUEST:
+            raise ValueError(
+                f"Airtable accepts at most {MAX_RECORDS_PER_REQUEST} records per request"
+            )
+        result = await self._request("DELETE", params=[("records[]", rid) for rid in record_ids])
+        return result["records"]
+
+    async def iterate(
+        self,
+        *,
+        formula: str | None = None,
+        fields: list[str] | None = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Yield pages of records, following Airtable's `offset` cursor."""
+        offset: str | None = None
+        while True:
+            params: list[tuple[str, str]] = [("pageSize", str(page_size))]
+            if formula:
+                params.append(("filterByFormula", formula))
+            for name in fields or []:
+                params.append(("fields[]", name))
+            if offset:
+                params.append(("offset", offset))
+
+            page = await self._request("GET", params=params)
+            yield page.get("records", [])
+
+            offset = page.get("offset")
+            if not offset:
+                break
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        if self._limiter is not None:
+            self._limiter.close()
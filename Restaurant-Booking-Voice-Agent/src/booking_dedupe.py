@@ -0,0 +1,114 @@
+"""Per-session idempotency for `book_table`.
+
+With preemptive generation and LLM retries the model can call `book_table`
+twice for the same reservation. Each call used to draw a fresh reservation
+ID, journal a second Airtable row and fire a second n8n event, so the guest
+ended up booked twice.
+
+`BookingDeduper` keys each booking on its normalized details (customer,
+date, time, guests, phone). A repeat within BOOKING_DEDUPE_WINDOW seconds
+gets the first call's confirmation back without touching the outbox, slot
+index or webhook; a repeat that arrives while the first call is still
+running waits for it instead of booking in parallel. Only confirmed
+bookings are remembered, so a failed attempt can be retried.
+
+One deduper belongs to one agent (i.e. one call), holds at most
+BOOKING_DEDUPE_SIZE bookings and is cleared when the agent leaves the
+session.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+logger = logging.getLogger("agent.dedupe")
+
+
+def booking_key(customer_name: str, date: str, time: str, guests: int, phone: str) -> tuple:
+    """Normalize booking details; `date` and `time` are expected already parsed."""
+    name = " ".join(customer_name.split()).casefold()
+    return (name, date, time, int(guests), "".join(ch for ch in phone if ch.isdigit() or ch == "+"))
+
+
+@dataclass
+class _Entry:
+    result: asyncio.Future
+    created_at: float
+
+
+class BookingDeduper:
+    def __init__(
+        self,
+        *,
+        window: float = 600.0,
+        max_entries: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> BookingDeduper:
+        return cls(
+            window=float(os.getenv("BOOKING_DEDUPE_WINDOW", "600")),
+            max_entries=int(os.getenv("BOOKING_DEDUPE_SIZE", "16")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _live(self, key: tuple) -> _Entry | None:
+        now = self._clock()
+        for old_key, entry in list(self._entries.items()):
+            if now - entry.created_at < self.window:
+                break
+            del self._entries[old_key]
+        return self._entries.get(key)
+
+    async def run(self, key: tuple, book: Callable[[], Awaitable[tuple[str, bool]]]) -> str:
+        """Return the reply of `book()`, calling it at most once per confirmed booking.
+
+        `book` returns `(reply, confirmed)`; only confirmed replies are reused.
+        """
+        while (entry := self._live(key)) is not None:
+            try:
+                reply = await asyncio.shield(entry.result)
+            except asyncio.CancelledError:
+                if not entry.result.cancelled():
+                    raise
+                # The first call was interrupted before it finished; book ourselves
+                continue
+            logger.info("♻️ Repeated book_table call, reusing the earlier confirmation")
+            return reply
+
+        result = asyncio.get_running_loop().create_future()
+        self._entries[key] = _Entry(result, self._clock())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        try:
+            reply, confirmed = await book()
+        except BaseException:
+            self._forget(key, result)
+            result.cancel()
+            raise
+        if not confirmed:
+            self._forget(key, result)
+        result.set_result(reply)
+        return reply
+
+    def _forget(self, key: tuple, result: asyncio.Future) -> None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.result is result:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
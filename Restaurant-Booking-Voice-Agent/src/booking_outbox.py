@@ -0,0 +1,589 @@
+"""Durable local outbox for reservations on their way to Airtable.
+
+`book_table` journals every reservation to a local SQLite file (WAL mode,
+fsync on commit) before the agent confirms it to the caller. A background
+flusher then pushes journaled records to Airtable in batches of up to
+MAX_RECORDS_PER_REQUEST, retrying with exponential backoff.
+
+Records are written with an Airtable upsert keyed on "Reservation ID", so a
+batch that is replayed after a crash (sent, but not yet marked as sent)
+updates the existing rows rather than duplicating them. Once a batch is
+acknowledged, each row stores its Airtable record id and `sent_at` marker
+and is never sent again.
+
+Rows also keep the caller's phone number, language and reservation date,
+and are kept after sending, so the journal doubles as the local reservation
+store: `customers.CustomerDirectory` recognizes returning callers from it, and
+`reservation_store.ReservationStore` looks reservations up by ID, phone or
+date. Changing a reservation rewrites its row and queues it again, so the
+flusher upserts the new fields; cancelling queues a delete of the Airtable
+record instead. Each change bumps the row's version, so a batch that was
+already in flight when the row changed does not mark the change as sent.
+Rows the flusher gave up on are repaired by `reconcile.py`.
+
+All SQLite work runs on a single dedicated thread so the event loop never
+waits on disk I/O. Several job processes may share the same journal file;
+rows are claimed with a short lease before they are sent.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, NamedTuple, TypeVar
+
+import aiohttp
+
+import tracing
+from airtable_client import MAX_RECORDS_PER_REQUEST, AirtableError, AsyncAirtableClient
+
+logger = logging.getLogger("agent.outbox")
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    reservation_id  TEXT PRIMARY KEY,
+    fields          TEXT NOT NULL,
+    created_at      REAL NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until   REAL NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    airtable_id     TEXT,
+    sent_at         REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending
+    ON outbox (next_attempt_at) WHERE sent_at IS NULL;
+"""
+
+# Columns added after the first release; journals created earlier gain them on open
+_ADDED_COLUMNS = {
+    "customer_phone": "TEXT",
+    "language": "TEXT",
+    "reservation_date": "TEXT",
+    "status": "TEXT NOT NULL DEFAULT 'booked'",
+    "version": "INTEGER NOT NULL DEFAULT 0",
+}
+_ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS outbox_customer
+    ON outbox (customer_phone, created_at) WHERE customer_phone IS NOT NULL;
+CREATE INDEX IF NOT EXISTS outbox_date
+    ON outbox (reservation_date);
+"""
+
+CANCELLED = "cancelled"
+
+
+def _iso_date(fields: dict[str, Any]) -> str | None:
+    """The "Reservation Date" field (M/D/YYYY or ISO) as YYYY-MM-DD, for the date index."""
+    raw = fields.get("Reservation Date") or ""
+    try:
+        if "-" in raw:
+            return datetime.strptime(raw[:10], "%Y-%m-%d").date().isoformat()
+        return datetime.strptime(raw, "%m/%d/%Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    reservation_id: str
+    fields: dict[str, Any]
+    customer_phone: str | None
+    language: str | None
+    cancelled: bool
+
+
+@dataclass(frozen=True)
+class JournalRow:
+    """A journaled reservation and where it stands with Airtable."""
+
+    reservation_id: str
+    fields: dict[str, Any]
+    cancelled: bool
+    airtable_id: str | None
+    version: int
+    sent: bool
+    given_up: bool
+
+
+class _Claimed(NamedTuple):
+    reservation_id: str
+    fields: dict[str, Any]
+    attempts: int
+    cancelled: bool
+    airtable_id: str | None
+    version: int
+
+
+class BookingOutbox:
+    def __init__(
+        self,
+        path: str,
+        airtable: AsyncAirtableClient,
+        *,
+        batch_size: int = MAX_RECORDS_PER_REQUEST,
+        flush_interval: float = 2.0,
+        claim_lease: float = 30.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        max_attempts: int = 20,
+    ) -> None:
+        self.path = path
+        self.airtable = airtable
+        self.batch_size = min(batch_size, MAX_RECORDS_PER_REQUEST)
+        self.flush_interval = flush_interval
+        self.claim_lease = claim_lease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._conn: sqlite3.Connection | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+        # Rows journaled, amended or cancelled by this process and maybe not sent yet
+        self._written: set[str] = set()
+
+    @classmethod
+    def from_env(cls, airtable: AsyncAirtableClient, *, path: str | None = None) -> BookingOutbox:
+        return cls(
+            path or os.getenv("BOOKING_OUTBOX_PATH", "var/booking_outbox.db"),
+            airtable,
+            flush_interval=float(os.getenv("BOOKING_OUTBOX_FLUSH_INTERVAL", "2")),
+            max_attempts=int(os.getenv("BOOKING_OUTBOX_MAX_ATTEMPTS", "20")),
+        )
+
+    # -- SQLite (outbox thread only) ----------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    # Another process sharing the journal may have migrated it first
+                    with contextlib.suppress(sqlite3.OperationalError):
+                        conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+            if "reservation_date" not in existing:
+                rows = conn.execute(
+                    "SELECT reservation_id, fields FROM outbox WHERE reservation_date IS NULL"
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE outbox SET reservation_date = ? WHERE reservation_id = ?",
+                    [(_iso_date(json.loads(fields)), rid) for rid, fields in rows],
+                )
+            conn.executescript(_ADDED_INDEXES)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _insert(
+        self, reservation_id: str, fields: dict[str, Any], customer_phone: str | None, language: str | None
+    ) -> None:
+        now = time.time()
+        self._db().execute(
+            "INSERT INTO outbox (reservation_id, fields, created_at, next_attempt_at, "
+            "customer_phone, language, reservation_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (reservation_id, json.dumps(fields), now, now, customer_phone, language, _iso_date(fields)),
+        )
+
+    def _amend(self, reservation_id: str, fields: dict[str, Any] | None) -> bool:
+        # Queue the row again from a clean slate; its version tells an
+        # in-flight batch that it is sending stale data
+        now = time.time()
+        if fields is None:
+            cursor = self._db().execute(
+                "UPDATE outbox SET status = ?, version = version + 1, sent_at = NULL, attempts = 0, "
+                "next_attempt_at = ?, last_error = NULL WHERE reservation_id = ? AND status != ?",
+                (CANCELLED, now, reservation_id, CANCELLED),
+            )
+        else:
+            cursor = self._db().execute(
+                "UPDATE outbox SET fields = ?, reservation_date = ?, version = version + 1, "
+                "sent_at = NULL, attempts = 0, next_attempt_at = ?, last_error = NULL "
+                "WHERE reservation_id = ? AND status != ?",
+                (json.dumps(fields), _iso_date(fields), now, reservation_id, CANCELLED),
+            )
+        return cursor.rowcount > 0
+
+    def _claim(self) -> list[_Claimed]:
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT reservation_id, fields, attempts, status, airtable_id, version FROM outbox "
+                "WHERE sent_at IS NULL AND attempts < ? "
+                "AND next_attempt_at <= ? AND claimed_until <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (self.max_attempts, now, now, self.batch_size),
+            ).fetchall()
+            db.executemany(
+                "UPDATE outbox SET claimed_until = ? WHERE reservation_id = ?",
+                [(now + self.claim_lease, row[0]) for row in rows],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return [
+            _Claimed(rid, json.loads(fields), attempts, status == CANCELLED, airtable_id, version)
+            for rid, fields, attempts, status, airtable_id, version in rows
+        ]
+
+    def _mark_sent(self, sent: list[tuple[str, str | None, int]]) -> None:
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN")
+        # A row changed while its batch was in flight stays queued
+        db.executemany(
+            "UPDATE outbox SET sent_at = CASE WHEN version = ? THEN ? END, "
+            "airtable_id = COALESCE(?, airtable_id), claimed_until = 0, last_error = NULL "
+            "WHERE reservation_id = ?",
+            [(version, now, airtable_id, rid) for rid, airtable_id, version in sent],
+        )
+        db.execute("COMMIT")
+
+    def _mark_failed(self, failed: list[tuple[str, int, int]], error: str) -> None:
+        now = time.time()
+        updates = []
+        for rid, attempts, version in failed:
+            delay = min(self.max_backoff, self.base_backoff * 2**attempts)
+            delay *= random.uniform(0.5, 1.0)
+            updates.append((attempts + 1, now + delay, error, rid, version))
+        db = self._db()
+        db.execute("BEGIN")
+        # A row changed while its batch was in flight keeps the fresh slate
+        # `_amend` gave it; only the claim is released
+        db.executemany(
+            "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? "
+            "WHERE reservation_id = ? AND version = ?",
+            updates,
+        )
+        db.executemany(
+            "UPDATE outbox SET claimed_until = 0 WHERE reservation_id = ?",
+            [(rid,) for rid, _, _ in failed],
+        )
+        db.execute("COMMIT")
+
+    def _pending_count(self) -> int:
+        return self._db().execute(
+            "SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL AND attempts < ?",
+            (self.max_attempts,),
+        ).fetchone()[0]
+
+    def _unsent(self, reservation_ids: list[str]) -> list[str]:
+        found = []
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(reservation_ids), 500):
+            chunk = reservation_ids[start : start + 500]
+            found += [
+                row[0]
+                for row in self._db().execute(
+                    "SELECT reservation_id FROM outbox WHERE sent_at IS NULL AND attempts < ? "
+                    f"AND reservation_id IN ({', '.join('?' * len(chunk))})",
+                    (self.max_attempts, *chunk),
+                )
+            ]
+        return found
+
+    def _customer_history(self, customer_phone: str, limit: int) -> list[tuple[dict[str, Any], str | None]]:
+        rows = self._db().execute(
+            "SELECT fields, language FROM outbox WHERE customer_phone = ? AND status != ? "
+            "ORDER BY created_at DESC, rowid DESC LIMIT ?",
+            (customer_phone, CANCELLED, limit),
+        ).fetchall()
+        return [(json.loads(fields), language) for fields, language in rows]
+
+    def _find(
+        self,
+        reservation_id: str | None,
+        customer_phone: str | None,
+        date_from: str | None,
+        date_to: str | None,
+        include_cancelled: bool,
+        limit: int,
+    ) -> list[JournalEntry]:
+        clauses, args = ([], []) if include_cancelled else (["status != ?"], [CANCELLED])
+        for clause, value in (
+            ("reservation_id = ?", reservation_id),
+            ("customer_phone = ?", customer_phone),
+            ("reservation_date >= ?", date_from),
+            ("reservation_date <= ?", date_to),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                args.append(value)
+        where = " AND ".join(clauses) or "1"
+        rows = self._db().execute(
+            "SELECT reservation_id, fields, customer_phone, language, status FROM outbox "
+            f"WHERE {where} ORDER BY reservation_date, created_at LIMIT ?",
+            (*args, limit),
+        ).fetchall()
+        return [
+            JournalEntry(rid, json.loads(fields), phone, language, status == CANCELLED)
+            for rid, fields, phone, language, status in rows
+        ]
+
+    def _changed(self, since: float, reservation_ids: list[str]) -> list[JournalRow]:
+        db = self._db()
+        query = (
+            "SELECT reservation_id, fields, status, airtable_id, version, sent_at, attempts FROM outbox "
+        )
+        rows = db.execute(
+            query + "WHERE created_at >= ? OR sent_at >= ? OR (sent_at IS NULL AND attempts >= ?)",
+            (since, since, self.max_attempts),
+        ).fetchall()
+        seen = {row[0] for row in rows}
+        wanted = [rid for rid in dict.fromkeys(reservation_ids) if rid not in seen]
+        # SQLite caps the number of bound parameters per statement
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i : i + 500]
+            rows += db.execute(
+                query + f"WHERE reservation_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+        return [
+            JournalRow(
+                rid, json.loads(fields), status == CANCELLED, airtable_id, version,
+                sent_at is not None, sent_at is None and attempts >= self.max_attempts,
+            )
+            for rid, fields, status, airtable_id, version, sent_at, attempts in rows
+        ]
+
+    def _reservation_ids(self) -> list[str]:
+        return [row[0] for row in self._db().execute("SELECT reservation_id FROM outbox")]
+
+    def _leased_count(self) -> int:
+        return self._db().execute(
+            "SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL AND claimed_until > ?",
+            (time.time(),),
+        ).fetchone()[0]
+
+    # -- async API ----------------------------------------------------------
+
+    async def enqueue(
+        self,
+        reservation_id: str,
+        fields: dict[str, Any],
+        *,
+        customer_phone: str | None = None,
+        language: str | None = None,
+    ) -> None:
+        """Durably journal a reservation. Returns once it is on disk."""
+        await self._run(self._insert, reservation_id, fields, customer_phone, language)
+        self._written.add(reservation_id)
+        self._wake()
+
+    async def amend(self, reservation_id: str, fields: dict[str, Any]) -> bool:
+        """Replace a journaled reservation's fields and queue the update for Airtable.
+
+        Returns False if there is no such reservation or it was cancelled.
+        """
+        amended = await self._run(self._amend, reservation_id, fields)
+        if amended:
+            self._written.add(reservation_id)
+            self._wake()
+        return amended
+
+    async def cancel(self, reservation_id: str) -> bool:
+        """Mark a journaled reservation cancelled and queue its deletion from Airtable."""
+        cancelled = await self._run(self._amend, reservation_id, None)
+        if cancelled:
+            self._written.add(reservation_id)
+            self._wake()
+        return cancelled
+
+    def _wake(self) -> None:
+        self.start()
+        assert self._wakeup is not None
+        self._wakeup.set()
+
+    async def find(
+        self,
+        *,
+        reservation_id: str | None = None,
+        customer_phone: str | None = None,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        include_cancelled: bool = False,
+        limit: int = 10,
+    ) -> list[JournalEntry]:
+        """Journaled reservations matching every given filter (dates as YYYY-MM-DD), by date."""
+        return await self._run(
+            self._find, reservation_id, customer_phone, date_from, date_to, include_cancelled, limit
+        )
+
+    async def pending_count(self) -> int:
+        return await self._run(self._pending_count)
+
+    async def own_pending_count(self) -> int:
+        """Rows this process wrote that no process has sent to Airtable yet.
+
+        The journal is shared by every job process on the host, so
+        `pending_count` would count the same backlog in each of them.
+        """
+        if not self._written:
+            return 0
+        checked = list(self._written)
+        unsent = await self._run(self._unsent, checked)
+        # Rows written while the query ran are kept until the next check
+        self._written.difference_update(set(checked) - set(unsent))
+        return len(self._written)
+
+    async def booked_from(self, date_from: str) -> list[JournalEntry]:
+        """Every reservation on or after `date_from` (YYYY-MM-DD) that is not cancelled, sent or not."""
+        return await self._run(self._find, None, None, date_from, None, False, -1)
+
+    async def customer_history(
+        self, customer_phone: str, limit: int = 3
+    ) -> list[tuple[dict[str, Any], str | None]]:
+        """Most recent journaled reservations of a caller, as (Airtable fields, language)."""
+        return await self._run(self._customer_history, customer_phone, limit)
+
+    async def changed_since(self, since: float, reservation_ids: list[str] = ()) -> list[JournalRow]:
+        """Rows journaled or sent at or after `since` (epoch seconds), rows the
+        flusher gave up on, and the rows of `reservation_ids`."""
+        return await self._run(self._changed, since, list(reservation_ids))
+
+    async def mark_reconciled(self, written: list[tuple[str, str | None, int]]) -> None:
+        """Record (reservation ID, Airtable record id, version) rows written by
+        someone else, e.g. the reconciler, as sent; rows changed since stay queued."""
+        await self._run(self._mark_sent, written)
+
+    async def reservation_ids(self) -> list[str]:
+        """Every reservation ID ever journaled here, sent or not."""
+        return await self._run(self._reservation_ids)
+
+    def start(self) -> None:
+        """Start the background flusher on the running loop (idempotent)."""
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop(), name="booking-outbox")
+
+    async def flush_once(self) -> int:
+        """Send one batch of due records. Returns how many were sent."""
+        batch = await self._run(self._claim)
+        if not batch:
+            return 0
+
+        upserts = [row for row in batch if not row.cancelled]
+        deletes = [row for row in batch if row.cancelled and row.airtable_id]
+        sent = 0
+        if upserts:
+            sent += await self._send(upserts, "airtable.batch_upsert", self._upsert)
+        if deletes:
+            sent += await self._send(deletes, "airtable.batch_delete", self._delete)
+        # Cancelled before they ever reached Airtable: nothing to delete
+        skipped = [(row.reservation_id, None, row.version) for row in batch if row.cancelled and not row.airtable_id]
+        if skipped:
+            await self._run(self._mark_sent, skipped)
+            sent += len(skipped)
+        return sent
+
+    async def _upsert(self, rows: list[_Claimed]) -> list[str]:
+        result = await self.airtable.batch_upsert(
+            [row.fields for row in rows], merge_on=["Reservation ID"]
+        )
+        return [record["id"] for record in result]
+
+    async def _delete(self, rows: list[_Claimed]) -> list[str]:
+        record_ids = [row.airtable_id for row in rows]
+        try:
+            await self.airtable.batch_delete(record_ids)
+        except AirtableError as e:
+            # Already deleted, e.g. by staff or by a replayed batch
+            if e.status != 404:
+                raise
+        return record_ids
+
+    async def _send(self, rows: list[_Claimed], stage: str, request) -> int:
+        try:
+            # The flusher serves every room in the process, so it is not labelled per room
+            with tracing.span(stage, room="", language=""):
+                airtable_ids = await request(rows)
+        except (AirtableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("⚠️ Outbox flush of %s records failed: %s", len(rows), e)
+            await self._run(
+                self._mark_failed,
+                [(row.reservation_id, row.attempts, row.version) for row in rows],
+                str(e),
+            )
+            for row in rows:
+                if row.attempts + 1 >= self.max_attempts:
+                    logger.error(
+                        "❌ Giving up on reservation %s after %s attempts", row.reservation_id, row.attempts + 1
+                    )
+            return 0
+
+        await self._run(
+            self._mark_sent,
+            [(row.reservation_id, airtable_id, row.version) for row, airtable_id in zip(rows, airtable_ids)],
+        )
+        logger.info("✅ Outbox flushed %s records to Airtable", len(rows))
+        return len(rows)
+
+    async def _flush_loop(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                while await self.flush_once() == self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("❌ Unexpected outbox flush error")
+
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            self._wakeup.clear()
+
+    async def drain(self, timeout: float) -> int:
+        """Flush due records until the outbox is empty or `timeout` elapses.
+
+        Returns the number of records still pending; they stay journaled and
+        are picked up by the next process that opens the same outbox.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                sent = await asyncio.wait_for(
+                    self.flush_once(), timeout=max(deadline - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                break
+            if not sent:
+                # Wait out a background flush that has the remaining rows leased
+                if not await self._run(self._leased_count):
+                    break
+                await asyncio.sleep(min(0.1, max(deadline - time.monotonic(), 0)))
+        return await self.pending_count()
+
+    async def aclose(self) -> None:
+        if self._flusher is not None:
+            # wait_for() drops a cancel that races with a wakeup (bpo-42130), so repeat it
+            while not self._flusher.done():
+                self._flusher.cancel()
+                await asyncio.wait([self._flusher], timeout=0.1)
+            self._flusher = None
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,184 @@
+"""Keep the LLM prompt small, and its prefix stable, on long calls.
+
+Every turn used to send the full instruction block plus the whole chat
+history, so long calls with many menu questions got slower and more
+expensive turn by turn. `ContextCompactor` runs in the agent's `llm_node`
+and rewrites the context it sends (the session's own history is untouched):
+
+- the leading instruction messages are sent unchanged, so OpenAI's prompt
+  cache can keep serving them
+- once the rest of the history passes CONTEXT_TOKEN_BUDGET (estimated)
+  tokens, the oldest turns are replaced by a short summary of the booking
+  details collected so far (`BookingState`), keeping the newest turns up to
+  half the budget and never splitting a tool call from its result
+- the cut point and its summary are then frozen until the history outgrows
+  the budget again, so the prompt prefix stays byte-identical, and
+  cacheable, for several turns instead of shifting on every turn
+
+Token counts are estimated from text length; they are only used to pick cut
+points and to report the estimated prompt tokens saved per call.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, field
+
+from livekit.agents import llm
+
+logger = logging.getLogger("agent.context")
+
+# Rough average for English and German text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+# Role markers and separators the API adds around each item
+ITEM_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(item: llm.ChatItem) -> int:
+    if item.type == "message":
+        chars = len(item.text_content or "")
+    elif item.type == "function_call":
+        chars = len(item.name) + len(item.arguments)
+    elif item.type == "function_call_output":
+        chars = len(item.output)
+    else:
+        chars = 0
+    return ITEM_OVERHEAD_TOKENS + chars // CHARS_PER_TOKEN
+
+
+@dataclass
+class BookingState:
+    """Booking details collected during the call, filled in from tool calls."""
+
+    customer_name: str = ""
+    date: str = ""
+    time: str = ""
+    guests: int = 0
+    special_requests: str = ""
+    reservation_ids: list[str] = field(default_factory=list)
+
+    def update(self, **values: str | int) -> None:
+        """Set the given fields; empty values leave the current ones."""
+        for name, value in values.items():
+            if value:
+                setattr(self, name, value)
+
+    def add_reservation(self, reservation_id: str) -> None:
+        if reservation_id not in self.reservation_ids:
+            self.reservation_ids.append(reservation_id)
+
+    def summary(self, language: str) -> str:
+        de = language == "de"
+        details = []
+        if self.customer_name:
+            details.append(f"{'Name' if de else 'name'} {self.customer_name}")
+        if self.date:
+            details.append(f"{'Datum' if de else 'date'} {self.date}")
+        if self.time:
+            details.append(f"{'Uhrzeit' if de else 'time'} {self.time}")
+        if self.guests:
+            details.append(f"{self.guests} {'Personen' if de else 'guests'}")
+        if self.special_requests:
+            details.append(f"{'Wünsche' if de else 'requests'}: {self.special_requests}")
+
+        if de:
+            text = "Ältere Teile dieses Gesprächs wurden ausgelassen. "
+            text += (
+                f"Bisher erfasste Buchungsdetails: {', '.join(details)}."
+                if details
+                else "Es wurden noch keine Buchungsdetails erfasst."
+            )
+            if self.reservation_ids:
+                text += f" Erwähnte Reservierungs-IDs: {', '.join(self.reservation_ids)}."
+            return text
+        text = "Older turns of this call were left out. "
+        text += (
+            f"Booking details collected so far: {', '.join(details)}."
+            if details
+            else "No booking details have been collected yet."
+        )
+        if self.reservation_ids:
+            text += f" Reservation IDs mentioned: {', '.join(self.reservation_ids)}."
+        return text
+
+
+class ContextCompactor:
+    """Per-call compaction state; one per agent."""
+
+    def __init__(self, *, budget: int = 1500, keep_items: int = 6) -> None:
+        self.budget = budget
+        # The newest item is always sent, or the request would have nothing to answer
+        self.keep_items = max(keep_items, 1)
+        self.requests = 0
+        self.compacted = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self._cut_id: str | None = None
+        self._summary: llm.ChatMessage | None = None
+
+    @classmethod
+    def from_env(cls) -> ContextCompactor:
+        return cls(
+            budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+            keep_items=int(os.getenv("CONTEXT_KEEP_ITEMS", "6")),
+        )
+
+    def compact(self, chat_ctx: llm.ChatContext, state: BookingState, language: str) -> llm.ChatContext:
+        """The context to send for this request; `chat_ctx` itself is not modified."""
+        items = chat_ctx.items
+        head = 0
+        while head < len(items) and items[head].type == "message" and items[head].role in ("system", "developer"):
+            head += 1
+        sizes = [estimate_tokens(item) for item in items]
+
+        start = head
+        if self._cut_id is not None:
+            index = chat_ctx.index_by_id(self._cut_id)
+            if index is not None and index > head:
+                start = index
+            else:
+                # The history was rewritten (e.g. update_chat_ctx); start over
+                self._cut_id = self._summary = None
+        if self.budget > 0 and sum(sizes[start:]) > self.budget:
+            cut = self._cut(items, sizes, head)
+            if cut > start:
+                start = cut
+                self._cut_id = items[start].id
+                self._summary = llm.ChatMessage(role="system", content=[state.summary(language)])
+
+        full = sum(sizes)
+        self.requests += 1
+        if start == head or self._summary is None:
+            self.tokens_sent += full
+            return chat_ctx
+
+        sent = full - sum(sizes[head:start]) + estimate_tokens(self._summary)
+        self.tokens_sent += sent
+        self.tokens_saved += max(full - sent, 0)
+        self.compacted += 1
+        return llm.ChatContext([*items[:head], self._summary, *items[start:]])
+
+    def _cut(self, items: list[llm.ChatItem], sizes: list[int], head: int) -> int:
+        # Keep the newest turns within half the budget, so the cut stays put for a while
+        start, kept = len(items), 0
+        while start > head and (len(items) - start < self.keep_items or kept + sizes[start - 1] <= self.budget // 2):
+            start -= 1
+            kept += sizes[start]
+        # Tool calls and their results stay together
+        while head < start < len(items) and items[start].type in ("function_call", "function_call_output"):
+            start -= 1
+        return start
+
+    def report(self) -> None:
+        if not self.requests:
+            return
+        share = self.tokens_saved / (self.tokens_sent + self.tokens_saved) if self.tokens_saved else 0.0
+        logger.info(
+            "🗜️ Context: %s LLM requests, %s compacted, ~%s prompt tokens sent, ~%s saved (%.0f%%)",
+            self.requests,
+            self.compacted,
+            self.tokens_sent,
+            self.tokens_saved,
+            share * 100,
+        )
@@ -0,0 +1,166 @@
+"""Recognize returning callers by phone number.
+
+The room metadata carries the caller's phone number, but the agent used to
+ask every caller for their name from scratch. `CustomerDirectory` looks the
+number up in the tenant's booking journal (see `BookingOutbox`) and, if
+AIRTABLE_PHONE_FIELD names the table's phone column, in Airtable at the same
+time, so reservations made by hand, on another host or before the journal
+existed count too. The Airtable read gets CUSTOMER_LOOKUP_TIMEOUT seconds;
+after that the journal's answer is used alone. Each call runs in its own
+job process and looks its caller up once, so nothing is cached.
+
+The entrypoint starts the lookup with `prefetch` as soon as it knows the
+number, so it runs while the session is still starting. The agent awaits it
+briefly when it enters and adds the known name, usual language and recent
+bookings to its instructions before the first turn.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from airtable_client import AsyncAirtableClient
+from booking_outbox import BookingOutbox
+from slot_index import parse_airtable_fields
+
+logger = logging.getLogger("agent.customers")
+
+AIRTABLE_FIELDS = ["Reservation ID", "Customer Name", "Reservation Date", "Reservation Time", "Reservation Summary"]
+
+_LANGUAGE_NAMES = {
+    "en": {"en": "English", "de": "German"},
+    "de": {"en": "Englisch", "de": "Deutsch"},
+}
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    """Digits (and a leading +) only; None for missing or placeholder numbers."""
+    if not phone:
+        return None
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    if len(digits) < 5:
+        return None
+    return ("+" if phone.strip().startswith("+") else "") + digits
+
+
+def _day(fields: dict[str, Any]) -> date:
+    parsed = parse_airtable_fields(fields)
+    return parsed[1] if parsed is not None else date.min
+
+
+@dataclass(frozen=True)
+class PastBooking:
+    reservation_id: str
+    date: str
+    time: str
+    summary: str
+
+
+@dataclass(frozen=True)
+class CustomerProfile:
+    phone: str
+    name: str
+    language: str | None
+    bookings: tuple[PastBooking, ...]
+
+    def context_note(self, language: str) -> str:
+        """A paragraph for the agent's instructions, in the call's language."""
+        bookings = "; ".join(f"{b.date} {b.time} ({b.summary})" for b in self.bookings)
+        usual = _LANGUAGE_NAMES["de" if language == "de" else "en"].get(self.language or "")
+        if language == "de":
+            note = (
+                f"\n\nWiederkehrender Anrufer: Unter dieser Nummer wurde schon als {self.name} "
+                f"gebucht. Sprich den Gast mit Namen an und frag nicht erneut nach dem Namen, "
+                f"außer er bucht für jemand anderen. Letzte Reservierungen: {bookings}."
+            )
+            return note + (f" Spricht meist {usual}." if usual else "")
+        note = (
+            f"\n\nReturning caller: this number has booked with us before as {self.name}. "
+            f"Greet them by name and don't ask for their name again unless they are booking "
+            f"for someone else. Recent reservations: {bookings}."
+        )
+        return note + (f" They usually speak {usual}." if usual else "")
+
+
+class CustomerDirectory:
+    def __init__(
+        self,
+        outbox: BookingOutbox,
+        airtable: AsyncAirtableClient | None = None,
+        *,
+        phone_field: str = "",
+        timeout: float = 0.5,
+        history: int = 3,
+    ) -> None:
+        self.outbox = outbox
+        self.airtable = airtable
+        self.phone_field = phone_field
+        self.timeout = timeout
+        self.history = history
+
+    @classmethod
+    def from_env(cls, outbox: BookingOutbox, airtable: AsyncAirtableClient | None = None) -> CustomerDirectory:
+        return cls(
+            outbox,
+            airtable,
+            phone_field=os.getenv("AIRTABLE_PHONE_FIELD", ""),
+            timeout=float(os.getenv("CUSTOMER_LOOKUP_TIMEOUT", "0.5")),
+        )
+
+    async def _airtable_history(self, phone: str) -> list[tuple[dict[str, Any], str | None]]:
+        """Reservations made by hand, on another host or before the journal existed."""
+        if not self.phone_field or self.airtable is None or not self.airtable.configured:
+            return []
+        try:
+            return await asyncio.wait_for(self._read_airtable(phone), self.timeout)
+        except asyncio.TimeoutError:
+            logger.info("👋 Airtable caller lookup took longer than %.1fs, using the journal only", self.timeout)
+        except Exception as e:
+            logger.warning("⚠️ Airtable caller lookup failed: %s", e)
+        return []
+
+    async def _read_airtable(self, phone: str) -> list[tuple[dict[str, Any], str | None]]:
+        # Digits only on both sides: staff type numbers with spaces and dashes
+        formula = f'REGEX_REPLACE({{{self.phone_field}}} & "", "[^0-9]", "") = "{phone.lstrip("+")}"'
+        async for page in self.airtable.iterate(formula=formula, fields=AIRTABLE_FIELDS):
+            return [(record.get("fields", {}), None) for record in page]
+        return []
+
+    async def lookup(self, phone: str | None) -> CustomerProfile | None:
+        phone = normalize_phone(phone)
+        if phone is None:
+            return None
+        rows, remote = await asyncio.gather(
+            self.outbox.customer_history(phone, limit=self.history), self._airtable_history(phone)
+        )
+        journaled = {fields.get("Reservation ID") for fields, _ in rows}
+        rows += [row for row in remote if row[0].get("Reservation ID") not in journaled]
+        if not rows:
+            return None
+        # Newest reservation first; the journal's order breaks ties
+        rows.sort(key=lambda row: _day(row[0]), reverse=True)
+        rows = rows[: self.history]
+        latest, language = rows[0]
+        return CustomerProfile(
+            phone,
+            latest.get("Customer Name", ""),
+            language or next((lang for _, lang in rows if lang), None),
+            tuple(
+                PastBooking(
+                    fields.get("Reservation ID", ""),
+                    fields.get("Reservation Date", ""),
+                    fields.get("Reservation Time", ""),
+                    fields.get("Reservation Summary", ""),
+                )
+                for fields, _ in rows
+            ),
+        )
+
+    def prefetch(self, phone: str | None) -> asyncio.Task:
+        """Start a lookup in the background; await the task for its result."""
+        return asyncio.create_task(self.lookup(phone), name="customer-prefetch")
@@ -0,0 +1,308 @@
+"""Deterministic date/time parsing for natural-language booking inputs.
+
+The booking tools used to accept only `%Y-%m-%d %H:%M` and `%m/%d/%Y %H:%M`;
+anything else made the agent ask the caller to repeat themselves, which
+costs a whole extra STT -> LLM -> TTS turn. This parser understands the way
+people actually say dates and times in English and German, for example
+"tomorrow at 7pm", "next Friday", "the 20th", "15. Oktober 19 Uhr",
+"seven thirty pm", "dinner at eight" or "halb acht", and resolves them
+against the restaurant's local clock (RESTAURANT_TIMEZONE).
+
+All patterns are compiled once at import time and relative dates are
+resolved through a small LRU cache keyed on the current local date, so a
+typical parse costs a few microseconds. See benchmarks/bench_datetime_parser.py.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover - Python < 3.9
+    ZoneInfo = None  # type: ignore[assignment]
+
+RESTAURANT_TIMEZONE = os.getenv("RESTAURANT_TIMEZONE", "Europe/Berlin")
+
+MONTHS = {
+    # English
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+    # German
+    "januar": 1, "jänner": 1, "februar": 2, "märz": 3, "maerz": 3, "mai": 5,
+    "juni": 6, "juli": 7, "oktober": 10, "okt": 10, "dezember": 12, "dez": 12,
+}  # fmt: skip
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thurs": 3, "friday": 4, "fri": 4, "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+    "montag": 0, "dienstag": 1, "mittwoch": 2, "donnerstag": 3, "freitag": 4,
+    "samstag": 5, "sonnabend": 5, "sonntag": 6,
+}  # fmt: skip
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "eins": 1, "ein": 1, "einem": 1, "zwei": 2, "drei": 3, "vier": 4, "fünf": 5,
+    "sechs": 6, "sieben": 7, "acht": 8, "neun": 9, "zehn": 10, "elf": 11, "zwölf": 12,
+}  # fmt: skip
+
+# Spoken minutes after an hour: "seven thirty", "sieben Uhr dreißig"
+MINUTE_WORDS = {
+    "oh five": 5, "ten": 10, "fifteen": 15, "twenty": 20, "twenty five": 25, "thirty": 30,
+    "thirty five": 35, "forty": 40, "forty five": 45, "fifty": 50, "fifty five": 55,
+    "zehn": 10, "fünfzehn": 15, "zwanzig": 20, "fünfundzwanzig": 25, "dreißig": 30,
+    "dreissig": 30, "fünfunddreißig": 35, "vierzig": 40, "fünfundvierzig": 45, "fünfzig": 50,
+}  # fmt: skip
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_NUM = r"\d{1,2}|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+_MINUTES = r"\d{2}|" + "|".join(
+    word.replace(" ", r"[\s-]") for word in sorted(MINUTE_WORDS, key=len, reverse=True)
+)
+
+# -- date patterns ----------------------------------------------------------
+
+_ISO_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_DOTTED_RE = re.compile(r"\b(\d{1,2})\.\s?(0?[1-9]|1[0-2])\.(?:(\d{4}|\d{2})\b)?")
+_SLASHED_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b")
+_DAY_MONTH_RE = re.compile(
+    rf"\b(\d{{1,2}})(?:st|nd|rd|th|\.)?\s+(?:of\s+)?({_MONTH})\.?(?:\s+(\d{{4}}))?\b"
+)
+_MONTH_DAY_RE = re.compile(
+    rf"\b({_MONTH})\.?\s+(\d{{1,2}})(?:st|nd|rd|th|\.)?(?:,?\s+(\d{{4}}))?\b"
+)
+_RELATIVE_RE = re.compile(
+    r"\b(day after tomorrow|übermorgen|uebermorgen|tomorrow|today|tonight|heute|morgen)\b"
+)
+_IN_DAYS_RE = re.compile(rf"\bin\s+({_NUM})\s+(?:days?|tagen?)\b")
+# A day of the month on its own: "the 20th", "am 20."
+_ORDINAL_RE = re.compile(
+    r"\b(?:(?:the\s+)?(\d{1,2})(?:st|nd|rd|th)\b|(?:am|den)\s+(\d{1,2})\.(?!\d))"
+)
+_WEEKDAY_RE = re.compile(
+    rf"\b(?:(next|this|coming|nächste[nrs]?|naechste[nrs]?|kommende[nrs]?|diese[nrs]?)\s+)?({_WEEKDAY})\b"
+)
+
+_DATE_PATTERNS = (
+    _ISO_RE, _DAY_MONTH_RE, _MONTH_DAY_RE, _DOTTED_RE, _SLASHED_RE, _IN_DAYS_RE, _ORDINAL_RE
+)
+
+_RELATIVE_OFFSETS = {
+    "today": 0, "tonight": 0, "heute": 0, "tomorrow": 1, "morgen": 1,
+    "day after tomorrow": 2, "übermorgen": 2, "uebermorgen": 2,
+}  # fmt: skip
+
+# -- time patterns ----------------------------------------------------------
+
+_MERIDIEM_RE = re.compile(
+    rf"\b({_NUM})(?:(?:[:.]|\s+)({_MINUTES}))?\s*(a\.?\s?m\.?|p\.?\s?m\.?)(?![a-z])"
+)
+_CLOCK_RE = re.compile(r"\b(\d{1,2})[:.h](\d{2})\b(?!\.\d)")
+_UHR_RE = re.compile(rf"\b({_NUM})\s*uhr(?:\s+(\d{{1,2}}|{_MINUTES})\b)?")
+_SPOKEN_CLOCK_RE = re.compile(rf"\b({_NUM})\s+({_MINUTES})\b")
+_HALF_PAST_RE = re.compile(rf"\bhalf\s+(?:past\s+)?({_NUM})\b")
+_QUARTER_RE = re.compile(rf"\bquarter\s+(past|after|to|before)\s+({_NUM})\b")
+_HALB_RE = re.compile(rf"\bhalb\s+({_NUM})\b")
+_VIERTEL_RE = re.compile(rf"\b(viertel\s+nach|viertel\s+vor|dreiviertel)\s+({_NUM})\b")
+_OCLOCK_RE = re.compile(rf"\b({_NUM})\s*o'?\s?clock\b")
+_BARE_HOUR_RE = re.compile(rf"\b(?:at|um|gegen|around)\s+({_NUM})\b|^({_NUM})\b")
+_NOON_RE = re.compile(r"\b(noon|midday|mittag)\b")
+_MIDNIGHT_RE = re.compile(r"\b(midnight|mitternacht)\b")
+
+_PM_HINT_RE = re.compile(
+    r"\b(evening|tonight|afternoon|night|dinner|supper|abends?|nachmittags?|nachts?|heute abend"
+    r"|abendessen|abendbrot)\b"
+)
+_AM_HINT_RE = re.compile(r"\b(morning|morgens|vormittags?|früh|frueh|breakfast|frühstück)\b")
+# Lunch at one is 13:00, lunch at eleven is 11:00
+_LUNCH_HINT_RE = re.compile(r"\b(lunch|mittagessen|zu mittag)\b")
+_LUNCH_PM_MAX_HOUR = 5
+
+# Without an am/pm hint, hours up to this value are read as afternoon/evening
+# ("eight" -> 20:00); later hours are taken literally ("nine" -> 09:00)
+_AMBIGUOUS_PM_MAX_HOUR = 8
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _minutes(token: str | None) -> int:
+    if not token:
+        return 0
+    return int(token) if token.isdigit() else MINUTE_WORDS[" ".join(token.replace("-", " ").split())]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace(",", " ").split())
+
+
+def restaurant_now(tz: str = RESTAURANT_TIMEZONE) -> datetime:
+    """Current wall-clock time at the restaurant (naive)."""
+    if ZoneInfo is None:
+        return datetime.now()
+    return datetime.now(ZoneInfo(tz)).replace(tzinfo=None)
+
+
+def _with_year(today: date, month: int, day: int, year: str | None) -> date:
+    if year:
+        y = int(year)
+        return date(y + 2000 if y < 100 else y, month, day)
+    candidate = date(today.year, month, day)
+    # A date without a year that has already passed means next year's
+    if candidate < today:
+        candidate = date(today.year + 1, month, day)
+    return candidate
+
+
+def _day_of_month(today: date, day: int) -> date:
+    """The next date, from today on, that falls on this day of the month."""
+    year, month = today.year, today.month
+    for _ in range(12):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            candidate = None
+        if candidate is not None and candidate >= today:
+            return candidate
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    raise ValueError(f"no month has a day {day}")
+
+
+@lru_cache(maxsize=1024)
+def _parse_date(text: str, today: date) -> date | None:
+    if m := _ISO_RE.search(text):
+        return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+
+    if m := _DAY_MONTH_RE.search(text):
+        return _with_year(today, MONTHS[m.group(2)], int(m.group(1)), m.group(3))
+    if m := _MONTH_DAY_RE.search(text):
+        return _with_year(today, MONTHS[m.group(1)], int(m.group(2)), m.group(3))
+
+    if m := _DOTTED_RE.search(text):
+        return _with_year(today, int(m.group(2)), int(m.group(1)), m.group(3))
+    if m := _SLASHED_RE.search(text):
+        first, second = int(m.group(1)), int(m.group(2))
+        # US order (month/day) unless that cannot be a valid month
+        month, day = (second, first) if first > 12 else (first, second)
+        return _with_year(today, month, day, m.group(3))
+    if m := _ORDINAL_RE.search(text):
+        return _day_of_month(today, int(m.group(1) or m.group(2)))
+
+    if m := _RELATIVE_RE.search(text):
+        return today + timedelta(days=_RELATIVE_OFFSETS[m.group(1)])
+    if m := _IN_DAYS_RE.search(text):
+        return today + timedelta(days=_number(m.group(1)))
+
+    if m := _WEEKDAY_RE.search(text):
+        qualifier, weekday = m.group(1), WEEKDAYS[m.group(2)]
+        ahead = (weekday - today.weekday()) % 7
+        if ahead == 0 and qualifier and qualifier.startswith(("next", "nächst", "naechst")):
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    return None
+
+
+def _apply_hint(hour: int, text: str) -> int:
+    if hour >= 12:
+        return hour
+    if _PM_HINT_RE.search(text):
+        return hour + 12
+    if _AM_HINT_RE.search(text):
+        return hour
+    if _LUNCH_HINT_RE.search(text):
+        return hour + 12 if hour <= _LUNCH_PM_MAX_HOUR else hour
+    return hour + 12 if 1 <= hour <= _AMBIGUOUS_PM_MAX_HOUR else hour
+
+
+def _strip_dates(text: str) -> str:
+    for pattern in _DATE_PATTERNS:
+        text = pattern.sub(" ", text)
+    return text.strip()
+
+
+@lru_cache(maxsize=1024)
+def _parse_time(text: str) -> time | None:
+    text = _strip_dates(text)
+
+    if m := _MERIDIEM_RE.search(text):
+        hour, minute = _number(m.group(1)) % 12, _minutes(m.group(2))
+        if m.group(3).startswith("p"):
+            hour += 12
+        return time(hour, minute)
+
+    if m := _CLOCK_RE.search(text):
+        # HH:MM is read as a 24-hour clock unless the caller said "evening"
+        hour = int(m.group(1))
+        if hour < 12 and _PM_HINT_RE.search(text):
+            hour += 12
+        return time(hour % 24, int(m.group(2)))
+
+    # The remaining forms are 12-hour clock readings that need a hint
+    if (m := _UHR_RE.search(text)) or (m := _SPOKEN_CLOCK_RE.search(text)):
+        hour, minute = _number(m.group(1)), _minutes(m.group(2))
+    elif m := _HALF_PAST_RE.search(text):
+        hour, minute = _number(m.group(1)), 30
+    elif m := _QUARTER_RE.search(text):
+        hour = _number(m.group(2))
+        hour, minute = (hour, 15) if m.group(1) in ("past", "after") else (hour - 1, 45)
+    elif m := _HALB_RE.search(text):
+        # German "halb acht" is half an hour *before* eight
+        hour, minute = _number(m.group(1)) - 1, 30
+    elif m := _VIERTEL_RE.search(text):
+        hour = _number(m.group(2))
+        hour, minute = (hour, 15) if m.group(1).endswith("nach") else (hour - 1, 45)
+    elif _NOON_RE.search(text):
+        return time(12, 0)
+    elif _MIDNIGHT_RE.search(text):
+        return time(0, 0)
+    elif m := _OCLOCK_RE.search(text):
+        hour, minute = _number(m.group(1)), 0
+    elif m := _BARE_HOUR_RE.search(text):
+        hour, minute = _number(m.group(1) or m.group(2)), 0
+    else:
+        return None
+
+    if hour > 24 or minute > 59:
+        return None
+    if hour == 0:
+        # "halb eins" / "quarter to one" land on 0 here, which means 12
+        hour = 12
+    return time(_apply_hint(hour, text) % 24, minute)
+
+
+def parse_booking_datetime(date_text: str, time_text: str = "", *, now: datetime | None = None) -> datetime:
+    """Resolve a spoken date and time to a naive local datetime.
+
+    Either argument may contain both parts ("tomorrow at 7pm"); whichever
+    part is missing from one argument is looked for in the other.
+
+    Raises:
+        ValueError: if no date or no time can be recognized.
+    """
+    today = (now or restaurant_now()).date()
+    date_part = _normalize(date_text)
+    time_part = _normalize(time_text)
+
+    try:
+        day = _parse_date(date_part, today) or _parse_date(time_part, today)
+        clock = _parse_time(time_part) if time_part else None
+        if clock is None:
+            clock = _parse_time(date_part)
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"invalid date/time {date_text!r} {time_text!r}: {e}") from None
+
+    if day is None:
+        raise ValueError(f"could not understand date {date_text!r}")
+    if clock is None:
+        raise ValueError(f"could not understand time {time_text or date_text!r}")
+    return datetime.combine(day, clock)
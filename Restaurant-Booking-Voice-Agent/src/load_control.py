@@ -0,0 +1,245 @@
+"""Load reporting and admission control for the LiveKit worker.
+
+LiveKit's default load function only looks at host CPU, so a worker kept
+accepting calls while its job processes' event loops were lagging or their
+booking backlog was piling up, and every caller on it got slow turns.
+
+Two halves cooperate through small status files under LOAD_STATUS_DIR:
+
+- Each job process runs a `ProcessStatusWriter`, which measures its event
+  loop lag and pending outbound I/O (Airtable writes and n8n events it has
+  not sent yet) and rewrites `<dir>/<worker pid>/<pid>.json` every second.
+- The worker process passes a `LoadMonitor` as `WorkerOptions.load_fnc`. It
+  combines CPU, active session count, the worst loop lag and the total
+  pending I/O reported by its job processes into one load value.
+
+Job processes are forked from LiveKit's forkserver, not the worker, so they
+learn the worker's PID from LOAD_WORKER_PID, which the worker sets with
+`publish_worker_pid()` before any job process starts.
+
+Each signal is scaled so that reaching its limit reports exactly the load
+threshold, at which point LiveKit marks the worker full and routes new calls
+elsewhere; calls in progress are unaffected:
+
+    load = max(cpu, threshold * sessions / LOAD_MAX_SESSIONS,
+               threshold * loop_lag / LOAD_MAX_LOOP_LAG,
+               threshold * pending_io / LOAD_MAX_PENDING_IO)
+
+For rolling deploys, creating DRAIN_FILE (e.g. `touch var/drain` from a
+pre-stop hook) reports full load, so the worker takes no new calls while
+the current ones finish; SIGTERM then waits up to DRAIN_TIMEOUT seconds
+for them. Removing the file puts the worker back into rotation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from livekit.agents import utils
+from livekit.agents.utils.hw import get_cpu_monitor
+
+import tracing
+
+logger = logging.getLogger("agent.load")
+
+
+@dataclass
+class ProcessStatus:
+    pid: int
+    ts: float
+    loop_lag: float
+    pending_io: int
+
+
+WORKER_PID_ENV = "LOAD_WORKER_PID"
+
+
+def _status_dir(directory: str, worker_pid: int) -> str:
+    return os.path.join(directory, str(worker_pid))
+
+
+def publish_worker_pid() -> None:
+    """Tell the job processes this worker starts where to report (call before `cli.run_app`)."""
+    os.environ[WORKER_PID_ENV] = str(os.getpid())
+
+
+def _published_worker_pid() -> int | None:
+    published = os.getenv(WORKER_PID_ENV)
+    return int(published) if published else None
+
+
+class ProcessStatusWriter:
+    """Publishes this job process's loop lag and pending I/O for the worker."""
+
+    def __init__(
+        self,
+        directory: str,
+        pending_io: Callable[[], Awaitable[int]],
+        *,
+        interval: float = 1.0,
+        worker_pid: int | None = None,
+    ) -> None:
+        # Without a published PID, assume the worker forked this process itself
+        self.directory = _status_dir(directory, worker_pid or _published_worker_pid() or os.getppid())
+        self.interval = interval
+        self._pending_io = pending_io
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls, pending_io: Callable[[], Awaitable[int]]) -> ProcessStatusWriter:
+        return cls(os.getenv("LOAD_STATUS_DIR", "var/load"), pending_io)
+
+    def start(self) -> None:
+        """Start publishing on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="load-status")
+
+    def write(self, status: ProcessStatus) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{status.pid}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(vars(status), f)
+        # Readers never see a half-written file
+        os.replace(f"{path}.tmp", path)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            tracing.observe("event_loop.lag", lag, room="", language="")
+            try:
+                pending = await self._pending_io()
+                status = ProcessStatus(os.getpid(), time.time(), lag, pending)
+                await loop.run_in_executor(None, self.write, status)
+            except Exception as e:
+                logger.warning("⚠️ Could not publish load status: %s", e)
+
+
+def read_statuses(directory: str, worker_pid: int, *, max_age: float) -> list[ProcessStatus]:
+    """Fresh status reports of a worker's job processes; stale files are removed."""
+    statuses = []
+    now = time.time()
+    try:
+        names = os.listdir(_status_dir(directory, worker_pid))
+    except FileNotFoundError:
+        return []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(_status_dir(directory, worker_pid), name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                status = ProcessStatus(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            continue
+        if now - status.ts > max_age:
+            # The process exited (or is wedged); either way it takes no new calls
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            continue
+        statuses.append(status)
+    return statuses
+
+
+class _CpuSampler:
+    """Moving average of CPU use, sampled on a daemon thread like LiveKit's default."""
+
+    def __init__(self) -> None:
+        self._monitor = get_cpu_monitor()
+        self._avg = utils.MovingAverage(5)
+        self._lock = threading.Lock()
+        threading.Thread(target=self._sample, daemon=True, name="load_cpu_monitor").start()
+
+    def _sample(self) -> None:
+        while True:
+            value = self._monitor.cpu_percent(interval=0.5)
+            with self._lock:
+                self._avg.add_sample(value)
+
+    def __call__(self) -> float:
+        with self._lock:
+            return self._avg.get_avg()
+
+
+class LoadMonitor:
+    def __init__(
+        self,
+        directory: str = "var/load",
+        *,
+        threshold: float = 0.7,
+        max_sessions: int = 25,
+        max_loop_lag: float = 0.1,
+        max_pending_io: int = 200,
+        drain_file: str = "var/drain",
+        status_max_age: float = 5.0,
+        cpu: Callable[[], float] | None = None,
+    ) -> None:
+        self.directory = directory
+        self.threshold = threshold
+        self.max_sessions = max_sessions
+        self.max_loop_lag = max_loop_lag
+        self.max_pending_io = max_pending_io
+        self.drain_file = drain_file
+        self.status_max_age = status_max_age
+        self._cpu = cpu
+        self._draining = False
+        self._full_reason: str | None = None
+
+    @classmethod
+    def from_env(cls) -> LoadMonitor:
+        return cls(
+            os.getenv("LOAD_STATUS_DIR", "var/load"),
+            threshold=float(os.getenv("LOAD_THRESHOLD", "0.7")),
+            max_sessions=int(os.getenv("LOAD_MAX_SESSIONS", "25")),
+            max_loop_lag=float(os.getenv("LOAD_MAX_LOOP_LAG", "0.1")),
+            max_pending_io=int(os.getenv("LOAD_MAX_PENDING_IO", "200")),
+            drain_file=os.getenv("DRAIN_FILE", "var/drain"),
+        )
+
+    def components(self, active_sessions: int) -> dict[str, float]:
+        """Each signal's contribution to the load, keyed by name."""
+        if self._cpu is None:
+            self._cpu = _CpuSampler()
+        worker_pid = _published_worker_pid() or os.getpid()
+        statuses = read_statuses(self.directory, worker_pid, max_age=self.status_max_age)
+        loop_lag = max((s.loop_lag for s in statuses), default=0.0)
+        pending_io = sum(s.pending_io for s in statuses)
+        return {
+            "cpu": self._cpu(),
+            "sessions": self.threshold * active_sessions / self.max_sessions,
+            "loop_lag": self.threshold * loop_lag / self.max_loop_lag,
+            "pending_io": self.threshold * pending_io / self.max_pending_io,
+        }
+
+    def __call__(self, worker) -> float:
+        """`WorkerOptions.load_fnc`; runs on a worker thread every half second."""
+        draining = os.path.exists(self.drain_file)
+        if draining != self._draining:
+            self._draining = draining
+            if draining:
+                logger.info("🚧 Drain file %s found, accepting no new calls", self.drain_file)
+            else:
+                logger.info("🚦 Drain file removed, accepting calls again")
+        if draining:
+            return 1.0
+
+        components = self.components(len(worker.active_jobs))
+        reason, load = max(components.items(), key=lambda item: item[1])
+        full_reason = reason if load >= self.threshold else None
+        if full_reason != self._full_reason:
+            self._full_reason = full_reason
+            if full_reason:
+                logger.warning("🚦 Worker full (%s at %.2f), accepting no new calls", reason, load)
+            else:
+                logger.info("🚦 Worker below load threshold, accepting calls again")
+        return min(load, 1.0)
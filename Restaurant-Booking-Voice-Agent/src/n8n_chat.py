@@ -0,0 +1,236 @@
+"""Conversation mode backed by an n8n AI-agent workflow.
+
+With AGENT_MODE=n8n the agent does not run its own LLM: every user turn is
+POSTed to N8N_CHAT_URL as `{"usermessage": ..., "sessionKey": ...}` and the
+workflow's reply is spoken. The session key is derived from the LiveKit room,
+so each caller gets their own n8n memory window.
+
+`N8nLLM` plugs the workflow into the normal voice pipeline as an `llm.LLM`.
+The reply is read incrementally and each piece is handed to TTS as it
+arrives, so the caller hears the first words while n8n is still generating.
+These response shapes are understood:
+
+- n8n streaming responses (Webhook "Respond: Streaming"), i.e. JSON lines
+  of `{"type": "begin" | "item" | "end", "content": ...}`
+- server-sent events (`text/event-stream`, one `data:` line per chunk)
+- chunked `text/plain`
+- a single JSON object carrying `agentOutput`, `output` or `response`
+  (classic "Respond to Webhook"), spoken once it is complete
+
+One `N8nChatClient` with a pooled keep-alive session is shared by all
+sessions in a job process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import json
+import logging
+import os
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+import aiohttp
+from livekit.agents import llm
+from livekit.agents.types import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    APIConnectOptions,
+)
+
+logger = logging.getLogger("agent.n8n_chat")
+
+# Event types of n8n's streaming webhook response
+_STREAM_EVENTS = {"begin", "item", "end", "error"}
+_REPLY_KEYS = ("agentOutput", "output", "response", "text")
+
+
+class N8nChatError(Exception):
+    """Raised when the n8n workflow answers with a non-2xx status, or with
+    status 0 when no workflow URL is configured."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"n8n returned {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+def extract_reply(data: Any) -> str | None:
+    """Pull the reply text out of a non-streaming n8n response body."""
+    if isinstance(data, list) and data:
+        data = data[0]
+    if isinstance(data, dict):
+        for key in _REPLY_KEYS:
+            if isinstance(data.get(key), str):
+                return data[key]
+    return None
+
+
+def _json_or_none(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+class N8nChatClient:
+    def __init__(
+        self,
+        url: str | None,
+        *,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 30.0,
+        pool_size: int = 10,
+        keepalive_timeout: float = 30.0,
+    ) -> None:
+        self.url = url
+        # No total timeout: a long reply keeps streaming as long as chunks arrive
+        self._timeout = aiohttp.ClientTimeout(
+            total=None, connect=connect_timeout, sock_read=read_timeout
+        )
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+
+    @classmethod
+    def from_env(cls) -> N8nChatClient:
+        return cls(
+            os.getenv("N8N_CHAT_URL"),
+            connect_timeout=float(os.getenv("N8N_CHAT_CONNECT_TIMEOUT", "3")),
+            read_timeout=float(os.getenv("N8N_CHAT_READ_TIMEOUT", "30")),
+            pool_size=int(os.getenv("N8N_CHAT_POOL_SIZE", "10")),
+        )
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                keepalive_timeout=self._keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+            self._session_loop = loop
+        return self._session
+
+    async def stream(self, message: str, session_key: str) -> AsyncIterator[str]:
+        """POST one user turn and yield the reply text as it arrives."""
+        if not self.url:
+            raise N8nChatError(0, "N8N_CHAT_URL is not set")
+        session = self._ensure_session()
+        payload = {"usermessage": message, "sessionKey": session_key}
+        async with session.post(self.url, json=payload) as resp:
+            if resp.status >= 400:
+                raise N8nChatError(resp.status, (await resp.text())[:200])
+
+            if resp.content_type == "text/plain":
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                async for chunk in resp.content.iter_any():
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield text
+                return
+
+            event_stream = resp.content_type == "text/event-stream"
+            unframed: list[bytes] = []
+            async for raw_line in resp.content:
+                line = raw_line.decode("utf-8", errors="replace").strip()
+                if event_stream:
+                    if not line.startswith("data:"):
+                        continue
+                    line = line[5:].strip()
+                if not line:
+                    continue
+
+                event = _json_or_none(line)
+                if isinstance(event, dict) and event.get("type") in _STREAM_EVENTS:
+                    if event["type"] == "error":
+                        raise N8nChatError(resp.status, str(event.get("content", ""))[:200])
+                    if event["type"] == "item" and event.get("content"):
+                        yield event["content"]
+                elif event_stream:
+                    yield extract_reply(event) or line
+                else:
+                    unframed.append(raw_line)
+
+            # A classic single JSON (or plain) body, only usable once complete
+            if unframed:
+                body = b"".join(unframed).decode("utf-8", errors="replace")
+                reply = extract_reply(_json_or_none(body))
+                if reply is None and resp.content_type != "application/json":
+                    reply = body.strip()
+                if reply:
+                    yield reply
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+
+class N8nLLM(llm.LLM):
+    """Speaks the n8n workflow's replies in place of a model completion."""
+
+    def __init__(self, client: N8nChatClient, session_key: str, *, fallback: str) -> None:
+        super().__init__()
+        self.client = client
+        self.session_key = session_key
+        self.fallback = fallback
+
+    @property
+    def model(self) -> str:
+        return "n8n-workflow"
+
+    @property
+    def provider(self) -> str:
+        return "n8n"
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list[llm.FunctionTool | llm.RawFunctionTool] | None = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        parallel_tool_calls=NOT_GIVEN,
+        tool_choice=NOT_GIVEN,
+        extra_kwargs=NOT_GIVEN,
+    ) -> N8nLLMStream:
+        # The workflow owns prompt, memory and tools; only the latest user turn is sent
+        return N8nLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class N8nLLMStream(llm.LLMStream):
+    async def _run(self) -> None:
+        assert isinstance(self._llm, N8nLLM)
+        message = next(
+            (
+                item.text_content
+                for item in reversed(self._chat_ctx.items)
+                if item.type == "message" and item.role == "user" and item.text_content
+            ),
+            None,
+        )
+        if not message:
+            return
+
+        request_id = f"n8n_{uuid.uuid4().hex[:12]}"
+        spoke = False
+        try:
+            async for text in self._llm.client.stream(message, self._llm.session_key):
+                self._event_ch.send_nowait(
+                    llm.ChatChunk(id=request_id, delta=llm.ChoiceDelta(role="assistant", content=text))
+                )
+                spoke = True
+        except (N8nChatError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("❌ n8n chat request failed: %s", e)
+            # Retrying would post the turn into n8n's memory twice, so fall back instead
+            if not spoke:
+                self._event_ch.send_nowait(
+                    llm.ChatChunk(
+                        id=request_id,
+                        delta=llm.ChoiceDelta(role="assistant", content=self._llm.fallback),
+                    )
+                )
@@ -0,0 +1,168 @@
+"""Host-wide rate limiting for outbound Airtable and n8n calls.
+
+Airtable allows about 5 requests per second per base, but every LiveKit job
+process on a host talks to it on its own, so at a dinner-rush peak the
+processes together overshoot and get 429s. `SharedRateLimiter` is a token
+bucket whose state lives in a small file under RATE_LIMIT_DIR (one per
+limiter name, e.g. per Airtable base), so all processes on the host draw
+from the same budget.
+
+The bucket is kept as a single timestamp (the "theoretical arrival time" of
+the generic cell rate algorithm). A caller takes the file lock for a few
+microseconds, reserves the next free send slot, releases the lock and
+sleeps until its slot comes up. Slots are handed out in the order they are
+requested, across all processes, so a busy process cannot starve a quiet
+one, and calls are spaced out evenly instead of bursting. A call whose slot
+would be more than `max_wait` seconds away is refused with
+`RateLimitTimeoutError` rather than queued.
+
+Each limiter publishes its host-wide queue depth (reserved calls still
+waiting for their slot) and this process's waiters on `/metrics`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import math
+import os
+import re
+import struct
+import time
+
+import tracing
+
+logger = logging.getLogger("agent.ratelimit")
+
+_STATE = struct.Struct("d")
+
+
+class RateLimitTimeoutError(Exception):
+    """Raised when no send slot is free within `max_wait` seconds."""
+
+    def __init__(self, name: str, wait: float) -> None:
+        super().__init__(f"rate limit {name}: next slot in {wait:.1f}s")
+        self.name = name
+        self.wait = wait
+
+
+class SharedRateLimiter:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        *,
+        burst: int = 1,
+        max_wait: float = 10.0,
+        directory: str = "var/rate_limits",
+    ) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_wait = max_wait
+        self.path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".bucket")
+        self._fd: int | None = None
+        self._waiting = 0
+        self._gauges = {"host": self.queue_depth, "process": self._process_waiting}
+        for scope, read in self._gauges.items():
+            tracing.REGISTRY.gauge("agent_rate_limit_queue_depth", read, limiter=name, scope=scope)
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, *, rate: float, burst: int = 1) -> SharedRateLimiter:
+        """Read `<prefix>_RATE_LIMIT` (calls/s, 0 disables), `_RATE_BURST` and `_RATE_MAX_WAIT`."""
+        return cls(
+            name,
+            float(os.getenv(f"{prefix}_RATE_LIMIT", str(rate))),
+            burst=int(os.getenv(f"{prefix}_RATE_BURST", str(burst))),
+            max_wait=float(os.getenv(f"{prefix}_RATE_MAX_WAIT", "10")),
+            directory=os.getenv("RATE_LIMIT_DIR", "var/rate_limits"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    @property
+    def _interval(self) -> float:
+        return 1.0 / self.rate
+
+    @property
+    def _tolerance(self) -> float:
+        # How far ahead of the schedule a burst may run
+        return (self.burst - 1) * self._interval
+
+    def _open(self) -> int:
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        return self._fd
+
+    def _read(self, fd: int, now: float) -> float:
+        data = os.pread(fd, _STATE.size, 0)
+        tat = _STATE.unpack(data)[0] if len(data) == _STATE.size else now
+        # A schedule further out than any caller may queue is left over from
+        # before a reboot (the monotonic clock restarted); start afresh
+        if tat > now + self.max_wait + self._tolerance + self._interval + 1:
+            return now
+        return max(tat, now)
+
+    def _reserve(self) -> float:
+        # The lock is held only for a read and a write of 8 bytes, so taking
+        # it on the event loop is cheaper than a hop to a thread
+        fd = self._open()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            now = time.monotonic()
+            tat = self._read(fd, now)
+            wait = max(0.0, tat - self._tolerance - now)
+            if wait > self.max_wait:
+                raise RateLimitTimeoutError(self.name, wait)
+            os.pwrite(fd, _STATE.pack(tat + self._interval), 0)
+            return wait
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    async def acquire(self) -> float:
+        """Wait for this call's send slot. Returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        try:
+            wait = self._reserve()
+        except RateLimitTimeoutError as e:
+            logger.warning("🚦 %s", e)
+            raise
+        if wait:
+            self._waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting -= 1
+        tracing.observe(f"ratelimit.{self.name}", wait, room="", language="")
+        return wait
+
+    def _process_waiting(self) -> int:
+        return self._waiting
+
+    def queue_depth(self) -> int:
+        """Calls on this host that hold a slot which has not come up yet."""
+        if not self.enabled:
+            return 0
+        fd = self._open()
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            now = time.monotonic()
+            backlog = self._read(fd, now) - self._tolerance - now
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        # The most recent reservation's slot is one interval before the stored time
+        return max(0, math.ceil(backlog / self._interval - 1e-9) - 1)
+
+    def close(self) -> None:
+        for scope, read in self._gauges.items():
+            tracing.REGISTRY.remove_gauge(
+                "agent_rate_limit_queue_depth", read, limiter=self.name, scope=scope
+            )
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
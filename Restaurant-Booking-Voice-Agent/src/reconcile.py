@@ -0,0 +1,357 @@
+"""Incremental reconciliation between the booking journal and Airtable.
+
+Bookings reach the "Order Summary" table through the outbox, which gives up
+on a row after BOOKING_OUTBOX_MAX_ATTEMPTS failed sends, and staff edit and
+delete rows by hand, so the journal and the table drift apart. Finding the
+drift used to mean comparing the whole table by hand.
+
+A run looks only at what changed since the previous run:
+
+- Airtable rows modified since then, read with a LAST_MODIFIED_TIME()
+  cursor (the whole table on the first run, or with --full),
+- journal rows created or sent since then, rows the outbox gave up on,
+  and rows whose repair failed last time.
+
+Each side is reduced to a hash of the fields the agent writes, normalized
+so "10/15/2025" and "2025-10-15" compare equal. The hash and record id of
+every Airtable row seen are kept in a small SQLite state file, so an
+unchanged row is never read from Airtable again. Then:
+
+- booked in the journal but not in Airtable: upserted (missing)
+- different in Airtable: upserted (mismatched) if the journal's version
+  never reached Airtable; if Airtable acknowledged it, the difference is a
+  staff edit, which is reported and left alone
+- cancelled in the journal but still in Airtable: deleted
+- in Airtable but not in the journal (entered by hand, or booked on another
+  host): reported only
+- not yet sent by the outbox: skipped, the outbox delivers it
+
+Writes go out in batches of up to MAX_RECORDS_PER_REQUEST through the
+client's host-wide rate limiter, so a run shares Airtable's per-base limit
+with the job processes instead of competing with them. Repaired rows are
+marked sent in the journal. Rows deleted in Airtable do not show up in a
+modified-time query; a --full run now and then finds them. n8n events are
+not covered; failed deliveries are in the webhook dead-letter file.
+
+    python src/reconcile.py [--tenant nord] [--dry-run] [--full] [--state var/reconcile.db]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import aiohttp
+
+from airtable_client import MAX_RECORDS_PER_REQUEST, AirtableError, AsyncAirtableClient
+from booking_outbox import BookingOutbox, JournalRow
+
+logger = logging.getLogger("agent.reconcile")
+
+# The fields `book_table` writes; columns staff add are not compared
+FIELDS = ("Reservation ID", "Customer Name", "Reservation Date", "Reservation Time", "Reservation Summary")
+
+# Allowance for clock skew between this host and Airtable
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS remote (
+    reservation_id TEXT PRIMARY KEY,
+    airtable_id    TEXT NOT NULL,
+    hash           TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _normalize(name: str, value: Any) -> str:
+    text = " ".join(str(value if value is not None else "").split())
+    if name == "Reservation Date" and text:
+        for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(text[:10], fmt).date().isoformat()
+            except ValueError:
+                pass
+    return text
+
+
+def record_hash(fields: dict[str, Any]) -> str:
+    normalized = {name: _normalize(name, fields.get(name)) for name in FIELDS}
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@dataclass
+class ReconcileReport:
+    remote_changed: int = 0
+    local_changed: int = 0
+    in_sync: int = 0
+    in_flight: int = 0
+    missing: list[str] = field(default_factory=list)
+    mismatched: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    edited_in_airtable: list[str] = field(default_factory=list)
+    airtable_only: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.remote_changed} Airtable and {self.local_changed} journal rows changed: "
+            f"{self.in_sync} in sync, {len(self.missing)} missing, {len(self.mismatched)} mismatched, "
+            f"{len(self.deleted)} deleted, {len(self.edited_in_airtable)} edited in Airtable, "
+            f"{len(self.airtable_only)} only in Airtable, {self.in_flight} still in the outbox, "
+            f"{len(self.failed)} failed ({self.seconds:.2f}s)"
+        )
+
+
+class ReconcileState:
+    """Last seen hash of each Airtable row, and the run cursors."""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def meta(self) -> dict[str, Any]:
+        return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+
+    def remote(self, reservation_ids: list[str]) -> dict[str, tuple[str, str]]:
+        found = {}
+        for i in range(0, len(reservation_ids), 500):
+            chunk = reservation_ids[i : i + 500]
+            found.update(
+                (rid, (airtable_id, digest))
+                for rid, airtable_id, digest in self._conn.execute(
+                    "SELECT reservation_id, airtable_id, hash FROM remote "
+                    f"WHERE reservation_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return found
+
+    def save(self, seen: dict[str, tuple[str, str]], gone: list[str], meta: dict[str, Any], *, full: bool) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            if full:
+                self._conn.execute("DELETE FROM remote")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO remote (reservation_id, airtable_id, hash) VALUES (?, ?, ?)",
+                [(rid, airtable_id, digest) for rid, (airtable_id, digest) in seen.items()],
+            )
+            self._conn.executemany("DELETE FROM remote WHERE reservation_id = ?", [(rid,) for rid in gone])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in meta.items()],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class Reconciler:
+    def __init__(self, airtable: AsyncAirtableClient, outbox: BookingOutbox, state: ReconcileState) -> None:
+        self.airtable = airtable
+        self.outbox = outbox
+        self.state = state
+
+    async def run(self, *, full: bool = False, dry_run: bool = False) -> ReconcileReport:
+        started = time.perf_counter()
+        report = ReconcileReport()
+        meta = await asyncio.to_thread(self.state.meta)
+        full = full or "airtable_cursor" not in meta
+        remote_started = datetime.now(timezone.utc) - CURSOR_OVERLAP
+        # Covers a flusher that stamped sent_at just before this and commits just after
+        local_started = time.time() - 1.0
+
+        # Airtable rows changed since the last run
+        changed: dict[str, tuple[str, str]] = {}
+        formula = None if full else f"IS_AFTER(LAST_MODIFIED_TIME(), '{meta['airtable_cursor']}')"
+        async for page in self.airtable.iterate(formula=formula, fields=list(FIELDS)):
+            for record in page:
+                rid = record.get("fields", {}).get("Reservation ID")
+                if rid:
+                    changed[rid] = (record["id"], record_hash(record["fields"]))
+        report.remote_changed = len(changed)
+
+        # Journal rows changed since the last run, or changed in Airtable
+        retry = meta.get("retry", [])
+        rows = await self.outbox.changed_since(
+            0.0 if full else meta.get("journal_cursor", 0.0), [*changed, *retry]
+        )
+        local = {row.reservation_id: row for row in rows}
+        report.local_changed = len(local.keys() - changed.keys())
+        if full:
+            # A full read is all of Airtable: a row missing from it was deleted there,
+            # whatever the state remembers
+            remote = changed
+        else:
+            known = await asyncio.to_thread(self.state.remote, [rid for rid in local if rid not in changed])
+            remote = {**known, **changed}
+
+        upserts: list[JournalRow] = []
+        deletes: list[tuple[JournalRow, str]] = []
+        reconciled: list[tuple[str, str | None, int]] = []
+        gone: list[str] = []
+        for rid in sorted(local.keys() | changed.keys()):
+            row = local.get(rid)
+            seen = remote.get(rid)
+            if row is None:
+                report.airtable_only.append(rid)
+            elif not row.sent and not row.given_up:
+                report.in_flight += 1
+            elif row.cancelled:
+                if seen is not None and (row.given_up or rid in changed):
+                    deletes.append((row, seen[0]))
+                else:
+                    # The outbox's delete was acknowledged
+                    gone.append(rid)
+                    report.in_sync += 1
+                    if row.given_up:
+                        reconciled.append((rid, None, row.version))
+            elif seen is None:
+                report.missing.append(rid)
+                upserts.append(row)
+            elif seen[1] == record_hash(row.fields):
+                report.in_sync += 1
+                if row.given_up:
+                    reconciled.append((rid, seen[0], row.version))
+            elif row.sent and rid not in retry:
+                # Reported in the run that saw the edit, not again
+                if rid in changed:
+                    report.edited_in_airtable.append(rid)
+            else:
+                report.mismatched.append(rid)
+                upserts.append(row)
+        report.deleted = [row.reservation_id for row, _ in deletes]
+
+        if not dry_run:
+            written = await self._upsert(upserts, report)
+            removed = await self._delete(deletes, report)
+            for row, airtable_id in written:
+                remote[row.reservation_id] = (airtable_id, record_hash(row.fields))
+                reconciled.append((row.reservation_id, airtable_id, row.version))
+            for row in removed:
+                remote.pop(row.reservation_id, None)
+                gone.append(row.reservation_id)
+                reconciled.append((row.reservation_id, None, row.version))
+            if reconciled:
+                await self.outbox.mark_reconciled(reconciled)
+            written_ids = [row.reservation_id for row, _ in written]
+            seen = {rid: remote[rid] for rid in [*changed, *written_ids] if rid in remote}
+            await asyncio.to_thread(
+                self.state.save,
+                seen,
+                gone,
+                {
+                    "airtable_cursor": remote_started.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    "journal_cursor": local_started,
+                    "retry": sorted(report.failed),
+                },
+                full=full,
+            )
+
+        report.seconds = time.perf_counter() - started
+        return report
+
+    async def _write(self, rows: list, request, failed: list[str], key) -> list:
+        """Send `rows` in batches; a failed batch is retried on the next run."""
+        done = []
+        for i in range(0, len(rows), MAX_RECORDS_PER_REQUEST):
+            batch = rows[i : i + MAX_RECORDS_PER_REQUEST]
+            try:
+                done += await request(batch)
+            except (AirtableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("⚠️ Reconcile write of %s records failed: %s", len(batch), e)
+                failed += [key(item) for item in batch]
+        return done
+
+    async def _upsert(self, rows: list[JournalRow], report: ReconcileReport) -> list[tuple[JournalRow, str]]:
+        async def request(batch: list[JournalRow]) -> list[tuple[JournalRow, str]]:
+            result = await self.airtable.batch_upsert([row.fields for row in batch], merge_on=["Reservation ID"])
+            return [(row, record["id"]) for row, record in zip(batch, result)]
+
+        return await self._write(rows, request, report.failed, lambda row: row.reservation_id)
+
+    async def _delete(self, rows: list[tuple[JournalRow, str]], report: ReconcileReport) -> list[JournalRow]:
+        async def request(batch: list[tuple[JournalRow, str]]) -> list[JournalRow]:
+            try:
+                await self.airtable.batch_delete([airtable_id for _, airtable_id in batch])
+            except AirtableError as e:
+                # Already deleted by someone else
+                if e.status != 404:
+                    raise
+            return [row for row, _ in batch]
+
+        return await self._write(rows, request, report.failed, lambda item: item[0].reservation_id)
+
+
+async def _reconcile(args) -> int:
+    from tenants import DEFAULT_TENANT, TenantRegistry
+
+    config = await asyncio.to_thread(TenantRegistry.from_env().load_config, args.tenant)
+    airtable = AsyncAirtableClient.from_env(base_id=config.airtable_base_id, table_name=config.airtable_table_name)
+    if not airtable.configured:
+        print("AIRTABLE_API_TOKEN is not set")
+        return 2
+    outbox = BookingOutbox.from_env(airtable, path=config.outbox_path)
+    state_path = args.state or (
+        "var/reconcile.db" if args.tenant == DEFAULT_TENANT else f"var/tenants/{args.tenant}/reconcile.db"
+    )
+    state = ReconcileState(state_path)
+    try:
+        report = await Reconciler(airtable, outbox, state).run(full=args.full, dry_run=args.dry_run)
+    finally:
+        await outbox.aclose()
+        await airtable.aclose()
+        state.close()
+
+    print(("Dry run, nothing written. " if args.dry_run else "") + report.summary())
+    for label, ids in (
+        ("missing", report.missing),
+        ("mismatched", report.mismatched),
+        ("deleted", report.deleted),
+        ("edited in Airtable", report.edited_in_airtable),
+        ("only in Airtable", report.airtable_only),
+        ("failed", report.failed),
+    ):
+        if ids and (args.verbose or label != "only in Airtable"):
+            print(f"  {label}: {', '.join(ids)}")
+    return 1 if report.failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Repair drift between the booking journal and Airtable.")
+    parser.add_argument("--tenant", default="default")
+    parser.add_argument("--state", help="state file (default var/reconcile.db, per tenant under var/tenants/)")
+    parser.add_argument("--full", action="store_true", help="read the whole table, e.g. to find deleted rows")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing anything")
+    parser.add_argument("--verbose", action="store_true", help="also list rows only in Airtable")
+    args = parser.parse_args(argv)
+    return asyncio.run(_reconcile(args))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv(".env.local")
+    raise SystemExit(main())
@@ -0,0 +1,256 @@
+"""Collision-free, read-aloud-friendly reservation IDs.
+
+IDs used to be five random characters with no uniqueness check, so at our
+volume two bookings would eventually share an ID. `ReservationIdAllocator`
+hands out IDs from a counter instead:
+
+- the alphabet drops 0/O, 1/I/L, leaving 31 characters that are hard to
+  mishear or misread, and IDs stay five characters (28.6M of them)
+- the counter is shared by every job process on the host through a small
+  SQLite file, and is advanced in the same transaction that records the ID
+- counter values go through a fixed bijection on the ID space, so
+  consecutive bookings get unrelated-looking IDs without ever colliding
+- hosts sharing one Airtable base get disjoint counter lanes via
+  RESERVATION_ID_NODE / RESERVATION_ID_NODES
+
+IDs issued before the allocator existed are kept in a one-bit-per-ID bitmap
+of the whole ID space (3.6MB), warm-loaded at startup; any counter value
+landing on one of them is skipped. They come from the outbox journal and
+from every row of the Airtable table, past and legacy ones included, since
+the outbox upserts on Reservation ID and would overwrite such a row.
+`sync_airtable` reads the whole table's Reservation IDs once per host and
+records them in the SQLite file; later calls only read rows modified since
+(a LAST_MODIFIED_TIME() cursor kept in the same file). The check is O(1)
+and the booking path never goes to the network. As with the outbox, SQLite
+work runs on one dedicated thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from airtable_client import AsyncAirtableClient
+
+ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+ID_LENGTH = 5
+ID_SPACE = len(ALPHABET) ** ID_LENGTH
+
+# index = (seq * _MULTIPLIER + _OFFSET) mod ID_SPACE is a bijection because
+# the multiplier shares no factor with 31**5
+_MULTIPLIER = 20_553_869
+_OFFSET = 7_340_033
+_DIGITS = {ch: value for value, ch in enumerate(ALPHABET)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservation_ids (
+    id        TEXT PRIMARY KEY,
+    issued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS id_counter (
+    node INTEGER PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS airtable_sync (
+    table_key TEXT PRIMARY KEY,
+    cursor    TEXT NOT NULL
+);
+"""
+
+
+def encode(index: int) -> str:
+    chars = []
+    for _ in range(ID_LENGTH):
+        index, digit = divmod(index, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def decode(reservation_id: str) -> int | None:
+    """Position of an ID in the ID space, or None if it cannot be one of ours."""
+    if len(reservation_id) != ID_LENGTH:
+        return None
+    index = 0
+    for ch in reservation_id.upper():
+        digit = _DIGITS.get(ch)
+        if digit is None:
+            return None
+        index = index * len(ALPHABET) + digit
+    return index
+
+
+class ReservationIdAllocator:
+    def __init__(self, path: str, *, node: int = 0, nodes: int = 1) -> None:
+        if not 0 <= node < nodes:
+            raise ValueError(f"node must be in 0..{nodes - 1}, got {node}")
+        self.path = path
+        self.node = node
+        self.nodes = nodes
+        self._issued = bytearray(ID_SPACE // 8 + 1)
+        self._loaded = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reservation-ids")
+        self._conn: sqlite3.Connection | None = None
+
+    @classmethod
+    def from_env(cls, *, path: str | None = None) -> ReservationIdAllocator:
+        return cls(
+            path or os.getenv("RESERVATION_ID_PATH", "var/reservation_ids.db"),
+            node=int(os.getenv("RESERVATION_ID_NODE", "0")),
+            nodes=int(os.getenv("RESERVATION_ID_NODES", "1")),
+        )
+
+    # -- bitmap and SQLite (allocator thread only) --------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # No fsync per ID: a counter step lost to a power cut can only
+            # re-issue an ID whose booking never reached the outbox, and those
+            # that did are marked as issued again at warm-up
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _mark(self, reservation_id: str) -> None:
+        index = decode(reservation_id)
+        if index is not None:
+            self._issued[index >> 3] |= 1 << (index & 7)
+
+    def _is_marked(self, index: int) -> bool:
+        return bool(self._issued[index >> 3] & (1 << (index & 7)))
+
+    def _load(self, known: Iterable[str] = ()) -> int:
+        for reservation_id in known:
+            self._mark(reservation_id)
+        if self._loaded:
+            return 0
+        loaded = 0
+        for (reservation_id,) in self._db().execute("SELECT id FROM reservation_ids"):
+            self._mark(reservation_id)
+            loaded += 1
+        self._loaded = True
+        return loaded
+
+    def _sync_cursor(self, table_key: str) -> str | None:
+        row = self._db().execute(
+            "SELECT cursor FROM airtable_sync WHERE table_key = ?", (table_key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _record_known(self, table_key: str, known: list[str], cursor: str) -> int:
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            for reservation_id in known:
+                if decode(reservation_id) is None:
+                    continue
+                added += db.execute(
+                    "INSERT OR IGNORE INTO reservation_ids (id, issued_at) VALUES (?, ?)",
+                    (reservation_id.upper(), now),
+                ).rowcount
+                self._mark(reservation_id)
+            db.execute(
+                "INSERT INTO airtable_sync (table_key, cursor) VALUES (?, ?) "
+                "ON CONFLICT(table_key) DO UPDATE SET cursor = excluded.cursor",
+                (table_key, cursor),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return added
+
+    def _allocate(self, taken: Callable[[str], bool] | None) -> str:
+        self._load()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT next FROM id_counter WHERE node = ?", (self.node,)).fetchone()
+            counter = row[0] if row else 0
+            while True:
+                seq = counter * self.nodes + self.node
+                if seq >= ID_SPACE:
+                    raise RuntimeError("reservation ID space exhausted")
+                counter += 1
+                index = (seq * _MULTIPLIER + _OFFSET) % ID_SPACE
+                if self._is_marked(index):
+                    continue
+                reservation_id = encode(index)
+                if taken is not None and taken(reservation_id):
+                    self._mark(reservation_id)
+                    continue
+                # A row written under a different node layout may already hold it
+                inserted = db.execute(
+                    "INSERT OR IGNORE INTO reservation_ids (id, issued_at) VALUES (?, ?)",
+                    (reservation_id, time.time()),
+                ).rowcount
+                self._mark(reservation_id)
+                if inserted:
+                    break
+            db.execute(
+                "INSERT INTO id_counter (node, next) VALUES (?, ?) "
+                "ON CONFLICT(node) DO UPDATE SET next = excluded.next",
+                (self.node, counter),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return reservation_id
+
+    # -- async API ----------------------------------------------------------
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def warm(self, known: Iterable[str] = ()) -> int:
+        """Load issued IDs into memory, plus `known` IDs issued elsewhere. Returns rows loaded."""
+        return await self._run(self._load, list(known))
+
+    async def sync_airtable(self, airtable: AsyncAirtableClient) -> int:
+        """Mark every Reservation ID in the client's Airtable table as issued.
+
+        Reads the whole table the first time and rows modified since the
+        previous sync afterwards. Returns how many IDs were new.
+        """
+        table_key = f"{airtable.base_id}/{airtable.table_name}"
+        started = datetime.now(timezone.utc) - timedelta(seconds=5)
+        cursor = await self._run(self._sync_cursor, table_key)
+        formula = None if cursor is None else f"IS_AFTER(LAST_MODIFIED_TIME(), '{cursor}')"
+        known = []
+        async for page in airtable.iterate(formula=formula, fields=["Reservation ID"]):
+            for record in page:
+                reservation_id = record.get("fields", {}).get("Reservation ID")
+                if isinstance(reservation_id, str):
+                    known.append(reservation_id)
+        next_cursor = started.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return await self._run(self._record_known, table_key, known, next_cursor)
+
+    async def allocate(self, taken: Callable[[str], bool] | None = None) -> str:
+        """Issue a new ID, skipping any for which `taken(id)` is true."""
+        return await self._run(self._allocate, taken)
+
+    def is_issued(self, reservation_id: str) -> bool:
+        index = decode(reservation_id)
+        return index is not None and self._is_marked(index)
+
+    async def aclose(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,153 @@
+"""Reservations callers can look up, change and cancel during a call.
+
+Callers who wanted to move or cancel a booking used to be told to call back,
+and staff changed Airtable by hand. `ReservationStore` serves these requests
+from the tenant's booking journal (see `BookingOutbox`), which SQLite indexes
+by reservation ID, caller phone number and date, so a lookup takes about a
+millisecond instead of an Airtable filter-formula query mid-turn.
+
+Changes are written to the journal and reach Airtable through the outbox
+flusher in the background. The slot index is updated at once, so the next
+capacity check already sees a moved or cancelled table.
+
+Only reservations journaled on this host, i.e. booked through the agent,
+can be found; rows entered in Airtable by hand are not in the journal.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from booking_outbox import BookingOutbox, JournalEntry
+from slot_holds import SlotHolds
+from slot_index import SlotIndex, parse_airtable_fields
+
+# The table's column for the caller's number, if it has one; `customers` finds
+# returning callers by it
+AIRTABLE_PHONE_FIELD = os.getenv("AIRTABLE_PHONE_FIELD", "")
+
+
+class ReservationNotFoundError(LookupError):
+    """Raised when a reservation disappeared (was cancelled) while being changed."""
+
+
+@dataclass(frozen=True)
+class Reservation:
+    reservation_id: str
+    customer_name: str
+    customer_phone: str | None
+    day: date
+    minutes: int
+    guests: int
+    special_requests: str = ""
+    language: str | None = None
+    cancelled: bool = False
+
+    @classmethod
+    def from_entry(cls, entry: JournalEntry) -> Reservation | None:
+        parsed = parse_airtable_fields(entry.fields)
+        if parsed is None:
+            return None
+        reservation_id, day, minutes, guests = parsed
+        # The summary is "<n> guests" plus ". <special requests>" if there were any
+        _, _, special_requests = entry.fields.get("Reservation Summary", "").partition(". ")
+        return cls(
+            reservation_id,
+            entry.fields.get("Customer Name", ""),
+            entry.customer_phone,
+            day,
+            minutes,
+            guests,
+            special_requests,
+            entry.language,
+            entry.cancelled,
+        )
+
+    @property
+    def time(self) -> str:
+        return f"{self.minutes // 60:02d}:{self.minutes % 60:02d}"
+
+    def airtable_fields(self) -> dict[str, Any]:
+        """The row as written to Airtable - EXACT field names from the table."""
+        summary = f"{self.guests} guests"
+        if self.special_requests:
+            summary += f". {self.special_requests}"
+        fields = {
+            "Reservation ID": self.reservation_id,
+            "Customer Name": self.customer_name,
+            "Reservation Time": self.time,
+            "Reservation Date": self.day.strftime("%m/%d/%Y"),
+            "Reservation Summary": summary,
+        }
+        if AIRTABLE_PHONE_FIELD and self.customer_phone:
+            fields[AIRTABLE_PHONE_FIELD] = self.customer_phone
+        return fields
+
+
+class ReservationStore:
+    def __init__(self, outbox: BookingOutbox, slots: SlotIndex, holds: SlotHolds | None = None) -> None:
+        self.outbox = outbox
+        self.slots = slots
+        self.holds = holds if holds is not None else SlotHolds(slots)
+
+    async def get(self, reservation_id: str) -> Reservation | None:
+        """A reservation by ID, including cancelled ones."""
+        # Spoken IDs often arrive spelled out: "a 7 k-2 p"
+        reservation_id = "".join(ch for ch in reservation_id if ch.isalnum()).upper()
+        entries = await self.outbox.find(reservation_id=reservation_id, include_cancelled=True, limit=1)
+        return Reservation.from_entry(entries[0]) if entries else None
+
+    async def upcoming(
+        self, customer_phone: str, *, start: date, end: date | None = None, limit: int = 5
+    ) -> list[Reservation]:
+        """A caller's reservations from `start` (to `end`, inclusive), earliest first."""
+        entries = await self.outbox.find(
+            customer_phone=customer_phone,
+            date_from=start.isoformat(),
+            date_to=end.isoformat() if end else None,
+            limit=limit,
+        )
+        return [r for r in map(Reservation.from_entry, entries) if r is not None]
+
+    async def modify(
+        self, reservation: Reservation, *, day: date, minutes: int, guests: int
+    ) -> Reservation | None:
+        """Move or resize a reservation. Returns None if the new slot is full.
+
+        Raises:
+            ReservationNotFoundError: if it was cancelled in the meantime.
+        """
+        updated = dataclasses.replace(reservation, day=day, minutes=minutes, guests=guests)
+        # Its own seats must not count against it
+        self.slots.remove(reservation.reservation_id)
+        # Hold the new seats like book_table does, so no call in another
+        # process can take them while the change is journaled
+        hold = await self.holds.place(day, minutes, guests)
+        if hold is None:
+            self._restore(reservation)
+            return None
+        await self.holds.claim(hold)
+        try:
+            amended = await self.outbox.amend(reservation.reservation_id, updated.airtable_fields())
+        except BaseException:
+            await self.holds.release(hold)
+            self._restore(reservation)
+            raise
+        if not amended:
+            await self.holds.release(hold)
+            raise ReservationNotFoundError(reservation.reservation_id)
+        await self.holds.convert(hold, reservation.reservation_id)
+        return updated
+
+    async def cancel(self, reservation: Reservation) -> bool:
+        """Cancel a reservation. Returns False if it was already cancelled."""
+        cancelled = await self.outbox.cancel(reservation.reservation_id)
+        self.slots.remove(reservation.reservation_id)
+        return cancelled
+
+    def _restore(self, reservation: Reservation) -> None:
+        self.slots.add(reservation.reservation_id, reservation.day, reservation.minutes, reservation.guests)
@@ -0,0 +1,322 @@
+"""Short, voice-ready answers about the restaurant from a local knowledge file.
+
+The instructions invite callers to ask about opening hours, the menu, prices,
+specials and directions, but the agent had no data to answer from, so the
+LLM improvised or read out long answers. `RestaurantInfo` loads the
+restaurant's knowledge file (RESTAURANT_INFO_PATH, or
+`TENANTS_DIR/<tenantId>.info.json` for other tenants) and precomputes one
+snippet per fact in English and German, plus an inverted index from
+normalized keywords to snippets. `lookup_restaurant_info` answers from it
+with a few dictionary lookups per question.
+
+    {
+      "currency": {"en": "euros", "de": "Euro"},
+      "hours": [
+        {"days": {"en": "Monday to Friday", "de": "Montag bis Freitag"},
+         "open": "11:30", "close": "22:00"},
+        {"days": {"en": "Sunday", "de": "Sonntag"}, "closed": true}
+      ],
+      "menu": [
+        {"name": {"en": "Margherita pizza", "de": "Pizza Margherita"},
+         "category": {"en": "pizza", "de": "Pizza"},
+         "description": {"en": "tomato, mozzarella and basil",
+                         "de": "Tomate, Mozzarella und Basilikum"},
+         "price": 11.5, "allergens": ["gluten", "milk"], "tags": ["vegetarian"]}
+      ],
+      "faq": [
+        {"keywords": {"en": ["address", "directions", "parking"],
+                      "de": ["Adresse", "Anfahrt", "Parkplatz"]},
+         "answer": {"en": "We're at Hafenstrasse 12, parking is in the back.",
+                    "de": "Wir sind in der Hafenstraße 12, Parkplätze gibt es hinten."}}
+      ]
+    }
+
+Every key is optional. The file is re-read when its modification time
+changes, checked at most every RESTAURANT_INFO_RELOAD_INTERVAL seconds, so
+edits (today's specials, new prices) reach calls in progress without a
+restart.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger("agent.restaurant_info")
+
+LANGUAGES = ("en", "de")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = {
+    "en": {
+        "a", "an", "and", "any", "are", "at", "can", "do", "does", "for", "have",
+        "has", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the",
+        "there", "to", "we", "what", "which", "with", "you", "your",
+    },
+    "de": {
+        "am", "an", "das", "der", "die", "ein", "eine", "es", "fur", "gibt", "habt",
+        "haben", "ich", "ihr", "im", "in", "ist", "mit", "oder", "sind", "und", "was",
+        "welche", "wie", "wir", "zu",
+    },
+}
+
+# Words callers use for the sections that are not named in the file itself
+_HOURS_KEYWORDS = {
+    "en": "hours open opening close closing closed when today tomorrow weekend",
+    "de": "offnungszeiten geoffnet offen auf geschlossen schliessen wann heute morgen wochenende",
+}
+_MENU_KEYWORDS = {
+    "en": "menu food dishes eat serve",
+    "de": "speisekarte karte essen gerichte speisen",
+}
+_PRICE_KEYWORDS = {"en": "price cost much", "de": "preis kostet kosten teuer"}
+
+# The 14 EU allergens and common dietary tags, so "nuts" finds "Nüsse" and back
+_TERMS = {
+    "gluten": ("gluten", "Gluten"),
+    "crustaceans": ("crustaceans", "Krebstiere"),
+    "eggs": ("eggs", "Eier"),
+    "fish": ("fish", "Fisch"),
+    "peanuts": ("peanuts", "Erdnüsse"),
+    "soy": ("soy", "Soja"),
+    "milk": ("milk", "Milch"),
+    "nuts": ("nuts", "Nüsse"),
+    "celery": ("celery", "Sellerie"),
+    "mustard": ("mustard", "Senf"),
+    "sesame": ("sesame", "Sesam"),
+    "sulphites": ("sulphites", "Sulfite"),
+    "lupin": ("lupin", "Lupinen"),
+    "molluscs": ("molluscs", "Weichtiere"),
+    "vegetarian": ("vegetarian", "vegetarisch"),
+    "vegan": ("vegan", "vegan"),
+    "gluten-free": ("gluten-free", "glutenfrei"),
+    "spicy": ("spicy", "scharf"),
+}
+
+
+def _fold(text: str) -> str:
+    # "Öffnungszeiten" and "offnungszeiten" must meet in the index
+    decomposed = unicodedata.normalize("NFKD", text.lower().replace("ß", "ss"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(word: str) -> str:
+    # Plural and inflection endings only; enough for "desserts"/"dessert", "Nüsse"/"Nuss"
+    for suffix in ("en", "er", "es", "e", "s", "n"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str, language: str) -> list[str]:
+    stopwords = _STOPWORDS.get(language, set())
+    return [_stem(w) for w in _WORD_RE.findall(_fold(text)) if w not in stopwords]
+
+
+def _text(value: Any, language: str) -> str:
+    """A per-language {"en": ..., "de": ...} value, or a plain string used for both."""
+    if isinstance(value, dict):
+        return str(value.get(language) or value.get("en") or next(iter(value.values()), ""))
+    return str(value or "")
+
+
+def _term(term: str, language: str) -> str:
+    names = _TERMS.get(term.lower())
+    return names[LANGUAGES.index(language)] if names else term
+
+
+def _price(amount: float, currency: str, language: str) -> str:
+    text = f"{amount:.2f}".replace(".00", "")
+    return f"{text.replace('.', ',') if language == 'de' else text} {currency}"
+
+
+@dataclass(frozen=True)
+class _Snippet:
+    # Names the same fact in every language's index, e.g. "menu:3" or "faq:0"
+    key: str
+    text: str
+    length: int
+
+
+class _Index:
+    """Snippets and keyword postings for one language."""
+
+    def __init__(self, language: str) -> None:
+        self.language = language
+        self.snippets: list[_Snippet] = []
+        self.by_key: dict[str, int] = {}
+        self.postings: dict[str, set[int]] = defaultdict(set)
+        self.idf: dict[str, float] = {}
+
+    def add(self, key: str, text: str, keywords: Iterable[str]) -> None:
+        tokens = set()
+        for keyword in keywords:
+            tokens.update(tokenize(keyword, self.language))
+        doc = len(self.snippets)
+        self.snippets.append(_Snippet(key, text, len(tokens)))
+        self.by_key[key] = doc
+        for token in tokens:
+            self.postings[token].add(doc)
+
+    def freeze(self) -> None:
+        total = len(self.snippets)
+        self.idf = {token: math.log(1 + total / len(docs)) for token, docs in self.postings.items()}
+        self.postings = dict(self.postings)
+
+    def search(self, query: str, limit: int) -> list[int]:
+        scores: dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query, self.language)):
+            for doc in self.postings.get(token, ()):
+                scores[doc] += self.idf[token]
+        if not scores:
+            return []
+        # Best match first; among equals the most specific snippet (fewest keywords)
+        ranked = sorted(scores, key=lambda doc: (-scores[doc], self.snippets[doc].length, doc))
+        best = scores[ranked[0]]
+        return [doc for doc in ranked[:limit] if scores[doc] >= best / 2]
+
+
+def build_indexes(data: dict[str, Any]) -> dict[str, _Index]:
+    indexes = {}
+    for language in LANGUAGES:
+        index = _Index(language)
+        de = language == "de"
+        currency = _text(data.get("currency") or {"en": "euros", "de": "Euro"}, language)
+
+        hours = data.get("hours") or []
+        if hours:
+            parts = []
+            for entry in hours:
+                days = _text(entry.get("days"), language)
+                if entry.get("closed"):
+                    parts.append(f"{days} {'geschlossen' if de else 'closed'}")
+                else:
+                    parts.append(f"{days} {entry.get('open')} {'bis' if de else 'to'} {entry.get('close')}")
+            lead = "Unsere Öffnungszeiten: " if de else "Our opening hours: "
+            index.add("hours", lead + ", ".join(parts) + ".", [_HOURS_KEYWORDS[language], *parts])
+
+        menu = data.get("menu") or []
+        # Grouped by the English name, so both languages list the same categories
+        categories: dict[str, tuple[list[str], list[str]]] = {}
+        for position, item in enumerate(menu):
+            name = _text(item.get("name"), language)
+            category = _text(item.get("category"), language)
+            description = _text(item.get("description"), language)
+            allergens = [_term(a, language) for a in item.get("allergens", [])]
+            tags = [_term(t, language) for t in item.get("tags", [])]
+
+            text = name
+            if "price" in item:
+                text += f", {_price(float(item['price']), currency, language)}"
+            if description:
+                text += f": {description}"
+            if tags:
+                text += f" ({', '.join(tags)})"
+            text += "."
+            if allergens:
+                text += f" {'Enthält' if de else 'Contains'} {', '.join(allergens)}."
+            keywords = [name, category, description, *allergens, *tags, _PRICE_KEYWORDS[language]]
+            index.add(f"menu:{position}", text, keywords)
+            if category:
+                spellings, names = categories.setdefault(_fold(_text(item.get("category"), "en")), ([], []))
+                if category not in spellings:
+                    spellings.append(category)
+                names.append(name)
+
+        for key, (spellings, names) in categories.items():
+            index.add(f"category:{key}", f"{spellings[0]}: {', '.join(names)}.", spellings)
+        if categories:
+            lead = "Auf der Karte: " if de else "On the menu: "
+            overview = ", ".join(spellings[0] for spellings, _ in categories.values())
+            index.add("menu", lead + overview + ".", [_MENU_KEYWORDS[language]])
+
+        for position, entry in enumerate(data.get("faq") or []):
+            keywords = entry.get("keywords") or {}
+            keywords = keywords.get(language, []) if isinstance(keywords, dict) else keywords
+            index.add(f"faq:{position}", _text(entry.get("answer"), language), keywords)
+
+        index.freeze()
+        indexes[language] = index
+    return indexes
+
+
+class RestaurantInfo:
+    """One restaurant's knowledge file, indexed; reloaded when the file changes."""
+
+    def __init__(self, path: str, *, reload_interval: float = 5.0) -> None:
+        self.path = path
+        self.reload_interval = reload_interval
+        self._indexes = build_indexes({})
+        self._mtime: float | None = None
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, path: str | None = None) -> RestaurantInfo:
+        return cls(
+            path or os.getenv("RESTAURANT_INFO_PATH", "restaurant_info.json"),
+            reload_interval=float(os.getenv("RESTAURANT_INFO_RELOAD_INTERVAL", "5")),
+        )
+
+    def _load(self) -> tuple[float | None, dict[str, _Index] | None]:
+        """The file's mtime and, if it changed, its new indexes (blocking; runs in a thread)."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None, build_indexes({}) if self._mtime is not None else None
+        if mtime == self._mtime:
+            return mtime, None
+        with open(self.path, encoding="utf-8") as f:
+            return mtime, build_indexes(json.load(f))
+
+    async def refresh(self) -> None:
+        """Pick up changes to the file, checking at most every `reload_interval` seconds."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+        async with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime, indexes = await asyncio.to_thread(self._load)
+            except (OSError, ValueError) as e:
+                # Keep answering from the last good version
+                logger.warning("⚠️ Could not load restaurant info %s: %s", self.path, e)
+                return
+            if indexes is not None:
+                self._indexes = indexes
+                logger.info(
+                    "📖 Restaurant info %s: %s snippets",
+                    "loaded" if mtime is not None else "removed",
+                    len(indexes["en"].snippets),
+                )
+            self._mtime = mtime
+
+    def lookup(self, question: str, language: str, *, limit: int = 2) -> list[str]:
+        """The best-matching snippets, in the call's language if it has a match."""
+        language = "de" if language == "de" else "en"
+        index = self._indexes[language]
+        found = index.search(question, limit)
+        if found:
+            return [index.snippets[doc].text for doc in found]
+        # English words come up in German calls and vice versa: find the fact
+        # in the other index and answer with its version in the call's language
+        other = self._indexes["en" if language == "de" else "de"]
+        answers = []
+        for doc in other.search(question, limit):
+            snippet = other.snippets[doc]
+            own = index.by_key.get(snippet.key)
+            answers.append(index.snippets[own].text if own is not None else snippet.text)
+        return answers
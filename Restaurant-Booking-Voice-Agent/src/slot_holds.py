@@ -0,0 +1,338 @@
+"""Short-lived holds on a table while the caller finishes booking.
+
+`check_availability` used to only look at the slot index, so between the
+answer "yes, 19:00 is free" and the `book_table` call a minute later another
+caller could take the last table, and `book_table` had to check capacity
+again before it could confirm. Now a successful check also places a hold.
+When `book_table` comes for the same date, time and party size it converts
+the hold into the reservation without checking capacity again; otherwise it
+places a fresh hold itself, so the same rules apply to it.
+
+Every call runs in its own job process, so holds are kept in a
+`slot_holds` table in the tenant's outbox journal, which all job processes
+on the host share. Placing a hold reads the other calls' holds from there
+and enters them in this call's slot index under their hold keys; the insert
+only goes through if no other call changed the table since, so two calls
+cannot both take the last seats. The sweeper re-reads the table, so the
+alternatives a call offers count the other calls' holds too. A converted
+hold stays in the table as the booking for another SLOT_HOLD_TTL seconds,
+so other calls count its seats until their own slot index has it.
+
+Each call holds at most one slot; a new check replaces its previous hold,
+and the hold is dropped when the call ends. Holds expire SLOT_HOLD_TTL
+seconds after they were placed and are swept in the background, so an
+abandoned call, or one whose process died, frees its seats on its own.
+
+Per tenant, /metrics shows `agent_slot_holds_active` (this call's holds and
+held guests) and `agent_slot_hold_events` counters: holds placed, converted
+to bookings, expired, and refused because another call's hold overlaps the
+slot (contention).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import math
+import os
+import sqlite3
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, TypeVar
+
+import tracing
+from slot_index import SlotIndex
+
+logger = logging.getLogger("agent.holds")
+
+T = TypeVar("T")
+
+EVENTS = ("placed", "converted", "expired", "contended")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slot_holds (
+    hold_key       TEXT PRIMARY KEY,
+    day            TEXT NOT NULL,
+    minutes        INTEGER NOT NULL,
+    guests         INTEGER NOT NULL,
+    expires_at     REAL NOT NULL,
+    reservation_id TEXT
+);
+"""
+
+
+@dataclass(frozen=True)
+class Hold:
+    key: str
+    day: date
+    minutes: int
+    guests: int
+    expires_at: float
+
+    def matches(self, day: date, minutes: int, guests: int) -> bool:
+        return (self.day, self.minutes, self.guests) == (day, minutes, guests)
+
+
+class SlotHolds:
+    def __init__(
+        self,
+        slots: SlotIndex,
+        path: str = ":memory:",
+        *,
+        ttl: float = 180.0,
+        sweep_interval: float = 5.0,
+        name: str = "default",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.slots = slots
+        self.path = path
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.name = name
+        # Wall clock, because expiry times are compared across processes
+        self._clock = clock
+        self._holds: dict[str, Hold] = {}
+        # Other calls' holds entered in the slot index, and bookings already counted
+        self._others: set[str] = set()
+        self._booked: set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slot-holds")
+        self._conn: sqlite3.Connection | None = None
+        self._sweeper: asyncio.Task | None = None
+        self.events = dict.fromkeys(EVENTS, 0)
+        self._gauges: list[tuple[str, Callable[[], float], dict[str, str]]] = [
+            ("agent_slot_holds_active", lambda: len(self._holds), {"tenant": name, "unit": "holds"}),
+            ("agent_slot_holds_active", self.held_guests, {"tenant": name, "unit": "guests"}),
+        ]
+        for event in EVENTS:
+            self._gauges.append(
+                ("agent_slot_hold_events", lambda event=event: self.events[event], {"tenant": name, "event": event})
+            )
+
+    @classmethod
+    def from_env(cls, slots: SlotIndex, *, name: str = "default", path: str | None = None) -> SlotHolds:
+        return cls(
+            slots,
+            path or os.getenv("BOOKING_OUTBOX_PATH", "var/booking_outbox.db"),
+            ttl=float(os.getenv("SLOT_HOLD_TTL", "180")),
+            name=name,
+        )
+
+    def __len__(self) -> int:
+        return len(self._holds)
+
+    def held_guests(self) -> int:
+        return sum(hold.guests for hold in self._holds.values())
+
+    # -- SQLite (holds thread only) -----------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Holds expire on their own; one lost to a power cut needs no fsync
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _read(self, now: float) -> list[tuple]:
+        conn = self._db()
+        conn.execute("DELETE FROM slot_holds WHERE expires_at <= ?", (now,))
+        return conn.execute(
+            "SELECT hold_key, day, minutes, guests, reservation_id FROM slot_holds ORDER BY hold_key"
+        ).fetchall()
+
+    def _insert_unless_changed(self, seen: list[tuple], now: float, hold: Hold) -> bool:
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._read(now) != seen:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO slot_holds (hold_key, day, minutes, guests, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (hold.key, hold.day.isoformat(), hold.minutes, hold.guests, hold.expires_at),
+            )
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _extend(self, key: str, expires_at: float, now: float) -> bool:
+        cursor = self._db().execute(
+            "UPDATE slot_holds SET expires_at = ? WHERE hold_key = ? AND expires_at > ?",
+            (expires_at, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def _delete(self, key: str) -> None:
+        self._db().execute("DELETE FROM slot_holds WHERE hold_key = ?", (key,))
+
+    def _book(self, key: str, reservation_id: str, expires_at: float) -> None:
+        self._db().execute(
+            "UPDATE slot_holds SET reservation_id = ?, expires_at = ? WHERE hold_key = ?",
+            (reservation_id, expires_at, key),
+        )
+
+    # -- this call's view ---------------------------------------------------
+
+    def _mirror(self, rows: list[tuple]) -> None:
+        """Enter other calls' holds in the slot index, and count their bookings once."""
+        current = set()
+        for key, day, minutes, guests, reservation_id in rows:
+            if key in self._holds or key in self._booked:
+                continue
+            if reservation_id:
+                # A booking now, so it stays in the index after the row expires
+                self._others.discard(key)
+                self.slots.remove(key)
+                self.slots.add(reservation_id, date.fromisoformat(day), minutes, guests)
+                self._booked.add(key)
+            else:
+                current.add(key)
+                if key not in self._others:
+                    self.slots.add(key, date.fromisoformat(day), minutes, guests)
+        for key in self._others - current:
+            self.slots.remove(key)
+        self._others = current
+        self._booked &= {row[0] for row in rows}
+
+    def _expire(self, now: float) -> int:
+        expired = [hold for hold in self._holds.values() if hold.expires_at <= now]
+        for hold in expired:
+            del self._holds[hold.key]
+            self.slots.remove(hold.key)
+        self.events["expired"] += len(expired)
+        return len(expired)
+
+    async def place(self, day: date, minutes: int, guests: int) -> Hold | None:
+        """Hold seats for a party. Returns None if the slot cannot take it,
+        counting every call's holds on this host."""
+        while True:
+            now = self._clock()
+            self._expire(now)
+            try:
+                rows = await self._run(self._read, now)
+            except sqlite3.Error as e:
+                logger.warning("⚠️ Slot holds of other calls unavailable, checking this call's only: %s", e)
+                rows = None
+            if rows is not None:
+                self._mirror(rows)
+            if not self.slots.available(day, minutes, guests):
+                break
+            hold = Hold(f"hold:{uuid.uuid4().hex[:12]}", day, minutes, guests, now + self.ttl)
+            if rows is not None:
+                try:
+                    if not await self._run(self._insert_unless_changed, rows, now, hold):
+                        # Another call placed or dropped a hold meanwhile: check again
+                        continue
+                except sqlite3.Error as e:
+                    logger.warning("⚠️ Could not share slot hold with other calls: %s", e)
+            self.slots.add(hold.key, day, minutes, guests)
+            self._holds[hold.key] = hold
+            self.events["placed"] += 1
+            return hold
+        if self.slots.is_open(minutes) and any(
+            self.slots.overlaps(key, day, minutes) for key in [*self._holds, *self._others]
+        ):
+            self.events["contended"] += 1
+            logger.info("⏳ Slot %s %s for %s refused while held by another call", day, minutes, guests)
+        return None
+
+    def active(self, hold: Hold | None) -> bool:
+        current = self._holds.get(hold.key) if hold is not None else None
+        return current is not None and self._clock() < current.expires_at
+
+    async def claim(self, hold: Hold | None) -> bool:
+        """Keep an active hold from expiring while it is being booked.
+
+        Other calls keep seeing it for another SLOT_HOLD_TTL seconds, so a
+        call that dies mid-booking still frees the seats."""
+        if not self.active(hold):
+            return False
+        now = self._clock()
+        try:
+            shared = await self._run(self._extend, hold.key, now + self.ttl, now)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Could not extend slot hold for other calls: %s", e)
+            shared = True
+        if not shared:
+            # Swept by another call after it expired there
+            await self.release(hold)
+            return False
+        self._holds[hold.key] = dataclasses.replace(hold, expires_at=math.inf)
+        return True
+
+    async def release(self, hold: Hold | None) -> None:
+        """Give the seats back; releasing a hold twice, or an expired one, is a no-op."""
+        if hold is None or self._holds.pop(hold.key, None) is None:
+            return
+        self.slots.remove(hold.key)
+        try:
+            await self._run(self._delete, hold.key)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Could not drop slot hold for other calls, it expires on its own: %s", e)
+
+    async def convert(self, hold: Hold, reservation_id: str) -> None:
+        """Replace the hold by the booked reservation, without a gap in between."""
+        self.slots.add(reservation_id, hold.day, hold.minutes, hold.guests)
+        if self._holds.pop(hold.key, None) is not None:
+            self.slots.remove(hold.key)
+        self._booked.add(hold.key)
+        self.events["converted"] += 1
+        try:
+            await self._run(self._book, hold.key, reservation_id, self._clock() + self.ttl)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Could not share booking %s with other calls: %s", reservation_id, e)
+
+    async def sweep(self) -> int:
+        """Drop this call's expired holds and re-read the other calls' holds."""
+        now = self._clock()
+        expired = self._expire(now)
+        self._mirror(await self._run(self._read, now))
+        return expired
+
+    def start(self) -> None:
+        """Sweep expired holds in the background and publish metrics (idempotent)."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="slot-holds")
+            for metric, read, labels in self._gauges:
+                tracing.REGISTRY.gauge(metric, read, **labels)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                expired = await self.sweep()
+            except sqlite3.Error as e:
+                logger.warning("⚠️ Slot hold sweep failed: %s", e)
+                continue
+            if expired:
+                logger.info("⏳ %s slot holds expired", expired)
+
+    async def aclose(self) -> None:
+        """Stop sweeping, give this call's holds back and close the table."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for hold in list(self._holds.values()):
+            await self.release(hold)
+        for metric, read, labels in self._gauges:
+            tracing.REGISTRY.remove_gauge(metric, read, **labels)
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,285 @@
+"""In-memory reservation index keyed by date and time slot.
+
+Each day is an array of running guest counts, one entry per SLOT_MINUTES
+slot, so a capacity check is a handful of list lookups instead of an Airtable
+scan. A reservation occupies every slot its seating overlaps.
+
+Every call starts with an empty index. Bookings in the local journal,
+including ones the outbox has not sent to Airtable yet, are loaded before
+the call is answered; upcoming Airtable rows are read in the background and
+then refreshed incrementally with a LAST_MODIFIED_TIME() cursor, so only
+changed rows are read. A modified-time query cannot see rows deleted in
+Airtable, so every SLOT_INDEX_FULL_REFRESH_INTERVAL seconds the upcoming
+rows are read in full again and Airtable rows missing from it are dropped.
+Local bookings update the index directly.
+
+Until the Airtable warm-up has finished, `ready()` holds the first capacity
+answer for a day back for a short while, and reads that day directly from
+Airtable if the warm-up takes longer. If the warm-up or that read fails,
+Airtable is taken as unreachable and the rest of the call answers from the
+journal's bookings without waiting again, until a refresh succeeds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+from airtable_client import AsyncAirtableClient
+
+logger = logging.getLogger("agent.slots")
+
+_GUESTS_RE = re.compile(r"(\d+)\s*(?:guests?|g[äa]ste|personen|people|persons?)", re.IGNORECASE)
+
+AIRTABLE_FIELDS = ["Reservation ID", "Reservation Date", "Reservation Time", "Reservation Summary"]
+
+
+def _parse_hhmm(value: str) -> int:
+    hours, minutes = value.strip().split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+@dataclass(frozen=True)
+class CapacityRules:
+    slot_minutes: int = 30
+    seating_minutes: int = 90
+    guests_per_slot: int = 40
+    opening_time: str = "08:00"
+    last_seating: str = "21:30"
+
+    @classmethod
+    def from_env(cls) -> CapacityRules:
+        return cls(
+            slot_minutes=int(os.getenv("SLOT_MINUTES", "30")),
+            seating_minutes=int(os.getenv("SEATING_MINUTES", "90")),
+            guests_per_slot=int(os.getenv("SLOT_CAPACITY_GUESTS", "40")),
+            opening_time=os.getenv("OPENING_TIME", "08:00"),
+            last_seating=os.getenv("LAST_SEATING_TIME", "21:30"),
+        )
+
+
+@dataclass(frozen=True)
+class _Booking:
+    day: date
+    first_slot: int
+    guests: int
+
+
+class SlotIndex:
+    def __init__(self, rules: CapacityRules | None = None) -> None:
+        self.rules = rules or CapacityRules()
+        self._slots_per_day = 24 * 60 // self.rules.slot_minutes
+        self._span = -(-self.rules.seating_minutes // self.rules.slot_minutes)
+        self._open_slot = _parse_hhmm(self.rules.opening_time) // self.rules.slot_minutes
+        self._last_slot = _parse_hhmm(self.rules.last_seating) // self.rules.slot_minutes
+        self._days: dict[date, list[int]] = {}
+        self._bookings: dict[str, _Booking] = {}
+        self._cursor: str | None = None
+        self._task: asyncio.Task | None = None
+        self._airtable: AsyncAirtableClient | None = None
+        # Set once the warm-up read finished, or failed
+        self._warmed = asyncio.Event()
+        # Bookings read from Airtable, which a full refresh may find deleted
+        self._remote: set[str] = set()
+        self._full_read_at = 0.0
+        # Days read directly while the warm-up was still running
+        self._read_days: set[date] = set()
+
+    # -- local bookkeeping --------------------------------------------------
+
+    def _slot(self, minutes: int) -> int:
+        return minutes // self.rules.slot_minutes
+
+    def _occupied(self, first_slot: int) -> range:
+        return range(first_slot, min(first_slot + self._span, self._slots_per_day))
+
+    def add(self, reservation_id: str, day: date, minutes: int, guests: int) -> None:
+        """Record a reservation. Re-adding the same ID replaces the old entry."""
+        self.remove(reservation_id)
+        booking = _Booking(day, self._slot(minutes), guests)
+        counts = self._days.setdefault(day, [0] * self._slots_per_day)
+        for slot in self._occupied(booking.first_slot):
+            counts[slot] += guests
+        self._bookings[reservation_id] = booking
+
+    def remove(self, reservation_id: str) -> None:
+        booking = self._bookings.pop(reservation_id, None)
+        if booking is None:
+            return
+        counts = self._days[booking.day]
+        for slot in self._occupied(booking.first_slot):
+            counts[slot] -= booking.guests
+
+    def __contains__(self, reservation_id: str) -> bool:
+        return reservation_id in self._bookings
+
+    def overlaps(self, reservation_id: str, day: date, minutes: int) -> bool:
+        """Whether a recorded reservation shares a slot with a party arriving at `minutes`."""
+        booking = self._bookings.get(reservation_id)
+        if booking is None or booking.day != day:
+            return False
+        return abs(booking.first_slot - self._slot(minutes)) < self._span
+
+    def remaining(self, day: date, minutes: int) -> int:
+        """Seats left for a party arriving at `minutes` past midnight."""
+        counts = self._days.get(day)
+        if counts is None:
+            return self.rules.guests_per_slot
+        busiest = max(counts[slot] for slot in self._occupied(self._slot(minutes)))
+        return self.rules.guests_per_slot - busiest
+
+    def is_open(self, minutes: int) -> bool:
+        return self._open_slot <= self._slot(minutes) <= self._last_slot
+
+    def available(self, day: date, minutes: int, guests: int) -> bool:
+        return self.is_open(minutes) and self.remaining(day, minutes) >= guests
+
+    def suggest(self, day: date, minutes: int, guests: int, limit: int = 3) -> list[int]:
+        """Nearest bookable start times on `day`, as minutes past midnight."""
+        wanted = self._slot(minutes)
+        candidates = sorted(
+            range(self._open_slot, self._last_slot + 1),
+            key=lambda slot: (abs(slot - wanted), slot),
+        )
+        step = self.rules.slot_minutes
+        found = [
+            slot * step
+            for slot in candidates
+            if slot != wanted and self.remaining(day, slot * step) >= guests
+        ]
+        return sorted(found[:limit])
+
+    # -- Airtable sync ------------------------------------------------------
+
+    def load_records(self, records: Iterable[dict[str, Any]]) -> int:
+        loaded = 0
+        for record in records:
+            parsed = parse_airtable_fields(record.get("fields", {}))
+            if parsed is None:
+                continue
+            reservation_id, day, minutes, guests = parsed
+            self.add(reservation_id, day, minutes, guests)
+            loaded += 1
+        return loaded
+
+    async def refresh(self, airtable: AsyncAirtableClient, *, full: bool = False) -> int:
+        """Read rows changed since the last refresh, or all upcoming rows the
+        first time and when `full` is set; a full read drops deleted rows."""
+        started = datetime.now(timezone.utc) - timedelta(seconds=5)
+        full = full or self._cursor is None
+        if full:
+            formula = "IS_AFTER({Reservation Date}, DATEADD(TODAY(), -1, 'days'))"
+        else:
+            formula = f"IS_AFTER(LAST_MODIFIED_TIME(), '{self._cursor}')"
+
+        loaded = 0
+        seen: set[str] = set()
+        async for page in airtable.iterate(formula=formula, fields=AIRTABLE_FIELDS):
+            loaded += self.load_records(page)
+            seen.update(record.get("fields", {}).get("Reservation ID") for record in page)
+        seen.discard(None)
+        if full:
+            # Only rows the read covers: from today on, whatever TODAY() means to Airtable
+            covered = started.date()
+            deleted = [
+                rid for rid in self._remote - seen
+                if rid in self._bookings and self._bookings[rid].day >= covered
+            ]
+            for rid in deleted:
+                self.remove(rid)
+            self._remote -= set(deleted)
+            if deleted:
+                logger.info("📅 Slot index dropped %s reservations deleted in Airtable", len(deleted))
+            self._full_read_at = time.monotonic()
+        self._remote |= seen
+        self._cursor = started.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        self._warmed.set()
+        return loaded
+
+    async def ready(self, day: date, timeout: float) -> None:
+        """Wait until Airtable's bookings for `day` are in the index.
+
+        Waits up to `timeout` for the warm-up read, then reads `day` directly.
+        Returns at once if the index only tracks local bookings, or once
+        Airtable failed to answer.
+        """
+        if self._warmed.is_set() or self._airtable is None or day in self._read_days:
+            return
+        try:
+            await asyncio.wait_for(self._warmed.wait(), timeout=timeout)
+            return
+        except asyncio.TimeoutError:
+            pass
+        started = time.perf_counter()
+        formula = f"IS_SAME({{Reservation Date}}, '{day.isoformat()}', 'day')"
+        loaded = 0
+        try:
+            async for page in self._airtable.iterate(formula=formula, fields=AIRTABLE_FIELDS):
+                loaded += self.load_records(page)
+        except Exception:
+            self._give_up()
+            raise
+        self._read_days.add(day)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info("📅 Slot index warm-up still running, read %s directly: %s rows in %.0fms", day, loaded, elapsed_ms)
+
+    def _give_up(self) -> None:
+        # Airtable is unreachable: later answers in this call use local
+        # bookings instead of waiting for it again
+        self._warmed.set()
+
+    def start(self, airtable: AsyncAirtableClient, interval: float = 60.0, full_interval: float = 300.0) -> None:
+        """Warm the index and keep refreshing it in the background (idempotent)."""
+        if self._task is not None and not self._task.done():
+            return
+        if not airtable.configured:
+            logger.warning("⚠️ Airtable not configured, slot index tracks local bookings only")
+            return
+        self._airtable = airtable
+        self._task = asyncio.create_task(
+            self._refresh_loop(airtable, interval, full_interval), name="slot-index"
+        )
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self, airtable: AsyncAirtableClient, interval: float, full_interval: float) -> None:
+        while True:
+            started = time.perf_counter()
+            full = time.monotonic() - self._full_read_at >= full_interval
+            try:
+                loaded = await self.refresh(airtable, full=full)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                logger.info("📅 Slot index refreshed: %s rows in %.0fms", loaded, elapsed_ms)
+            except Exception as e:
+                logger.warning("⚠️ Slot index refresh failed: %s", e)
+                if not self._warmed.is_set():
+                    self._give_up()
+            await asyncio.sleep(interval)
+
+
+def parse_airtable_fields(fields: dict[str, Any]) -> tuple[str, date, int, int] | None:
+    """Extract (reservation ID, date, minutes, guests) from an Airtable row."""
+    try:
+        reservation_id = fields["Reservation ID"]
+        raw_date = fields["Reservation Date"]
+        if "-" in raw_date:
+            day = datetime.strptime(raw_date[:10], "%Y-%m-%d").date()
+        else:
+            day = datetime.strptime(raw_date, "%m/%d/%Y").date()
+        minutes = _parse_hhmm(fields["Reservation Time"])
+    except (KeyError, ValueError):
+        return None
+
+    match = _GUESTS_RE.search(fields.get("Reservation Summary", ""))
+    guests = int(match.group(1)) if match else 1
+    return reservation_id, day, minutes, guests
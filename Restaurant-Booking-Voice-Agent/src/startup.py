@@ -0,0 +1,82 @@
+"""Where a worker spends its time between starting and answering its first call.
+
+A fresh pod or an autoscaled worker used to pay for every model and client
+on its first call, and there was no way to tell which part was slow.
+`StartupTimer` records named phases (module imports by group, each prewarm
+step, the per-call turn detector) and, when the process answers its
+first call, logs one breakdown line such as
+
+    🚀 Startup: import.livekit 0.81s, import.plugins 0.25s, ... ;
+       worker start to first call 4.31s
+
+Every phase is also observed as a `startup.<phase>` stage on the /metrics
+endpoint (see `tracing`), together with `startup.call_setup` (entrypoint to
+joined room) for every call.
+
+"Worker start" is WORKER_STARTED_AT (epoch seconds), which the worker sets
+to its own process start time and its job processes inherit. Set it in the
+container's entry script (e.g. `WORKER_STARTED_AT=$(date +%s.%N)`) to also
+count the time before Python starts.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import psutil
+
+import tracing
+
+logger = logging.getLogger("agent.startup")
+
+
+def process_started_at() -> float:
+    """Start time of this process, in epoch seconds."""
+    return psutil.Process().create_time()
+
+
+class StartupTimer:
+    """Startup phases of one process; agent.py keeps one per process."""
+
+    def __init__(self, started_at: float) -> None:
+        self.started_at = started_at
+        self.phases: dict[str, float] = {}
+        self.first_call: float | None = None
+
+    @classmethod
+    def from_env(cls) -> StartupTimer:
+        started_at = os.getenv("WORKER_STARTED_AT")
+        return cls(float(started_at) if started_at else process_started_at())
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        tracing.observe(f"startup.{name}", seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def call_answered(self, setup_seconds: float) -> None:
+        """Record a call's setup time; the first call in the process also logs the breakdown."""
+        tracing.observe("startup.call_setup", setup_seconds)
+        if self.first_call is not None:
+            return
+        self.first_call = time.time() - self.started_at
+        self.phases["call_setup"] = setup_seconds
+        tracing.observe("startup.first_call", self.first_call)
+        self.report()
+
+    def report(self) -> None:
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        if self.first_call is None:
+            logger.info("🚀 Startup: %s", phases or "no phases recorded")
+            return
+        logger.info("🚀 Startup: %s; worker start to first call %.2fs", phases, self.first_call)
@@ -0,0 +1,202 @@
+"""Structured, off-loop logging for the agent's own loggers.
+
+`logging.basicConfig` formats and writes every record synchronously on the
+thread that logs it, which for us is the job's event loop. Under load the
+booking path's log lines (and the `json.dumps` calls that fed them) added
+directly to turn latency.
+
+`configure_logging()` puts a queue handler on the `agent` logger tree
+instead. The calling thread only appends the unformatted record (message
+template plus args) to an in-memory queue; a listener thread does the
+%-formatting and secret redaction. Log calls should therefore pass
+arguments lazily (`logger.info("%s", value)`) rather than pre-formatting
+them.
+
+The listener then hands the redacted record to the root logger's handlers.
+In a job process that is LiveKit's IPC handler, so agent lines reach the
+worker's log output alongside LiveKit's own, in the worker's format. Only
+when the root logger has no handlers (e.g. the command line tools) does the
+listener write the lines itself, as JSON or text.
+
+Call it after loading `.env.local`, which may hold the secrets to redact.
+
+Each JSON line carries the fields LiveKit attaches from
+`ctx.log_context_fields` (e.g. room) plus anything bound for the current task
+with `bind_log_fields` (e.g. reservation_id).
+
+Configuration:
+
+- LOG_LEVEL: level of the `agent` loggers (default INFO)
+- LOG_LEVELS: per-component overrides, e.g. `agent.webhook=DEBUG,agent.slots=WARNING`
+- LOG_FORMAT: `json` (default) or `text`, for lines the agent writes itself
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+ROOT_LOGGER = "agent"
+
+# Values of these variables never appear in log output
+SECRET_ENV_VARS = (
+    "AIRTABLE_API_TOKEN",
+    "OPENAI_API_KEY",
+    "LIVEKIT_API_KEY",
+    "LIVEKIT_API_SECRET",
+    "N8N_WEBHOOK_URL",
+    "N8N_CHAT_URL",
+)
+SECRET_PATTERNS = (
+    re.compile(r"(?i)(bearer\s+)[\w.~+/=-]+"),
+    re.compile(r"\bpat[A-Za-z0-9]{14}\.[A-Za-z0-9]{20,}"),  # Airtable personal access token
+    re.compile(r"\bsk-[A-Za-z0-9_-]{20,}"),  # OpenAI key
+)
+REDACTED = "[REDACTED]"
+
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# None until bound; every bind sets a new dict, so contexts never share one
+_fields: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar("log_fields", default=None)
+_listener: QueueListener | None = None
+
+
+def bind_log_fields(**fields: Any) -> None:
+    """Attach fields (e.g. reservation_id) to every log record of the current task."""
+    _fields.set({**(_fields.get() or {}), **fields})
+
+
+class Redactor:
+    def __init__(self, secrets: list[str]) -> None:
+        # Longest first, so a secret containing another is replaced whole
+        self.secrets = sorted({s for s in secrets if len(s) >= 8}, key=len, reverse=True)
+
+    @classmethod
+    def from_env(cls) -> Redactor:
+        return cls([os.getenv(name, "") for name in SECRET_ENV_VARS])
+
+    def __call__(self, text: str) -> str:
+        for secret in self.secrets:
+            if secret in text:
+                text = text.replace(secret, REDACTED)
+        for pattern in SECRET_PATTERNS:
+            text = pattern.sub(lambda m: (m.group(1) if m.groups() else "") + REDACTED, text)
+        return text
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Enqueue records as-is; formatting is left to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        for key, value in (_fields.get() or {}).items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact: Redactor) -> None:
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return self.redact(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, redact: Redactor) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s - %(message)s")
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        return self.redact(super().format(record))
+
+
+class _Forward(logging.Handler):
+    """Redact a record and pass it to the root logger's handlers, or write it
+    with `fallback` while the root logger has none."""
+
+    def __init__(self, redact: Redactor, fallback: logging.Handler) -> None:
+        super().__init__()
+        self.redact = redact
+        self.fallback = fallback
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        targets = logging.getLogger().handlers
+        if not targets:
+            return self.fallback.handle(record)
+        record = self.redacted(record)
+        for handler in targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def redacted(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.redact(_EXCEPTION_FORMATTER.formatException(record.exc_info))
+        return record
+
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """Parse `name=LEVEL,name=LEVEL` into a mapping."""
+    levels = {}
+    for part in spec.split(","):
+        name, sep, level = part.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None:
+    """Route the `agent` loggers through the background writer (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    redact = Redactor.from_env()
+    output = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(TextFormatter(redact))
+    else:
+        output.setFormatter(JsonFormatter(redact))
+
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(records, _Forward(redact, output))
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    agent_logger = logging.getLogger(ROOT_LOGGER)
+    agent_logger.addHandler(_ContextQueueHandler(records))
+    agent_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    # The listener passes our records on to the root handlers once redacted;
+    # propagating as well would hand them over a second time, unredacted
+    agent_logger.propagate = False
+    for name, level in parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
@@ -0,0 +1,262 @@
+"""Per-restaurant configuration and warm resources for a multi-tenant worker.
+
+A room names its restaurant with `tenantId` in its metadata. The tenant's
+config lives in `TENANTS_DIR/<tenantId>.json`; every key is optional and
+falls back to the single-restaurant environment variables:
+
+    {
+      "restaurant_name": "Trattoria Nord",
+      "airtable_base_id": "appXXXXXXXXXXXXXX",
+      "airtable_table_name": "Reservations",
+      "webhook_url": "https://n8n.example.com/webhook/nord-booking",
+      "tts_voice": "nova",
+      "capacity": {"guests_per_slot": 24, "last_seating": "22:00"},
+      "instructions": {"en": "...", "de": "..."},
+      "info_path": "tenants/nord.info.json"
+    }
+
+Rooms without a tenant use the `default` tenant, which is exactly the
+environment-configured restaurant (and its existing outbox file). Other
+tenants' hours and menu are read from `TENANTS_DIR/<tenantId>.info.json`
+unless `info_path` says otherwise (see `RestaurantInfo`).
+
+`TenantRegistry` resolves the tenant of a call and builds its Airtable
+client, outbox, slot index, slot holds, webhook dispatcher, reservation ID
+allocator, caller cache, reservation store and knowledge index. LiveKit
+runs every call in a fresh job process, so these live for one call: the
+tenant file is read when the call starts (an edit applies from the next
+call on) and the resources are closed when it ends. What has to outlive a
+call is kept on disk, in the outbox journal and the reservation ID file.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any
+
+from airtable_client import AsyncAirtableClient
+from booking_outbox import BookingOutbox
+from customers import CustomerDirectory
+from datetime_parser import restaurant_now
+from reservation_ids import ReservationIdAllocator
+from reservation_store import ReservationStore
+from restaurant_info import RestaurantInfo
+from slot_holds import SlotHolds
+from slot_index import CapacityRules, SlotIndex
+from webhook_dispatcher import WebhookDispatcher
+
+logger = logging.getLogger("agent.tenants")
+
+DEFAULT_TENANT = "default"
+_TENANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class UnknownTenantError(KeyError):
+    """Raised for a tenant ID with no config file."""
+
+
+@dataclass(frozen=True)
+class TenantConfig:
+    tenant_id: str
+    restaurant_name: str = "Restaurantia"
+    airtable_base_id: str | None = None
+    airtable_table_name: str | None = None
+    webhook_url: str | None = None
+    tts_voice: str = "alloy"
+    capacity: CapacityRules = field(default_factory=CapacityRules)
+    # Optional persona override per language; the built-in prompt is used otherwise
+    instructions: dict[str, str] = field(default_factory=dict)
+    outbox_path: str | None = None
+    reservation_ids_path: str | None = None
+    dead_letter_path: str | None = None
+    info_path: str | None = None
+
+    @classmethod
+    def default(cls) -> TenantConfig:
+        """The single restaurant configured through environment variables."""
+        return cls(
+            DEFAULT_TENANT,
+            restaurant_name=os.getenv("RESTAURANT_NAME", "Restaurantia"),
+            webhook_url=os.getenv("N8N_WEBHOOK_URL"),
+            tts_voice=os.getenv("TTS_VOICE", "alloy"),
+            capacity=CapacityRules.from_env(),
+        )
+
+    @classmethod
+    def from_dict(cls, tenant_id: str, data: dict[str, Any], base: TenantConfig) -> TenantConfig:
+        """Overlay a tenant file on `base`; keys the file omits keep their base value."""
+        capacity = dataclasses.replace(base.capacity, **data.get("capacity", {}))
+        known = {f.name for f in dataclasses.fields(cls)} - {"tenant_id", "capacity"}
+        overrides = {key: value for key, value in data.items() if key in known}
+        if tenant_id != DEFAULT_TENANT:
+            overrides.setdefault("outbox_path", f"var/tenants/{tenant_id}/booking_outbox.db")
+            overrides.setdefault(
+                "reservation_ids_path", f"var/tenants/{tenant_id}/reservation_ids.db"
+            )
+            overrides.setdefault(
+                "dead_letter_path", f"var/tenants/{tenant_id}/webhook_dead_letter.jsonl"
+            )
+        return dataclasses.replace(base, tenant_id=tenant_id, capacity=capacity, **overrides)
+
+
+@dataclass(eq=False)
+class TenantResources:
+    """Per-tenant handles, shared by the calls that lease them in this process."""
+
+    config: TenantConfig
+    airtable: AsyncAirtableClient
+    outbox: BookingOutbox
+    slots: SlotIndex
+    holds: SlotHolds
+    webhooks: WebhookDispatcher
+    ids: ReservationIdAllocator
+    customers: CustomerDirectory
+    reservations: ReservationStore
+    info: RestaurantInfo
+    leases: int = 0
+    _warming: asyncio.Task | None = field(default=None, repr=False)
+    _journal_loaded: bool = field(default=False, repr=False)
+
+    @classmethod
+    def build(cls, config: TenantConfig) -> TenantResources:
+        airtable = AsyncAirtableClient.from_env(
+            base_id=config.airtable_base_id, table_name=config.airtable_table_name
+        )
+        outbox = BookingOutbox.from_env(airtable, path=config.outbox_path)
+        slots = SlotIndex(config.capacity)
+        holds = SlotHolds.from_env(slots, name=config.tenant_id, path=config.outbox_path)
+        return cls(
+            config,
+            airtable,
+            outbox,
+            slots,
+            holds,
+            WebhookDispatcher.from_env(url=config.webhook_url, dead_letter_path=config.dead_letter_path),
+            ReservationIdAllocator.from_env(path=config.reservation_ids_path),
+            CustomerDirectory.from_env(outbox, airtable),
+            ReservationStore(outbox, slots, holds),
+            RestaurantInfo.from_env(config.info_path),
+        )
+
+    async def start(self, slot_refresh_interval: float, slot_full_refresh_interval: float = 300.0) -> None:
+        """Load journaled bookings into the slot index, then start background
+        work on the running loop (idempotent)."""
+        if not self._journal_loaded:
+            # Includes bookings the outbox has not sent yet, which Airtable cannot know about
+            since = (restaurant_now().date() - timedelta(days=1)).isoformat()
+            try:
+                journaled = await self.outbox.booked_from(since)
+                loaded = self.slots.load_records({"fields": entry.fields} for entry in journaled)
+                self._journal_loaded = True
+                logger.info("📅 Slot index loaded %s journaled bookings", loaded)
+            except Exception as e:
+                logger.warning("⚠️ Could not load journaled bookings into the slot index: %s", e)
+        self.outbox.start()
+        self.slots.start(self.airtable, interval=slot_refresh_interval, full_interval=slot_full_refresh_interval)
+        self.holds.start()
+        if self._warming is None:
+            self._warming = asyncio.create_task(self._warm_ids(), name="reservation-ids")
+
+    async def _warm_ids(self) -> None:
+        # IDs journaled or in Airtable before the allocator existed must never
+        # be handed out again: the outbox would upsert over their rows
+        try:
+            journaled = await self.outbox.reservation_ids()
+            loaded = await self.ids.warm(journaled)
+            logger.info("🔑 Reservation IDs warmed: %s issued, %s journaled", loaded, len(journaled))
+            if self.airtable.configured:
+                found = await self.ids.sync_airtable(self.airtable)
+                logger.info("🔑 Reservation IDs synced from Airtable: %s new", found)
+        except Exception as e:
+            logger.warning("⚠️ Could not warm reservation IDs: %s", e)
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        self.slots.stop()
+        await self.holds.aclose()
+        pending = await self.outbox.drain(timeout=timeout)
+        if pending:
+            logger.warning("⚠️ Tenant %s closed with %s reservations queued", self.config.tenant_id, pending)
+        await self.outbox.aclose()
+        await self.ids.aclose()
+        await self.webhooks.drain(timeout=timeout)
+        await self.airtable.aclose()
+
+
+class TenantRegistry:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        build: Callable[[TenantConfig], TenantResources] = TenantResources.build,
+    ) -> None:
+        self.directory = directory
+        self._build = build
+        self._active: dict[str, TenantResources] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._base = TenantConfig.default()
+
+    @classmethod
+    def from_env(cls) -> TenantRegistry:
+        return cls(os.getenv("TENANTS_DIR", "tenants"))
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    async def pending_io(self) -> int:
+        """Reservations and n8n events this process still has to send, across tenants."""
+        total = 0
+        for resources in list(self._active.values()):
+            total += await resources.outbox.own_pending_count() + resources.webhooks.pending
+        return total
+
+    def load_config(self, tenant_id: str) -> TenantConfig:
+        """Read a tenant's config file (blocking; runs in a thread)."""
+        path = os.path.join(self.directory, f"{tenant_id}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            if tenant_id == DEFAULT_TENANT:
+                return self._base
+            raise UnknownTenantError(tenant_id) from None
+        config = TenantConfig.from_dict(tenant_id, data, self._base)
+        if config.info_path is None and tenant_id != DEFAULT_TENANT:
+            config = dataclasses.replace(
+                config, info_path=os.path.join(self.directory, f"{tenant_id}.info.json")
+            )
+        return config
+
+    async def acquire(self, tenant_id: str | None) -> TenantResources:
+        """Lease a tenant's resources for one call. Pair with `release`."""
+        tenant_id = tenant_id or DEFAULT_TENANT
+        if not _TENANT_ID_RE.match(tenant_id):
+            raise UnknownTenantError(tenant_id)
+
+        lock = self._locks.setdefault(tenant_id, asyncio.Lock())
+        async with lock:
+            resources = self._active.get(tenant_id)
+            if resources is None:
+                config = await asyncio.to_thread(self.load_config, tenant_id)
+                resources = self._active[tenant_id] = self._build(config)
+            resources.leases += 1
+        return resources
+
+    async def release(self, resources: TenantResources) -> None:
+        """End a call's lease; the last one closes the tenant's resources."""
+        resources.leases -= 1
+        if resources.leases:
+            return
+        if self._active.get(resources.config.tenant_id) is resources:
+            del self._active[resources.config.tenant_id]
+        try:
+            await resources.aclose()
+        except Exception as e:
+            logger.error("❌ Closing tenant resources failed: %s", e)
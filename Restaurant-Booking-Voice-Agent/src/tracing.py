@@ -0,0 +1,194 @@
+"""Per-stage latency tracing and a Prometheus-style metrics endpoint.
+
+Tool stages are wrapped in `span("book_table.parse")`-style context managers
+and LiveKit's pipeline metrics (end-of-utterance delay, LLM time to first
+token, TTS time to first byte) are fed in from the session's
+`metrics_collected` event. Every observation lands in an in-process series
+keyed by (stage, language, room); each series keeps its count, sum and a
+bounded reservoir of recent samples from which p50/p95/p99 are computed at
+scrape time.
+
+The series live in the job process, which LiveKit starts for one call and
+exits afterwards, so the endpoint is per job: each job process tries to
+serve `GET /metrics` on 127.0.0.1:METRICS_PORT for as long as its call
+lasts. While another job on the host holds the port, the newer job serves
+nothing and logs that; scrape a single-job host or a development worker.
+Set METRICS_PORT=0 to disable the endpoint. Components can also publish
+gauges (e.g. rate limiter queue depth) that are read at scrape time.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import math
+import os
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from aiohttp import web
+from livekit.agents.metrics import EOUMetrics, LLMMetrics, STTMetrics, TTSMetrics
+
+logger = logging.getLogger("agent.tracing")
+
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 2048
+
+# Labels attached to every observation made in the current job/task. None until
+# bound; every bind sets a new dict, so contexts never share one
+_labels: contextvars.ContextVar[dict[str, str] | None] = contextvars.ContextVar(
+    "tracing_labels", default=None
+)
+
+
+def bind_labels(**labels: str) -> None:
+    """Attach labels (e.g. room, language) to all spans in the current context."""
+    _labels.set({**(_labels.get() or {}), **labels})
+
+
+@dataclass
+class _Series:
+    count: int = 0
+    total: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=RESERVOIR_SIZE))
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self) -> list[tuple[float, float]]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return []
+        # Nearest-rank: the smallest sample with at least q of the samples at or below it
+        n = len(ordered)
+        return [(q, ordered[max(0, math.ceil(q * n) - 1)]) for q in QUANTILES]
+
+
+class LatencyRegistry:
+    def __init__(self) -> None:
+        self._series: dict[tuple[str, str, str], _Series] = {}
+        self._gauges: dict[tuple[str, tuple[tuple[str, str], ...]], Callable[[], float]] = {}
+
+    def gauge(self, name: str, read: Callable[[], float], **labels: str) -> None:
+        """Publish `read()` as gauge `name` on every scrape; re-registering replaces it."""
+        self._gauges[(name, tuple(sorted(labels.items())))] = read
+
+    def remove_gauge(self, name: str, read: Callable[[], float], **labels: str) -> None:
+        """Drop a gauge, unless it has since been re-registered by someone else."""
+        key = (name, tuple(sorted(labels.items())))
+        if self._gauges.get(key) == read:
+            del self._gauges[key]
+
+    def observe(self, stage: str, seconds: float, **labels: str) -> None:
+        merged = {**(_labels.get() or {}), **labels}
+        key = (stage, merged.get("language", ""), merged.get("room", ""))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+        series.observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def percentiles(self, stage: str, **labels: str) -> dict[float, float]:
+        """Quantiles for one stage, across all series matching `labels`."""
+        merged = _Series()
+        for (name, language, room), series in self._series.items():
+            if name != stage:
+                continue
+            if labels.get("language", language) != language or labels.get("room", room) != room:
+                continue
+            for value in series.samples:
+                merged.observe(value)
+        return dict(merged.quantiles())
+
+    def render(self) -> str:
+        lines = [
+            "# HELP agent_stage_latency_seconds Latency of agent tool and pipeline stages",
+            "# TYPE agent_stage_latency_seconds summary",
+        ]
+        for (stage, language, room), series in sorted(self._series.items()):
+            labels = f'stage="{stage}",language="{language}",room="{_escape(room)}"'
+            for q, value in series.quantiles():
+                lines.append(f'agent_stage_latency_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+            lines.append(f"agent_stage_latency_seconds_sum{{{labels}}} {series.total:.6f}")
+            lines.append(f"agent_stage_latency_seconds_count{{{labels}}} {series.count}")
+        typed: set[str] = set()
+        for (name, labels), read in sorted(self._gauges.items(), key=lambda item: item[0]):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            try:
+                value = read()
+            except Exception as e:
+                logger.warning("⚠️ Gauge %s failed: %s", name, e)
+                continue
+            rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+            lines.append(f"{name}{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = LatencyRegistry()
+span = REGISTRY.span
+observe = REGISTRY.observe
+
+
+def observe_pipeline_metrics(ev_metrics: object) -> None:
+    """Feed a LiveKit `metrics_collected` payload into the stage histograms."""
+    if isinstance(ev_metrics, EOUMetrics):
+        observe("eou.end_of_utterance_delay", ev_metrics.end_of_utterance_delay)
+        observe("eou.transcription_delay", ev_metrics.transcription_delay)
+    elif isinstance(ev_metrics, LLMMetrics):
+        if ev_metrics.ttft >= 0:
+            observe("llm.ttft", ev_metrics.ttft)
+        observe("llm.duration", ev_metrics.duration)
+    elif isinstance(ev_metrics, TTSMetrics):
+        if ev_metrics.ttfb >= 0:
+            observe("tts.ttfb", ev_metrics.ttfb)
+    elif isinstance(ev_metrics, STTMetrics):
+        observe("stt.duration", ev_metrics.duration)
+
+
+_runner: web.AppRunner | None = None
+
+
+async def start_metrics_server(port: int | None = None) -> int | None:
+    """Serve /metrics for this job process (idempotent). Returns the bound port."""
+    global _runner
+    if _runner is not None:
+        return _runner.addresses[0][1] if _runner.addresses else None
+
+    port = int(os.getenv("METRICS_PORT", "9464")) if port is None else port
+    if not port:
+        return None
+
+    async def handle_metrics(_: web.Request) -> web.Response:
+        return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+    except OSError as e:
+        await runner.cleanup()
+        logger.info("📈 Metrics port %s is taken (another job on this host?), not serving: %s", port, e)
+        return None
+    _runner = runner
+    logger.info("📈 Metrics endpoint: http://127.0.0.1:%s/metrics", port)
+    return port
@@ -0,0 +1,226 @@
+"""Content-addressed on-disk audio cache for the agent's fixed phrases.
+
+The greeting and the goodbye lines are the same text on every call, yet
+each used to be sent to the TTS provider again. The cache
+stores their synthesized audio as WAV files named by the SHA-256 of
+(voice, language, text), so a cached phrase plays back with no synthesis
+round trip and no TTS cost.
+
+The agent plays these phrases itself with `session.say(text, audio=...)`,
+taking the audio from `PhraseAudioCache.speak`: cached frames if there are
+any, otherwise the session's TTS output, which is written through once it
+has played in full. Replies the LLM writes are never looked up here, so the
+streaming TTS path is not delayed.
+
+The cache is filled at build time with `python src/tts_cache.py warm` (needs
+OPENAI_API_KEY) and otherwise fills itself on first use. Size is bounded by
+TTS_CACHE_MAX_MB; least recently used entries are evicted first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import time
+import wave
+from collections import OrderedDict
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+
+from livekit import rtc
+
+logger = logging.getLogger("agent.tts_cache")
+
+_WS_RE = re.compile(r"\s+")
+
+# Cached audio is replayed in frames of this length
+FRAME_MS = 100
+
+
+def normalize_phrase(text: str) -> str:
+    return _WS_RE.sub(" ", text).strip()
+
+
+def phrase_key(voice: str, language: str, text: str) -> str:
+    raw = f"{voice}\x00{language}\x00{normalize_phrase(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PhraseAudioCache:
+    def __init__(self, directory: str, *, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key -> file size, ordered from least to most recently used
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self._frames: dict[str, list[rtc.AudioFrame]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> PhraseAudioCache:
+        return cls(
+            os.getenv("TTS_CACHE_DIR", "var/tts_cache"),
+            max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024),
+        )
+
+    def load(self) -> None:
+        """Index the files already on disk (oldest access first). Sync, call from prewarm."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".wav"):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._remove_files(self._evict())
+        logger.info("🔊 TTS cache: %s phrases, %s KiB", len(self._entries), self._total_bytes // 1024)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def _evict(self) -> list[str]:
+        evicted = []
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._frames.pop(key, None)
+            evicted.append(key)
+        return evicted
+
+    def _remove_files(self, keys: list[str]) -> None:
+        for key in keys:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key))
+
+    def _read(self, key: str) -> list[rtc.AudioFrame]:
+        with wave.open(self._path(key), "rb") as wav:
+            sample_rate = wav.getframerate()
+            num_channels = wav.getnchannels()
+            pcm = wav.readframes(wav.getnframes())
+        os.utime(self._path(key))
+        return split_frames(pcm, sample_rate, num_channels)
+
+    def _write(self, key: str, frames: list[rtc.AudioFrame]) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + ".tmp"
+        with wave.open(tmp_path, "wb") as wav:
+            wav.setnchannels(frames[0].num_channels)
+            wav.setsampwidth(2)
+            wav.setframerate(frames[0].sample_rate)
+            for frame in frames:
+                wav.writeframes(bytes(frame.data))
+        os.replace(tmp_path, self._path(key))
+        return os.path.getsize(self._path(key))
+
+    async def get(self, voice: str, language: str, text: str) -> list[rtc.AudioFrame] | None:
+        key = phrase_key(voice, language, text)
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        frames = self._frames.get(key)
+        if frames is None:
+            try:
+                frames = await asyncio.get_running_loop().run_in_executor(None, self._read, key)
+            except (OSError, wave.Error, EOFError) as e:
+                logger.warning("⚠️ Dropping unreadable TTS cache entry %s: %s", key[:12], e)
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._frames[key] = frames
+        self.hits += 1
+        return frames
+
+    async def put(self, voice: str, language: str, text: str, frames: list[rtc.AudioFrame]) -> None:
+        if not frames:
+            return
+        key = phrase_key(voice, language, text)
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(None, self._write, key, frames)
+        self._total_bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self._frames[key] = frames
+        evicted = self._evict()
+        if evicted:
+            await loop.run_in_executor(None, self._remove_files, evicted)
+
+    async def speak(
+        self,
+        voice: str,
+        language: str,
+        text: str,
+        synthesize: Callable[[str], AsyncIterable[rtc.AudioFrame]],
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        """Audio for a fixed phrase, for `session.say(text, audio=...)`.
+
+        Plays the cached frames, or the frames of `synthesize(text)`, which are
+        cached once they have all been played; an interrupted phrase is not.
+        """
+        cached = await self.get(voice, language, text)
+        if cached is not None:
+            for frame in cached:
+                yield frame
+            return
+
+        captured = []
+        async for frame in synthesize(text):
+            captured.append(frame)
+            yield frame
+        await self.put(voice, language, text, captured)
+
+
+def split_frames(pcm: bytes, sample_rate: int, num_channels: int) -> list[rtc.AudioFrame]:
+    samples_per_frame = sample_rate * FRAME_MS // 1000
+    bytes_per_frame = samples_per_frame * num_channels * 2
+    frames = []
+    for start in range(0, len(pcm), bytes_per_frame):
+        data = pcm[start : start + bytes_per_frame]
+        frames.append(
+            rtc.AudioFrame(
+                data=data,
+                sample_rate=sample_rate,
+                num_channels=num_channels,
+                samples_per_channel=len(data) // (2 * num_channels),
+            )
+        )
+    return frames
+
+
+async def _warm(voice: str) -> None:
+    from livekit.plugins import openai
+
+    from agent import FIXED_PHRASES
+
+    cache = PhraseAudioCache.from_env()
+    cache.load()
+    tts = openai.TTS(voice=voice)
+    for language, phrases in FIXED_PHRASES.items():
+        for phrase in phrases:
+            if await cache.get(voice, language, phrase) is not None:
+                continue
+            started = time.perf_counter()
+            frame = await tts.synthesize(phrase).collect()
+            frames = split_frames(bytes(frame.data), frame.sample_rate, frame.num_channels)
+            await cache.put(voice, language, phrase, frames)
+            logger.info(
+                "🔊 Cached [%s] %r in %.2fs", language, phrase[:40], time.perf_counter() - started
+            )
+    await tts.aclose()
+
+
+if __name__ == "__main__":
+    import sys
+
+    from dotenv import load_dotenv
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(".env.local")
+    if sys.argv[1:2] != ["warm"]:
+        sys.exit("usage: python src/tts_cache.py warm")
+    asyncio.run(_warm(os.getenv("TTS_VOICE", "alloy")))
@@ -0,0 +1,378 @@
+"""Local ledger of what each call used: LLM tokens, STT audio, TTS output.
+
+The only record of usage used to be the one `Usage:` log line per call, so
+capacity and cost planning meant grepping logs. `SessionUsage` now collects
+a call's pipeline metrics (one row per LLM request, TTS segment, STT request
+and end of turn) plus running totals, and when the call ends
+`UsageLedger.append` writes them, tagged with tenant, room, language and
+booking outcome, to SQLite on a dedicated thread so the event loop never
+waits on disk.
+
+The ledger is partitioned by day: `USAGE_LEDGER_DIR/usage-YYYY-MM-DD.db`,
+by the restaurant's local date (RESTAURANT_TIMEZONE) when the call started.
+Several job processes append to the same file (WAL mode). Old months are
+archived or removed by moving or deleting their files.
+
+Costs are not stored, only units, so a report can be re-priced after a
+price change:
+
+    python src/usage_ledger.py report --from 2026-07-01 --by language
+    python src/usage_ledger.py report --by hour --to 2026-09-30
+    python src/usage_ledger.py report --by outcome --tenant nord
+
+Each partition is aggregated with one GROUP BY query and the sums are
+merged, so months of calls are summarized in well under a second. Prices
+default to OpenAI's list prices for the models the agent uses and can be
+overridden with USAGE_PRICE_* or command-line flags.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, TypeVar
+
+from livekit.agents.metrics import EOUMetrics, LLMMetrics, STTMetrics, TTSMetrics
+
+from datetime_parser import RESTAURANT_TIMEZONE, ZoneInfo
+
+logger = logging.getLogger("agent.usage")
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    tenant              TEXT NOT NULL,
+    room                TEXT NOT NULL,
+    language            TEXT NOT NULL,
+    outcome             TEXT NOT NULL,
+    bookings            INTEGER NOT NULL,
+    started_at          REAL NOT NULL,
+    hour                INTEGER NOT NULL,
+    duration            REAL NOT NULL,
+    llm_prompt_tokens   INTEGER NOT NULL,
+    llm_cached_tokens   INTEGER NOT NULL,
+    llm_completion_tokens INTEGER NOT NULL,
+    stt_audio_seconds   REAL NOT NULL,
+    tts_characters      INTEGER NOT NULL,
+    tts_audio_seconds   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    room                TEXT NOT NULL,
+    ts                  REAL NOT NULL,
+    kind                TEXT NOT NULL,
+    latency             REAL,
+    duration            REAL,
+    prompt_tokens       INTEGER,
+    cached_tokens       INTEGER,
+    completion_tokens   INTEGER,
+    characters          INTEGER,
+    audio_seconds       REAL
+);
+"""
+
+# A call is counted by its most significant outcome, lowest first
+OUTCOMES = ("none", "cancelled", "modified", "booked")
+GROUP_BY = {
+    "language": "language",
+    "hour": "hour",
+    "outcome": "outcome",
+    "tenant": "tenant",
+    # The partition's date, filled in per file
+    "day": None,
+}
+
+_TOTALS = (
+    "COUNT(*), SUM(bookings), SUM(duration), SUM(llm_prompt_tokens), SUM(llm_cached_tokens), "
+    "SUM(llm_completion_tokens), SUM(stt_audio_seconds), SUM(tts_characters), SUM(tts_audio_seconds)"
+)
+
+
+def _local(timestamp: float, tz: str = RESTAURANT_TIMEZONE) -> datetime:
+    if ZoneInfo is None:
+        return datetime.fromtimestamp(timestamp)
+    return datetime.fromtimestamp(timestamp, ZoneInfo(tz))
+
+
+@dataclass
+class SessionUsage:
+    """Usage of one call, fed from the session's `metrics_collected` event."""
+
+    tenant: str
+    room: str
+    language: str
+    started_at: float = field(default_factory=time.time)
+    llm_prompt_tokens: int = 0
+    llm_cached_tokens: int = 0
+    llm_completion_tokens: int = 0
+    stt_audio_seconds: float = 0.0
+    tts_characters: int = 0
+    tts_audio_seconds: float = 0.0
+    turns: list[tuple] = field(default_factory=list)
+
+    def collect(self, ev_metrics: object) -> None:
+        # Columns: kind, ts, latency, duration, prompt, cached, completion, characters, audio seconds
+        if isinstance(ev_metrics, LLMMetrics):
+            self.llm_prompt_tokens += ev_metrics.prompt_tokens
+            self.llm_cached_tokens += ev_metrics.prompt_cached_tokens
+            self.llm_completion_tokens += ev_metrics.completion_tokens
+            self.turns.append((
+                "llm", ev_metrics.timestamp, ev_metrics.ttft, ev_metrics.duration, ev_metrics.prompt_tokens,
+                ev_metrics.prompt_cached_tokens, ev_metrics.completion_tokens, None, None,
+            ))
+        elif isinstance(ev_metrics, TTSMetrics):
+            self.tts_characters += ev_metrics.characters_count
+            self.tts_audio_seconds += ev_metrics.audio_duration
+            self.turns.append((
+                "tts", ev_metrics.timestamp, ev_metrics.ttfb, ev_metrics.duration, None, None, None,
+                ev_metrics.characters_count, ev_metrics.audio_duration,
+            ))
+        elif isinstance(ev_metrics, STTMetrics):
+            self.stt_audio_seconds += ev_metrics.audio_duration
+            self.turns.append((
+                "stt", ev_metrics.timestamp, None, ev_metrics.duration, None, None, None, None,
+                ev_metrics.audio_duration,
+            ))
+        elif isinstance(ev_metrics, EOUMetrics):
+            self.turns.append((
+                "eou", ev_metrics.timestamp, ev_metrics.end_of_utterance_delay, ev_metrics.transcription_delay,
+                None, None, None, None, None,
+            ))
+
+
+@dataclass(frozen=True)
+class Prices:
+    """USD per unit; defaults are list prices for gpt-4o-mini, gpt-4o-mini-transcribe and gpt-4o-mini-tts."""
+
+    llm_input_per_m: float = 0.15
+    llm_cached_per_m: float = 0.075
+    llm_output_per_m: float = 0.60
+    stt_per_minute: float = 0.003
+    tts_per_minute: float = 0.015
+
+    @classmethod
+    def from_env(cls) -> Prices:
+        defaults = cls()
+        return cls(
+            llm_input_per_m=float(os.getenv("USAGE_PRICE_LLM_INPUT", defaults.llm_input_per_m)),
+            llm_cached_per_m=float(os.getenv("USAGE_PRICE_LLM_CACHED", defaults.llm_cached_per_m)),
+            llm_output_per_m=float(os.getenv("USAGE_PRICE_LLM_OUTPUT", defaults.llm_output_per_m)),
+            stt_per_minute=float(os.getenv("USAGE_PRICE_STT_MINUTE", defaults.stt_per_minute)),
+            tts_per_minute=float(os.getenv("USAGE_PRICE_TTS_MINUTE", defaults.tts_per_minute)),
+        )
+
+
+@dataclass
+class UsageTotals:
+    sessions: int = 0
+    bookings: int = 0
+    seconds: float = 0.0
+    llm_prompt_tokens: int = 0
+    llm_cached_tokens: int = 0
+    llm_completion_tokens: int = 0
+    stt_audio_seconds: float = 0.0
+    tts_characters: int = 0
+    tts_audio_seconds: float = 0.0
+
+    def add(self, row: tuple) -> None:
+        self.sessions += row[0]
+        self.bookings += row[1] or 0
+        self.seconds += row[2] or 0.0
+        self.llm_prompt_tokens += row[3] or 0
+        self.llm_cached_tokens += row[4] or 0
+        self.llm_completion_tokens += row[5] or 0
+        self.stt_audio_seconds += row[6] or 0.0
+        self.tts_characters += row[7] or 0
+        self.tts_audio_seconds += row[8] or 0.0
+
+    def cost(self, prices: Prices) -> float:
+        # Cached prompt tokens are part of the prompt tokens, billed at the cached rate
+        uncached = self.llm_prompt_tokens - self.llm_cached_tokens
+        return (
+            uncached * prices.llm_input_per_m / 1e6
+            + self.llm_cached_tokens * prices.llm_cached_per_m / 1e6
+            + self.llm_completion_tokens * prices.llm_output_per_m / 1e6
+            + self.stt_audio_seconds / 60 * prices.stt_per_minute
+            + self.tts_audio_seconds / 60 * prices.tts_per_minute
+        )
+
+
+class UsageLedger:
+    def __init__(self, directory: str, *, tz: str = RESTAURANT_TIMEZONE) -> None:
+        self.directory = directory
+        self.tz = tz
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usage-ledger")
+        self._day: str | None = None
+        self._conn: sqlite3.Connection | None = None
+
+    @classmethod
+    def from_env(cls) -> UsageLedger | None:
+        directory = os.getenv("USAGE_LEDGER_DIR", "var/usage")
+        return cls(directory) if directory else None
+
+    def path(self, day: str) -> str:
+        return os.path.join(self.directory, f"usage-{day}.db")
+
+    # -- SQLite (ledger thread only) ----------------------------------------
+
+    def _db(self, day: str) -> sqlite3.Connection:
+        if self._day != day:
+            if self._conn is not None:
+                self._conn.close()
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(self.path(day), isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Losing the last calls to a power cut is acceptable for a cost ledger
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            self._conn, self._day = conn, day
+        return self._conn
+
+    def _write(self, usage: SessionUsage, outcome: str, bookings: int, ended_at: float) -> None:
+        started = _local(usage.started_at, self.tz)
+        conn = self._db(started.date().isoformat())
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    usage.tenant, usage.room, usage.language, outcome, bookings, usage.started_at,
+                    started.hour, ended_at - usage.started_at, usage.llm_prompt_tokens,
+                    usage.llm_cached_tokens, usage.llm_completion_tokens, usage.stt_audio_seconds,
+                    usage.tts_characters, usage.tts_audio_seconds,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO turns (room, kind, ts, latency, duration, prompt_tokens, cached_tokens, "
+                "completion_tokens, characters, audio_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(usage.room, *turn) for turn in usage.turns],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = self._day = None
+
+    # -- async API ----------------------------------------------------------
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def append(self, usage: SessionUsage, *, outcome: str = "none", bookings: int = 0) -> None:
+        """Write a finished call's totals and per-turn rows to its day's partition."""
+        await self._run(self._write, usage, outcome, bookings, time.time())
+
+    async def aclose(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    # -- reports (blocking; CLI) --------------------------------------------
+
+    def partitions(self, start: date | None = None, end: date | None = None) -> Iterator[tuple[str, str]]:
+        """(day, path) of every partition from `start` to `end` inclusive, oldest first."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("usage-") and name.endswith(".db")):
+                continue
+            day = name[len("usage-"):-len(".db")]
+            if (start and day < start.isoformat()) or (end and day > end.isoformat()):
+                continue
+            yield day, os.path.join(self.directory, name)
+
+    def aggregate(
+        self, by: str, *, start: date | None = None, end: date | None = None, tenant: str | None = None
+    ) -> dict[Any, UsageTotals]:
+        if by not in GROUP_BY:
+            raise ValueError(f"cannot group by {by!r}; choose from {', '.join(GROUP_BY)}")
+        totals: dict[Any, UsageTotals] = {}
+        for day, path in self.partitions(start, end):
+            column = GROUP_BY[by] or "?"
+            sql = f"SELECT {column}, {_TOTALS} FROM sessions"
+            params: list[Any] = [day] if GROUP_BY[by] is None else []
+            if tenant:
+                sql += " WHERE tenant = ?"
+                params.append(tenant)
+            sql += " GROUP BY 1"
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                logger.warning("⚠️ Skipping unreadable partition %s: %s", path, e)
+                continue
+            finally:
+                conn.close()
+            for key, *row in rows:
+                totals.setdefault(key, UsageTotals()).add(tuple(row))
+        return totals
+
+
+def format_report(totals: dict[Any, UsageTotals], by: str, prices: Prices) -> str:
+    lines = [
+        f"{by:<10} {'calls':>7} {'booked':>7} {'minutes':>9} {'LLM in':>11} {'LLM out':>9} "
+        f"{'cost $':>9} {'$/call':>8} {'$/booking':>10}"
+    ]
+    overall = UsageTotals()
+    for key in sorted(totals):
+        t = totals[key]
+        overall.add(dataclasses.astuple(t))
+        lines.append(_report_line(str(key), t, prices))
+    lines.append(_report_line("total", overall, prices))
+    return "\n".join(lines)
+
+
+def _report_line(label: str, t: UsageTotals, prices: Prices) -> str:
+    cost = t.cost(prices)
+    per_call = cost / t.sessions if t.sessions else 0.0
+    per_booking = f"{cost / t.bookings:10.4f}" if t.bookings else f"{'-':>10}"
+    return (
+        f"{label:<10} {t.sessions:>7} {t.bookings:>7} {t.seconds / 60:>9.1f} {t.llm_prompt_tokens:>11} "
+        f"{t.llm_completion_tokens:>9} {cost:>9.4f} {per_call:>8.4f} {per_booking}"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate the usage ledger.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="usage and cost per group")
+    report.add_argument("--by", choices=list(GROUP_BY), default="day")
+    report.add_argument("--from", dest="start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    report.add_argument("--to", dest="end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    report.add_argument("--tenant")
+    report.add_argument("--dir", default=os.getenv("USAGE_LEDGER_DIR", "var/usage"))
+    defaults = Prices.from_env()
+    report.add_argument("--llm-input", type=float, default=defaults.llm_input_per_m, help="USD per 1M prompt tokens")
+    report.add_argument("--llm-cached", type=float, default=defaults.llm_cached_per_m, help="USD per 1M cached prompt tokens")
+    report.add_argument("--llm-output", type=float, default=defaults.llm_output_per_m, help="USD per 1M completion tokens")
+    report.add_argument("--stt-minute", type=float, default=defaults.stt_per_minute, help="USD per minute of STT audio")
+    report.add_argument("--tts-minute", type=float, default=defaults.tts_per_minute, help="USD per minute of TTS audio")
+    args = parser.parse_args(argv)
+
+    prices = Prices(args.llm_input, args.llm_cached, args.llm_output, args.stt_minute, args.tts_minute)
+    started = time.perf_counter()
+    totals = UsageLedger(args.dir).aggregate(args.by, start=args.start, end=args.end, tenant=args.tenant)
+    print(format_report(totals, args.by, prices))
+    print(f"({sum(t.sessions for t in totals.values())} calls in {time.perf_counter() - started:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv(".env.local")
+    raise SystemExit(main())
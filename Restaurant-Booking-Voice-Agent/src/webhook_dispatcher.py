@@ -0,0 +1,225 @@
+"""Fire-and-forget delivery of booking events to the n8n webhook.
+
+`book_table` used to open a fresh `aiohttp.ClientSession` and await the n8n
+POST before returning, so the caller heard silence for as long as n8n took
+to answer. The dispatcher instead owns one pooled session per worker process
+and a bounded queue drained by background workers; `submit` never waits.
+
+Failed deliveries are retried with jittered exponential backoff. Events that
+still cannot be delivered, or that arrive while the queue is full, are
+appended to a JSON-lines dead-letter file so nothing is silently lost. With
+`batch_size > 1` workers coalesce events that arrive within `batch_window`
+seconds into a single `{"events": [...]}` POST. Every POST attempt first
+waits for a slot from the host-wide `SharedRateLimiter`, so a burst of
+bookings across job processes reaches n8n smoothed out.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any
+from urllib.parse import urlparse
+
+import aiohttp
+
+import tracing
+from rate_limiter import RateLimitTimeoutError, SharedRateLimiter
+
+logger = logging.getLogger("agent.webhook")
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        url: str | None,
+        *,
+        queue_size: int = 1000,
+        workers: int = 2,
+        timeout: float = 10.0,
+        max_attempts: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        batch_size: int = 1,
+        batch_window: float = 0.5,
+        dead_letter_path: str = "var/webhook_dead_letter.jsonl",
+        limiter: SharedRateLimiter | None = None,
+    ) -> None:
+        self.url = url
+        self.queue_size = queue_size
+        self.num_workers = workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.batch_size = max(batch_size, 1)
+        self.batch_window = batch_window
+        self.dead_letter_path = dead_letter_path
+        # Dead letters are written from executor threads; one batch at a time keeps lines whole
+        self._dead_letter_lock = threading.Lock()
+        self._limiter = limiter
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+
+        self._queue: asyncio.Queue[dict[str, Any]] | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._workers: list[asyncio.Task] = []
+
+    @classmethod
+    def from_env(
+        cls, *, url: str | None = None, dead_letter_path: str | None = None
+    ) -> WebhookDispatcher:
+        url = url or os.getenv("N8N_WEBHOOK_URL")
+        return cls(
+            url,
+            queue_size=int(os.getenv("N8N_QUEUE_SIZE", "1000")),
+            workers=int(os.getenv("N8N_WORKERS", "2")),
+            timeout=float(os.getenv("N8N_TIMEOUT", "10")),
+            max_attempts=int(os.getenv("N8N_MAX_ATTEMPTS", "5")),
+            batch_size=int(os.getenv("N8N_BATCH_SIZE", "1")),
+            batch_window=float(os.getenv("N8N_BATCH_WINDOW", "0.5")),
+            dead_letter_path=dead_letter_path
+            or os.getenv("N8N_DEAD_LETTER_PATH", "var/webhook_dead_letter.jsonl"),
+            # Tenants' webhooks usually live on one n8n instance, which is what we protect
+            limiter=SharedRateLimiter.from_env(
+                f"n8n-{urlparse(url).hostname}" if url else "n8n", "N8N", rate=20, burst=5
+            ),
+        )
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Open the pooled session and start the workers on the running loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._session = aiohttp.ClientSession(timeout=self._timeout)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"n8n-webhook-{i}")
+            for i in range(self.num_workers)
+        ]
+
+    def submit(self, event: dict[str, Any]) -> bool:
+        """Queue an event for delivery without waiting on the network.
+
+        Returns False if the queue is full; the event is dead-lettered
+        instead, so a slow n8n never pushes latency back onto the caller.
+        """
+        if not self.url:
+            return False
+        self.start()
+        assert self._queue is not None
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("⚠️ n8n queue full (%s), dead-lettering event", self.queue_size)
+            self._dead_letter_soon([event], "queue full")
+            return False
+
+    async def _next_batch(self) -> list[dict[str, Any]]:
+        assert self._queue is not None
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._deliver(batch)
+            except asyncio.CancelledError:
+                # drain() gave up on the in-flight batch; keep it on disk
+                self._write_dead_letters(batch, "shutdown during delivery")
+                raise
+            except Exception as e:
+                logger.exception("❌ Unexpected n8n delivery error")
+                await self._dead_letter(batch, str(e))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: list[dict[str, Any]]) -> None:
+        assert self._session is not None and self.url
+        payload = batch[0] if self.batch_size == 1 else {"events": batch}
+        error = ""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            try:
+                if self._limiter is not None:
+                    await self._limiter.acquire()
+                with tracing.span("n8n.post", room="", language=""):
+                    async with self._session.post(self.url, json=payload) as resp:
+                        response_text = await resp.text()
+                        logger.debug("📨 n8n response status: %s", resp.status)
+                        if resp.status < 300:
+                            return
+                        error = f"HTTP {resp.status}: {response_text[:200]}"
+                        if resp.status != 429 and resp.status < 500:
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError, RateLimitTimeoutError) as e:
+                error = str(e) or type(e).__name__
+            logger.warning("⚠️ n8n webhook attempt %s failed: %s", attempt + 1, error)
+
+        await self._dead_letter(batch, error)
+
+    def _write_dead_letters(self, events: list[dict[str, Any]], error: str) -> None:
+        directory = os.path.dirname(self.dead_letter_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = "".join(
+            json.dumps({"ts": time.time(), "error": error, "event": event}) + "\n" for event in events
+        )
+        with self._dead_letter_lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def _dead_letter(self, events: list[dict[str, Any]], error: str) -> None:
+        logger.error("❌ n8n delivery failed, %s events dead-lettered: %s", len(events), error)
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_dead_letters, events, error
+        )
+
+    def _dead_letter_soon(self, events: list[dict[str, Any]], error: str) -> None:
+        asyncio.get_running_loop().run_in_executor(None, self._write_dead_letters, events, error)
+
+    async def drain(self, timeout: float) -> None:
+        """Deliver what is queued within `timeout`, dead-letter the rest, shut down."""
+        if not self._workers:
+            return
+        assert self._queue is not None
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ n8n drain timed out with %s events queued", self._queue.qsize())
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        leftover = []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        if leftover:
+            await self._dead_letter(leftover, "shutdown before delivery")
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
@@ -1,7 +1,14 @@
+import os
+
 import pytest
 from livekit.agents import AgentSession, inference, llm
 
-from agent import Assistant
+from agent import RestaurantiaAgent
+
+# These evals call LiveKit Inference; the offline load test lives in benchmarks/
+pytestmark = pytest.mark.skipif(
+    not os.getenv("LIVEKIT_API_KEY"), reason="LiveKit Inference credentials not set"
+)
 
 
 def _llm() -> llm.LLM:
@@ -15,7 +22,7 @@ async def test_offers_assistance() -> None:
         _llm() as llm,
         AgentSession(llm=llm) as session,
     ):
-        await session.start(Assistant())
+        await session.start(RestaurantiaAgent())
 
         # Run an agent turn following the user's greeting
         result = await session.run(user_input="Hello")
@@ -47,7 +54,7 @@ async def test_grounding() -> None:
         _llm() as llm,
         AgentSession(llm=llm) as session,
     ):
-        await session.start(Assistant())
+        await session.start(RestaurantiaAgent())
 
         # Run an agent turn following the user's request for information about their birth city (not known by the agent)
         result = await session.run(user_input="What city was I born in?")
@@ -89,7 +96,7 @@ async def test_refuses_harmful_request() -> None:
         _llm() as llm,
         AgentSession(llm=llm) as session,
     ):
-        await session.start(Assistant())
+        await session.start(RestaurantiaAgent())
 
         # Run an agent turn following an inappropriate request from the user
         result = await session.run(
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from airtable_client import AirtableError, AsyncAirtableClient
+
+
+async def _start_server(records: list[dict], *, fail_status: int | None = None):
+    async def create(request: web.Request) -> web.Response:
+        if fail_status:
+            return web.json_response({"error": "nope"}, status=fail_status)
+        body = await request.json()
+        if "records" in body:
+            created = [
+                {"id": f"rec{len(records) + i}", "fields": r["fields"]}
+                for i, r in enumerate(body["records"])
+            ]
+            records.extend(created)
+            return web.json_response({"records": created})
+        record = {"id": f"rec{len(records)}", "fields": body["fields"]}
+        records.append(record)
+        return web.json_response(record)
+
+    async def list_records(request: web.Request) -> web.Response:
+        page_size = int(request.query["pageSize"])
+        start = int(request.query.get("offset", 0))
+        page = {"records": records[start : start + page_size]}
+        if start + page_size < len(records):
+            page["offset"] = str(start + page_size)
+        return web.json_response(page)
+
+    async def delete(request: web.Request) -> web.Response:
+        record_ids = request.query.getall("records[]")
+        records[:] = [r for r in records if r["id"] not in record_ids]
+        return web.json_response({"records": [{"id": rid, "deleted": True} for rid in record_ids]})
+
+    app = web.Application()
+    app.router.add_post("/appTest/{table}", create)
+    app.router.add_delete("/appTest/{table}", delete)
+    app.router.add_get("/appTest/{table}", list_records)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _client(server: TestServer) -> AsyncAirtableClient:
+    return AsyncAirtableClient(
+        "pat_test", "appTest", "Order Summary", api_url=str(server.make_url(""))
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_and_paginate() -> None:
+    records: list[dict] = []
+    server = await _start_server(records)
+    client = _client(server)
+    try:
+        created = await client.create({"Reservation ID": "A7K2P"})
+        assert created["fields"]["Reservation ID"] == "A7K2P"
+
+        batch = await client.batch_create([{"Reservation ID": f"B{i}"} for i in range(4)])
+        assert len(batch) == 4
+
+        pages = [page async for page in client.iterate(page_size=2)]
+        assert [len(page) for page in pages] == [2, 2, 1]
+    finally:
+        await client.aclose()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_delete() -> None:
+    records: list[dict] = []
+    server = await _start_server(records)
+    client = _client(server)
+    try:
+        batch = await client.batch_create([{"Reservation ID": f"B{i}"} for i in range(3)])
+        deleted = await client.batch_delete([batch[0]["id"], batch[2]["id"]])
+        assert [r["id"] for r in deleted] == [batch[0]["id"], batch[2]["id"]]
+        assert [r["fields"]["Reservation ID"] for r in records] == ["B1"]
+    finally:
+        await client.aclose()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_error_status_raises() -> None:
+    server = await _start_server([], fail_status=429)
+    client = _client(server)
+    try:
+        with pytest.raises(AirtableError) as exc_info:
+            await client.create({"Reservation ID": "A7K2P"})
+        assert exc_info.value.retryable
+    finally:
+        await client.aclose()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_create_rejects_oversized_batches() -> None:
+    client = AsyncAirtableClient("pat_test", "appTest", "Order Summary")
+    with pytest.raises(ValueError):
+        await client.batch_create([{}] * 11)
+
+
+def test_a_session_from_an_earlier_loop_is_closed_not_leaked() -> None:
+    client = AsyncAirtableClient("test-token", "appTest", "Order Summary")
+    first = asyncio.run(client._ensure_session())
+    second = asyncio.run(client._ensure_session())
+
+    assert first.closed and second is not first
+    asyncio.run(client.aclose())
+    assert second.closed
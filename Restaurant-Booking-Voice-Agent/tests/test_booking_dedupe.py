@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from booking_dedupe import BookingDeduper, booking_key
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _booker(*results: tuple[str, bool], delay: float = 0.0):
+    calls: list[int] = []
+
+    async def book() -> tuple[str, bool]:
+        calls.append(len(calls))
+        await asyncio.sleep(delay)
+        return results[len(calls) - 1]
+
+    return book, calls
+
+
+def test_key_ignores_spelling_noise() -> None:
+    assert booking_key(" Sarah  Miller", "2025-10-12", "19:00", 2, "+49 123 456") == booking_key(
+        "sarah miller", "2025-10-12", "19:00", 2, "+49123456"
+    )
+    assert booking_key("Sarah", "2025-10-12", "19:00", 2, "x") != booking_key("Sarah", "2025-10-12", "19:00", 3, "x")
+
+
+@pytest.mark.asyncio
+async def test_repeat_returns_first_confirmation_without_booking_again() -> None:
+    deduper = BookingDeduper()
+    book, calls = _booker(("Confirmed, ID A7K2P", True), ("Confirmed, ID B8L3Q", True))
+    key = booking_key("Sarah", "2025-10-12", "19:00", 2, "+49123")
+
+    assert await deduper.run(key, book) == "Confirmed, ID A7K2P"
+    assert await deduper.run(key, book) == "Confirmed, ID A7K2P"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_repeat_waits_for_the_first_call() -> None:
+    deduper = BookingDeduper()
+    book, calls = _booker(("Confirmed, ID A7K2P", True), ("Confirmed, ID B8L3Q", True), delay=0.05)
+    key = booking_key("Sarah", "2025-10-12", "19:00", 2, "+49123")
+
+    replies = await asyncio.gather(deduper.run(key, book), deduper.run(key, book))
+    assert replies == ["Confirmed, ID A7K2P"] * 2
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_booking_is_not_remembered() -> None:
+    deduper = BookingDeduper()
+    book, calls = _booker(("Sorry, that did not work", False), ("Confirmed, ID A7K2P", True))
+    key = booking_key("Sarah", "2025-10-12", "19:00", 2, "+49123")
+
+    assert await deduper.run(key, book) == "Sorry, that did not work"
+    assert await deduper.run(key, book) == "Confirmed, ID A7K2P"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_interrupted_first_call_lets_the_repeat_book() -> None:
+    deduper = BookingDeduper()
+    book, calls = _booker(("Confirmed, ID A7K2P", True), ("Confirmed, ID B8L3Q", True), delay=0.05)
+    key = booking_key("Sarah", "2025-10-12", "19:00", 2, "+49123")
+
+    first = asyncio.create_task(deduper.run(key, book))
+    await asyncio.sleep(0.01)
+    repeat = asyncio.create_task(deduper.run(key, book))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await repeat == "Confirmed, ID B8L3Q"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_window_size_and_clear_bound_memory() -> None:
+    clock = _Clock()
+    deduper = BookingDeduper(window=60, max_entries=2, clock=clock)
+    book, calls = _booker(*[(f"Confirmed {i}", True) for i in range(10)])
+    keys = [booking_key("Sarah", "2025-10-12", f"{18 + i}:00", 2, "+49123") for i in range(3)]
+
+    for key in keys:
+        await deduper.run(key, book)
+    # Oldest booking dropped once the size limit is reached
+    assert len(deduper) == 2
+    assert await deduper.run(keys[0], book) == "Confirmed 3"
+
+    clock.now = 61
+    assert await deduper.run(keys[2], book) == "Confirmed 4"
+    assert len(calls) == 5
+
+    deduper.clear()
+    assert len(deduper) == 0
@@ -0,0 +1,205 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from airtable_client import AirtableError
+from booking_outbox import BookingOutbox
+
+
+class _FakeAirtable:
+    def __init__(self, failures: int = 0, delay: float = 0.0) -> None:
+        self.failures = failures
+        self.delay = delay
+        self.batches: list[list[dict]] = []
+        self.deleted: list[str] = []
+
+    async def batch_upsert(self, records: list[dict], *, merge_on: list[str]) -> list[dict]:
+        assert merge_on == ["Reservation ID"]
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise AirtableError(503, "unavailable")
+        self.batches.append(records)
+        return [{"id": f"rec{r['Reservation ID']}", "fields": r} for r in records]
+
+    async def batch_delete(self, record_ids: list[str]) -> list[dict]:
+        self.deleted.extend(record_ids)
+        return [{"id": rid, "deleted": True} for rid in record_ids]
+
+
+@pytest.mark.asyncio
+async def test_flushes_in_batches_of_ten(tmp_path) -> None:
+    airtable = _FakeAirtable()
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60)
+    try:
+        for i in range(23):
+            await outbox.enqueue(f"R{i:04d}", {"Reservation ID": f"R{i:04d}"})
+
+        assert await outbox.drain(timeout=5) == 0
+        sizes = sorted(len(batch) for batch in airtable.batches)
+        assert sum(sizes) == 23
+        assert max(sizes) <= 10
+
+        # Sent records are never sent again
+        assert await outbox.flush_once() == 0
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_back_off_and_stay_journaled(tmp_path) -> None:
+    airtable = _FakeAirtable(failures=1)
+    path = str(tmp_path / "outbox.db")
+    outbox = BookingOutbox(path, airtable, flush_interval=60, base_backoff=60)
+    await outbox.enqueue("A7K2P", {"Reservation ID": "A7K2P"})
+    await outbox.aclose()
+
+    # A fresh process opening the same journal still sees the reservation
+    outbox = BookingOutbox(path, airtable, flush_interval=60, base_backoff=60)
+    try:
+        assert await outbox.flush_once() == 0
+        assert await outbox.pending_count() == 1
+        # Backoff keeps the record out of the next flush
+        assert await outbox.flush_once() == 0
+        assert airtable.batches == []
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_each_process_counts_only_its_own_unsent_rows(tmp_path) -> None:
+    airtable = _FakeAirtable(failures=2)
+    path = str(tmp_path / "outbox.db")
+    # Two job processes sharing the host's journal
+    first = BookingOutbox(path, airtable, flush_interval=60, base_backoff=60)
+    second = BookingOutbox(path, airtable, flush_interval=60, base_backoff=60)
+    try:
+        await first.enqueue("A7K2P", {"Reservation ID": "A7K2P"})
+        await second.enqueue("B8M3Q", {"Reservation ID": "B8M3Q"})
+
+        assert await first.pending_count() == 2
+        assert await first.own_pending_count() == 1
+        assert await second.own_pending_count() == 1
+    finally:
+        await first.aclose()
+        await second.aclose()
+
+    airtable.failures = 0
+    third = BookingOutbox(path, airtable, flush_interval=60)
+    try:
+        await third.enqueue("C9N4R", {"Reservation ID": "C9N4R"})
+        assert await third.drain(timeout=5) == 2
+        assert await third.own_pending_count() == 0
+    finally:
+        await third.aclose()
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_background_flush(tmp_path) -> None:
+    airtable = _FakeAirtable(delay=0.2)
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60)
+    try:
+        await outbox.enqueue("A7K2P", {"Reservation ID": "A7K2P"})
+        # Let the background flusher claim the row before draining
+        await asyncio.sleep(0.05)
+        assert await outbox.drain(timeout=5) == 0
+        assert len(airtable.batches) == 1
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_journals_created_before_customer_columns_are_migrated(tmp_path) -> None:
+    path = str(tmp_path / "outbox.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE outbox (reservation_id TEXT PRIMARY KEY, fields TEXT NOT NULL, "
+        "created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+        "next_attempt_at REAL NOT NULL, claimed_until REAL NOT NULL DEFAULT 0, "
+        "last_error TEXT, airtable_id TEXT, sent_at REAL)"
+    )
+    conn.execute("INSERT INTO outbox (reservation_id, fields, created_at, next_attempt_at) VALUES ('OLD01', '{}', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    outbox = BookingOutbox(path, _FakeAirtable(), flush_interval=60)
+    try:
+        await outbox.enqueue("NEW01", {"Customer Name": "Ada"}, customer_phone="+4915112345", language="de")
+        await outbox.enqueue("NEW02", {"Customer Name": "Ada L."}, customer_phone="+4915112345", language="de")
+        assert await outbox.pending_count() == 3
+        history = await outbox.customer_history("+4915112345", limit=5)
+        assert history == [({"Customer Name": "Ada L."}, "de"), ({"Customer Name": "Ada"}, "de")]
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_amended_rows_are_upserted_again_and_cancelled_rows_deleted(tmp_path) -> None:
+    airtable = _FakeAirtable()
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60)
+    try:
+        await outbox.enqueue("A7K2P", {"Reservation ID": "A7K2P", "Reservation Date": "10/20/2026"})
+        await outbox.enqueue("B8M3Q", {"Reservation ID": "B8M3Q", "Reservation Date": "10/21/2026"})
+        assert await outbox.drain(timeout=5) == 0
+
+        assert await outbox.amend("A7K2P", {"Reservation ID": "A7K2P", "Reservation Date": "10/22/2026"})
+        assert await outbox.cancel("B8M3Q")
+        # Nothing moves a cancelled reservation back
+        assert not await outbox.amend("B8M3Q", {"Reservation ID": "B8M3Q"})
+        assert await outbox.drain(timeout=5) == 0
+
+        assert airtable.batches[-1] == [{"Reservation ID": "A7K2P", "Reservation Date": "10/22/2026"}]
+        assert airtable.deleted == ["recB8M3Q"]
+        assert [e.reservation_id for e in await outbox.find(date_from="2026-10-22")] == ["A7K2P"]
+        assert [e.reservation_id for e in await outbox.find(reservation_id="B8M3Q")] == []
+        cancelled = await outbox.find(reservation_id="B8M3Q", include_cancelled=True)
+        assert cancelled[0].cancelled
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_before_sending_never_reaches_airtable(tmp_path) -> None:
+    airtable = _FakeAirtable()
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60)
+    try:
+        await outbox.enqueue("A7K2P", {"Reservation ID": "A7K2P"})
+        await outbox.cancel("A7K2P")
+        assert await outbox.drain(timeout=5) == 0
+        assert airtable.batches == [] and airtable.deleted == []
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_change_during_in_flight_batch_is_sent_afterwards(tmp_path) -> None:
+    airtable = _FakeAirtable(delay=0.2)
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60)
+    try:
+        await outbox.enqueue("A7K2P", {"Reservation ID": "A7K2P", "Customer Name": "Ada"})
+        # Let the background flusher claim the row, then change it
+        await asyncio.sleep(0.05)
+        await outbox.amend("A7K2P", {"Reservation ID": "A7K2P", "Customer Name": "Ada L."})
+
+        # The in-flight batch carried the old name, so the row goes out again
+        assert await outbox.drain(timeout=5) == 0
+        assert [batch[0]["Customer Name"] for batch in airtable.batches] == ["Ada", "Ada L."]
+    finally:
+        await outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_change_during_failing_batch_is_not_backed_off(tmp_path) -> None:
+    airtable = _FakeAirtable(failures=1, delay=0.2)
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60, base_backoff=60)
+    try:
+        await outbox.enqueue("A7K2P", {"Reservation ID": "A7K2P", "Customer Name": "Ada"})
+        await asyncio.sleep(0.05)
+        await outbox.amend("A7K2P", {"Reservation ID": "A7K2P", "Customer Name": "Ada L."})
+
+        # The failure belongs to the old version; the amended row goes out right away
+        assert await outbox.drain(timeout=5) == 0
+        assert [batch[0]["Customer Name"] for batch in airtable.batches] == ["Ada L."]
+    finally:
+        await outbox.aclose()
@@ -0,0 +1,75 @@
+from livekit.agents import llm
+
+from context_compaction import BookingState, ContextCompactor, estimate_tokens
+
+
+def _chat(turns: int) -> llm.ChatContext:
+    ctx = llm.ChatContext()
+    ctx.add_message(role="system", content="You are Restaurantia. " * 40, id="instructions")
+    for i in range(turns):
+        ctx.add_message(role="user", content=f"Question {i} about the menu? " * 10, id=f"user{i}")
+        if i == 2:
+            ctx.items.append(llm.FunctionCall(call_id="c1", name="check_availability", arguments='{"guests": 4}', id="call"))
+            ctx.items.append(llm.FunctionCallOutput(call_id="c1", name="check_availability", output="Yes", is_error=False, id="out"))
+        ctx.add_message(role="assistant", content=f"Answer {i}. " * 20, id=f"assistant{i}")
+    return ctx
+
+
+def test_short_calls_are_sent_unchanged() -> None:
+    compactor = ContextCompactor(budget=10_000)
+    ctx = _chat(3)
+    assert compactor.compact(ctx, BookingState(), "en") is ctx
+    assert compactor.tokens_saved == 0
+
+
+def test_old_turns_are_replaced_by_the_booking_summary() -> None:
+    compactor = ContextCompactor(budget=400, keep_items=2)
+    state = BookingState(customer_name="Ada", date="2026-10-20", guests=4)
+    ctx = _chat(10)
+
+    sent = compactor.compact(ctx, state, "en")
+
+    assert sent.items[0].id == "instructions"
+    summary = sent.items[1]
+    assert summary.role == "system" and "name Ada, date 2026-10-20, 4 guests" in summary.text_content
+    assert sent.items[-1].id == "assistant9"
+    # Newest turns are kept up to half the budget
+    assert sum(estimate_tokens(item) for item in sent.items[2:]) <= 200
+    assert compactor.tokens_saved > 0
+    # The session's own history is left alone
+    assert len(ctx.items) == 23
+
+
+def test_cut_point_and_summary_stay_put_between_compactions() -> None:
+    compactor = ContextCompactor(budget=400, keep_items=4)
+    state = BookingState()
+    ctx = _chat(10)
+    first = compactor.compact(ctx, state, "en")
+
+    state.update(customer_name="Ada")
+    ctx.add_message(role="user", content="And for dessert?", id="user10")
+    second = compactor.compact(ctx, state, "en")
+
+    # Same prefix as the previous request, so the provider's prompt cache still applies
+    assert [item.id for item in second.items[: len(first.items)]] == [item.id for item in first.items]
+    assert second.items[1].text_content == first.items[1].text_content
+
+
+def test_tool_calls_are_never_split_from_their_results() -> None:
+    ctx = _chat(4)
+    for budget in range(50, 800, 10):
+        sent = ContextCompactor(budget=budget, keep_items=1).compact(ctx, BookingState(), "de")
+        kept = [item.type for item in sent.items[1:]]
+        assert kept[0] == "message"
+        if "function_call_output" in kept:
+            assert "function_call" in kept
+
+
+def test_newest_item_is_kept_even_when_it_alone_is_over_budget() -> None:
+    ctx = _chat(4)
+    ctx.add_message(role="user", content="A very long question. " * 200, id="long")
+
+    sent = ContextCompactor(budget=400, keep_items=0).compact(ctx, BookingState(), "en")
+
+    assert [item.id for item in sent.items[-1:]] == ["long"]
+    assert sent.items[1].role == "system" and sent.items[0].id == "instructions"
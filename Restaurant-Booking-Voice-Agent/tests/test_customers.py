@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from customers import CustomerDirectory, normalize_phone
+
+
+class _FakeOutbox:
+    def __init__(self, history: dict[str, list] | None = None, delay: float = 0.0) -> None:
+        self.history = history or {}
+        self.delay = delay
+        self.lookups: list[str] = []
+
+    async def customer_history(self, customer_phone: str, limit: int = 3) -> list:
+        self.lookups.append(customer_phone)
+        await asyncio.sleep(self.delay)
+        return self.history.get(customer_phone, [])[:limit]
+
+
+def _booking(reservation_id: str, name: str, date: str) -> dict:
+    return {
+        "Reservation ID": reservation_id,
+        "Customer Name": name,
+        "Reservation Date": date,
+        "Reservation Time": "19:00",
+        "Reservation Summary": "2 guests",
+    }
+
+
+def test_normalize_phone() -> None:
+    assert normalize_phone("+49 151 123-456") == "+49151123456"
+    assert normalize_phone("0151 123456") == "0151123456"
+    assert normalize_phone("Unknown") is None
+    assert normalize_phone(None) is None
+
+
+@pytest.mark.asyncio
+async def test_recognizes_caller_from_latest_booking() -> None:
+    outbox = _FakeOutbox({
+        "+49151123456": [
+            (_booking("B2222", "Ada Lovelace", "2026-10-01"), "de"),
+            (_booking("A1111", "Ada", "2026-09-01"), "en"),
+        ]
+    })
+    directory = CustomerDirectory(outbox)
+
+    profile = await directory.lookup("+49 151 123456")
+
+    assert profile.name == "Ada Lovelace"
+    assert profile.language == "de"
+    assert [b.reservation_id for b in profile.bookings] == ["B2222", "A1111"]
+    note = profile.context_note("en")
+    assert "Ada Lovelace" in note and "2026-10-01 19:00" in note and "German" in note
+
+
+@pytest.mark.asyncio
+async def test_unknown_and_placeholder_numbers() -> None:
+    outbox = _FakeOutbox()
+    directory = CustomerDirectory(outbox)
+
+    assert await directory.prefetch("0151 123456") is None
+    # Placeholder numbers never reach the journal
+    assert await directory.lookup("Unknown") is None
+    assert outbox.lookups == ["0151123456"]
+
+
+class _FakeAirtable:
+    configured = True
+
+    def __init__(self, rows: list[dict], delay: float = 0.0) -> None:
+        self.rows = rows
+        self.delay = delay
+        self.formulas: list[str] = []
+
+    async def iterate(self, *, formula=None, fields=None, page_size=100):
+        self.formulas.append(formula)
+        await asyncio.sleep(self.delay)
+        yield [{"id": f"rec{i}", "fields": fields} for i, fields in enumerate(self.rows)]
+
+
+@pytest.mark.asyncio
+async def test_finds_bookings_made_outside_this_journal_in_airtable() -> None:
+    outbox = _FakeOutbox({"+49151123456": [(_booking("A1111", "Ada", "2026-09-01"), "de")]})
+    # Booked by hand at the front desk, after the journaled one
+    airtable = _FakeAirtable([
+        {**_booking("B2222", "Ada Lovelace", "10/01/2026"), "Phone": "+49 151 123456"},
+        {**_booking("A1111", "Ada", "09/01/2026"), "Phone": "+49151123456"},
+    ])
+    directory = CustomerDirectory(outbox, airtable, phone_field="Phone")
+
+    profile = await directory.lookup("+49 151 123456")
+
+    assert airtable.formulas == ['REGEX_REPLACE({Phone} & "", "[^0-9]", "") = "49151123456"']
+    assert profile.name == "Ada Lovelace" and profile.language == "de"
+    assert [b.reservation_id for b in profile.bookings] == ["B2222", "A1111"]
+
+    # A number only Airtable knows
+    assert (await directory.lookup("0170 999999")).name == "Ada Lovelace"
+
+
+@pytest.mark.asyncio
+async def test_slow_airtable_falls_back_to_the_journal() -> None:
+    outbox = _FakeOutbox({"0151123456": [(_booking("A1111", "Ada", "2026-09-01"), "en")]})
+    airtable = _FakeAirtable([_booking("B2222", "Someone", "10/01/2026")], delay=1)
+    directory = CustomerDirectory(outbox, airtable, phone_field="Phone", timeout=0.05)
+
+    profile = await asyncio.wait_for(directory.lookup("0151123456"), 0.5)
+    assert [b.reservation_id for b in profile.bookings] == ["A1111"]
+    # Without a phone column Airtable is not asked at all
+    airtable.formulas.clear()
+    await CustomerDirectory(outbox, airtable).lookup("0151123456")
+    assert airtable.formulas == []
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+
+from datetime_parser import parse_booking_datetime
+
+# A Wednesday
+NOW = datetime(2025, 10, 8, 15, 0)
+
+
+@pytest.mark.parametrize(
+    ("date_text", "time_text", "expected"),
+    [
+        # The formats book_table always accepted
+        ("2025-10-15", "19:00", datetime(2025, 10, 15, 19, 0)),
+        ("10/15/2025", "19:00", datetime(2025, 10, 15, 19, 0)),
+        ("2025-10-15", "07:30", datetime(2025, 10, 15, 7, 30)),
+        # English
+        ("tomorrow", "7pm", datetime(2025, 10, 9, 19, 0)),
+        ("tomorrow at 7pm", "", datetime(2025, 10, 9, 19, 0)),
+        ("today", "half past seven", datetime(2025, 10, 8, 19, 30)),
+        ("next Friday", "8:15 pm", datetime(2025, 10, 10, 20, 15)),
+        ("next Wednesday", "noon", datetime(2025, 10, 15, 12, 0)),
+        ("Wednesday", "quarter to eight", datetime(2025, 10, 8, 19, 45)),
+        ("October 15th", "seven o'clock", datetime(2025, 10, 15, 19, 0)),
+        ("15th of October", "9 in the morning", datetime(2025, 10, 15, 9, 0)),
+        ("March 3", "7:30", datetime(2026, 3, 3, 7, 30)),
+        ("the day after tomorrow", "at 9", datetime(2025, 10, 10, 9, 0)),
+        ("in 3 days", "6 pm", datetime(2025, 10, 11, 18, 0)),
+        ("10/15", "19:00", datetime(2025, 10, 15, 19, 0)),
+        # German
+        ("15. Oktober", "19 Uhr", datetime(2025, 10, 15, 19, 0)),
+        ("15. Oktober 19 Uhr", "", datetime(2025, 10, 15, 19, 0)),
+        ("15.10.2025", "19.30", datetime(2025, 10, 15, 19, 30)),
+        ("15.10.", "19:00", datetime(2025, 10, 15, 19, 0)),
+        ("morgen", "halb acht", datetime(2025, 10, 9, 19, 30)),
+        ("übermorgen", "8 Uhr morgens", datetime(2025, 10, 10, 8, 0)),
+        ("nächsten Freitag", "um 7 abends", datetime(2025, 10, 10, 19, 0)),
+        ("heute", "viertel nach acht abends", datetime(2025, 10, 8, 20, 15)),
+        ("Samstag", "halb eins", datetime(2025, 10, 11, 12, 30)),
+    ],
+)
+def test_parses_spoken_dates_and_times(date_text: str, time_text: str, expected: datetime) -> None:
+    assert parse_booking_datetime(date_text, time_text, now=NOW) == expected
+
+
+@pytest.mark.parametrize(
+    ("date_text", "time_text", "expected"),
+    [
+        # am/pm and spoken minutes after a spoken hour
+        ("tomorrow", "ten pm", datetime(2025, 10, 9, 22, 0)),
+        ("tomorrow", "seven thirty pm", datetime(2025, 10, 9, 19, 30)),
+        ("tomorrow", "nine thirty", datetime(2025, 10, 9, 9, 30)),
+        ("tomorrow", "eight forty-five", datetime(2025, 10, 9, 20, 45)),
+        ("morgen", "sieben Uhr dreißig", datetime(2025, 10, 9, 19, 30)),
+        # An unqualified eight is dinner time, not breakfast
+        ("tomorrow", "half past eight", datetime(2025, 10, 9, 20, 30)),
+        # Meal words pick the half of the day
+        ("tomorrow", "dinner at eight", datetime(2025, 10, 9, 20, 0)),
+        ("tomorrow", "dinner at 9", datetime(2025, 10, 9, 21, 0)),
+        ("morgen", "Abendessen um acht", datetime(2025, 10, 9, 20, 0)),
+        ("tomorrow", "lunch at one", datetime(2025, 10, 9, 13, 0)),
+        ("tomorrow", "lunch at eleven", datetime(2025, 10, 9, 11, 0)),
+        ("morgen", "Mittagessen um halb eins", datetime(2025, 10, 9, 12, 30)),
+        # A day of the month on its own is this month's, or next month's once past
+        ("the 20th", "7pm", datetime(2025, 10, 20, 19, 0)),
+        ("the 3rd", "7pm", datetime(2025, 11, 3, 19, 0)),
+        ("the 31st", "7pm", datetime(2025, 10, 31, 19, 0)),
+        ("am 20.", "19 Uhr", datetime(2025, 10, 20, 19, 0)),
+    ],
+)
+def test_spoken_hours_keep_minutes_and_half_of_day(
+    date_text: str, time_text: str, expected: datetime
+) -> None:
+    assert parse_booking_datetime(date_text, time_text, now=NOW) == expected
+
+
+@pytest.mark.parametrize(
+    ("date_text", "time_text"),
+    [
+        ("sometime soon", "19:00"),
+        ("tomorrow", "whenever"),
+        ("15.10.2025", ""),
+        ("2025-02-30", "19:00"),
+        ("the 32nd", "19:00"),
+    ],
+)
+def test_rejects_what_it_cannot_understand(date_text: str, time_text: str) -> None:
+    with pytest.raises(ValueError):
+        parse_booking_datetime(date_text, time_text, now=NOW)
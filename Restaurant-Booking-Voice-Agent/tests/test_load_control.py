@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from load_control import (
+    WORKER_PID_ENV,
+    LoadMonitor,
+    ProcessStatus,
+    ProcessStatusWriter,
+    read_statuses,
+)
+
+
+def _monitor(tmp_path, cpu: float = 0.1) -> LoadMonitor:
+    return LoadMonitor(
+        str(tmp_path / "load"),
+        threshold=0.7,
+        max_sessions=10,
+        max_loop_lag=0.1,
+        max_pending_io=100,
+        drain_file=str(tmp_path / "drain"),
+        cpu=lambda: cpu,
+    )
+
+
+def _report(tmp_path, pid: int, *, loop_lag: float = 0.0, pending_io: int = 0, age: float = 0.0) -> None:
+    # Job processes report under their parent, i.e. the worker running the monitor
+    writer = ProcessStatusWriter(str(tmp_path / "load"), pending_io=None, worker_pid=os.getpid())
+    writer.write(ProcessStatus(pid, time.time() - age, loop_lag, pending_io))
+
+
+def _worker(sessions: int) -> SimpleNamespace:
+    return SimpleNamespace(active_jobs=[object()] * sessions)
+
+
+def test_idle_worker_reports_cpu(tmp_path) -> None:
+    assert _monitor(tmp_path, cpu=0.25)(_worker(0)) == 0.25
+
+
+@pytest.mark.parametrize(
+    ("sessions", "loop_lag", "pending_io", "full"),
+    [
+        (5, 0.02, 10, False),
+        (10, 0.02, 10, True),  # session limit
+        (5, 0.15, 10, True),  # one lagging process is enough
+        (5, 0.02, 120, True),  # send backlog summed over processes
+    ],
+)
+def test_any_signal_at_its_limit_marks_the_worker_full(tmp_path, sessions, loop_lag, pending_io, full) -> None:
+    _report(tmp_path, 101, loop_lag=0.01, pending_io=pending_io // 2)
+    _report(tmp_path, 102, loop_lag=loop_lag, pending_io=pending_io - pending_io // 2)
+    monitor = _monitor(tmp_path)
+    assert (monitor(_worker(sessions)) >= monitor.threshold) is full
+
+
+def test_stale_reports_are_ignored_and_removed(tmp_path) -> None:
+    _report(tmp_path, 101, loop_lag=5.0, age=60)
+    directory = str(tmp_path / "load")
+    assert read_statuses(directory, os.getpid(), max_age=5) == []
+    assert os.listdir(os.path.join(directory, str(os.getpid()))) == []
+
+
+def test_drain_file_reports_full_load_until_removed(tmp_path) -> None:
+    monitor = _monitor(tmp_path)
+    (tmp_path / "drain").touch()
+    assert monitor(_worker(0)) == 1.0
+    (tmp_path / "drain").unlink()
+    assert monitor(_worker(0)) < monitor.threshold
+
+
+def test_jobs_report_to_the_published_worker_pid(tmp_path, monkeypatch) -> None:
+    # As under LiveKit's forkserver, where a job's parent is not the worker
+    monkeypatch.setenv(WORKER_PID_ENV, "4242")
+    writer = ProcessStatusWriter(str(tmp_path / "load"), pending_io=None)
+    writer.write(ProcessStatus(101, time.time(), 0.0, 150))
+
+    assert writer.directory == str(tmp_path / "load" / "4242")
+    assert _monitor(tmp_path)(_worker(0)) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_writer_publishes_lag_and_pending_io(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv(WORKER_PID_ENV, raising=False)
+
+    async def pending_io() -> int:
+        return 7
+
+    writer = ProcessStatusWriter(str(tmp_path / "load"), pending_io, interval=0.05)
+    writer.start()
+    try:
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            statuses = read_statuses(str(tmp_path / "load"), os.getppid(), max_age=5)
+            if statuses:
+                break
+    finally:
+        writer._task.cancel()
+    assert [(s.pid, s.pending_io) for s in statuses] == [(os.getpid(), 7)]
+    assert statuses[0].loop_lag >= 0
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from livekit.agents import AgentSession
+
+from agent import N8nConversationAgent
+from n8n_chat import N8nChatClient, N8nChatError, N8nLLM
+
+
+async def _start_server(handler) -> TestServer:
+    app = web.Application()
+    app.router.add_post("/webhook/chat", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_streams_items_before_the_reply_is_finished() -> None:
+    release = asyncio.Event()
+    seen: list[dict] = []
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        seen.append(await request.json())
+        resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await resp.prepare(request)
+        for event in ({"type": "begin"}, {"type": "item", "content": "Hello, "}):
+            await resp.write(json.dumps(event).encode() + b"\n")
+        await release.wait()
+        for event in ({"type": "item", "content": "table for two?"}, {"type": "end"}):
+            await resp.write(json.dumps(event).encode() + b"\n")
+        return resp
+
+    server = await _start_server(handler)
+    client = N8nChatClient(str(server.make_url("/webhook/chat")))
+    try:
+        chunks = client.stream("hi", "livekit_room-a")
+        # The first item is available while the server is still generating
+        assert await asyncio.wait_for(chunks.__anext__(), timeout=2) == "Hello, "
+        release.set()
+        assert [chunk async for chunk in chunks] == ["table for two?"]
+        assert seen == [{"usermessage": "hi", "sessionKey": "livekit_room-a"}]
+    finally:
+        await client.aclose()
+        await server.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("content_type", "body", "expected"),
+    [
+        ("application/json", '{"agentOutput": "See you at seven."}', "See you at seven."),
+        ("application/json", '[{"output": "See you at seven."}]', "See you at seven."),
+        ("text/event-stream", "data: See you \n\ndata: at seven.\n\n", "See you at seven."),
+        ("text/plain", "See you at seven.", "See you at seven."),
+    ],
+)
+async def test_understands_classic_and_streamed_bodies(content_type, body, expected) -> None:
+    async def handler(request: web.Request) -> web.Response:
+        return web.Response(text=body, content_type=content_type)
+
+    server = await _start_server(handler)
+    client = N8nChatClient(str(server.make_url("/webhook/chat")))
+    try:
+        chunks = [chunk async for chunk in client.stream("hi", "k")]
+        assert " ".join(c.strip() for c in chunks) == expected
+    finally:
+        await client.aclose()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_error_status_raises_and_llm_speaks_fallback() -> None:
+    async def handler(request: web.Request) -> web.Response:
+        return web.json_response({"message": "Workflow could not be started"}, status=500)
+
+    server = await _start_server(handler)
+    client = N8nChatClient(str(server.make_url("/webhook/chat")))
+    try:
+        with pytest.raises(N8nChatError):
+            [chunk async for chunk in client.stream("hi", "k")]
+
+        fallback = "There was an internal error connecting to the booking system."
+        async with (
+            N8nLLM(client, "livekit_room-a", fallback=fallback) as n8n_llm,
+            AgentSession(llm=n8n_llm) as session,
+        ):
+            await session.start(N8nConversationAgent())
+            result = await session.run(user_input="Do you have a table tonight?")
+            message = result.expect.next_event().is_message(role="assistant").event().item
+            assert message.text_content == fallback
+    finally:
+        await client.aclose()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_url_raises_the_chat_error() -> None:
+    client = N8nChatClient(None)
+    with pytest.raises(N8nChatError, match="N8N_CHAT_URL is not set"):
+        [chunk async for chunk in client.stream("hi", "k")]
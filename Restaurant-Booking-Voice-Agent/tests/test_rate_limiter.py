@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+import tracing
+from airtable_client import AirtableError, AsyncAirtableClient
+from rate_limiter import RateLimitTimeoutError, SharedRateLimiter
+
+
+def _limiter(tmp_path, **kwargs) -> SharedRateLimiter:
+    kwargs.setdefault("rate", 20)
+    return SharedRateLimiter("airtable-appTest", directory=str(tmp_path), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_processes_share_one_evenly_spaced_schedule(tmp_path) -> None:
+    # Two limiters on the same file stand in for two job processes
+    a, b = _limiter(tmp_path), _limiter(tmp_path)
+    try:
+        started = time.monotonic()
+        waits = await asyncio.gather(*(limiter.acquire() for limiter in (a, b, a, b)))
+        elapsed = time.monotonic() - started
+    finally:
+        a.close()
+        b.close()
+
+    # Slots are granted in request order, one interval (50ms) apart
+    assert waits == sorted(waits)
+    assert waits[0] == 0
+    assert waits[-1] == pytest.approx(0.15, abs=0.02)
+    assert elapsed >= 0.14
+
+
+@pytest.mark.asyncio
+async def test_burst_passes_then_calls_are_spaced(tmp_path) -> None:
+    limiter = _limiter(tmp_path, burst=3)
+    try:
+        waits = [await limiter.acquire() for _ in range(3)]
+        assert waits == [0, 0, 0]
+        assert await limiter.acquire() > 0
+    finally:
+        limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_refuses_calls_beyond_max_wait_and_reports_depth(tmp_path) -> None:
+    limiter = _limiter(tmp_path, rate=10, max_wait=0.25)
+    try:
+        waiting = [asyncio.create_task(limiter.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        # First slot is immediate, the next two are still queued host-wide
+        assert limiter.queue_depth() == 2
+        assert 'agent_rate_limit_queue_depth{limiter="airtable-appTest",scope="host"} 2' in (
+            tracing.REGISTRY.render()
+        )
+
+        with pytest.raises(RateLimitTimeoutError):
+            await limiter.acquire()
+        # A refused call does not take a slot
+        assert limiter.queue_depth() == 2
+
+        await asyncio.gather(*waiting)
+        assert limiter.queue_depth() == 0
+    finally:
+        limiter.close()
+    assert 'limiter="airtable-appTest"' not in tracing.REGISTRY.render()
+
+
+@pytest.mark.asyncio
+async def test_disabled_limiter_never_waits(tmp_path) -> None:
+    limiter = _limiter(tmp_path, rate=0)
+    assert [await limiter.acquire() for _ in range(50)] == [0.0] * 50
+    assert limiter.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_airtable_client_reports_refused_slot_as_retryable(tmp_path) -> None:
+    limiter = _limiter(tmp_path, rate=1, max_wait=0.1)
+    client = AsyncAirtableClient("pat_test", "appTest", "Order Summary", limiter=limiter)
+    await limiter.acquire()
+    try:
+        with pytest.raises(AirtableError) as excinfo:
+            await client.create({"Reservation ID": "A7K2P"})
+        assert excinfo.value.status == 429 and excinfo.value.retryable
+    finally:
+        await client.aclose()
@@ -0,0 +1,154 @@
+import pytest
+
+from airtable_client import AirtableError
+from booking_outbox import BookingOutbox
+from reconcile import Reconciler, ReconcileState, record_hash
+
+
+class _FakeAirtable:
+    """A table that answers a modified-time query with the rows written since the last read."""
+
+    def __init__(self) -> None:
+        self.records: dict[str, dict] = {}
+        self.modified: set[str] = set()
+        self.formulas: list[str | None] = []
+        self.writes = 0
+        self.fail = False
+
+    def put(self, fields: dict) -> dict:
+        rid = fields["Reservation ID"]
+        record = self.records.setdefault(rid, {"id": f"rec{rid}", "fields": {}})
+        record["fields"] = dict(fields)
+        self.modified.add(rid)
+        return record
+
+    async def batch_upsert(self, records: list[dict], *, merge_on: list[str]) -> list[dict]:
+        assert merge_on == ["Reservation ID"] and len(records) <= 10
+        if self.fail:
+            raise AirtableError(503, "unavailable")
+        self.writes += 1
+        return [self.put(fields) for fields in records]
+
+    async def batch_delete(self, record_ids: list[str]) -> list[dict]:
+        if self.fail:
+            raise AirtableError(503, "unavailable")
+        self.writes += 1
+        for rid in [rid for rid, record in self.records.items() if record["id"] in record_ids]:
+            del self.records[rid]
+        return [{"id": rid, "deleted": True} for rid in record_ids]
+
+    async def iterate(self, *, formula=None, fields=None, page_size=100):
+        self.formulas.append(formula)
+        rows = [record for rid, record in self.records.items() if formula is None or rid in self.modified]
+        self.modified.clear()
+        yield rows
+
+
+def _fields(rid: str, name: str = "Guest") -> dict:
+    return {
+        "Reservation ID": rid,
+        "Customer Name": name,
+        "Reservation Time": "19:00",
+        "Reservation Date": "10/15/2025",
+        "Reservation Summary": "2 guests",
+    }
+
+
+def test_hash_ignores_date_format_and_extra_columns():
+    airtable_row = {**_fields("A"), "Reservation Date": "2025-10-15", "Table": "12"}
+    assert record_hash(airtable_row) == record_hash(_fields("A"))
+    assert record_hash(_fields("A", "Other")) != record_hash(_fields("A"))
+
+
+@pytest.mark.asyncio
+async def test_repairs_drift_then_reads_only_changes(tmp_path):
+    airtable = _FakeAirtable()
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60, max_attempts=1)
+    state = ReconcileState(str(tmp_path / "reconcile.db"))
+    reconciler = Reconciler(airtable, outbox, state)
+    try:
+        for rid in ("A", "C", "D"):
+            await outbox.enqueue(rid, _fields(rid))
+        assert await outbox.drain(timeout=5) == 0
+
+        # The outbox gives up on a booking and on a cancellation
+        airtable.fail = True
+        await outbox.enqueue("B", _fields("B"))
+        await outbox.cancel("C")
+        await outbox.drain(timeout=5)
+        airtable.fail = False
+        # Staff edit one row and add another; Airtable returns ISO dates
+        airtable.put({**_fields("D"), "Customer Name": "Dana"})
+        airtable.put(_fields("E"))
+        airtable.records["A"]["fields"]["Reservation Date"] = "2025-10-15"
+
+        report = await reconciler.run()
+        assert airtable.formulas == [None]
+        assert (report.missing, report.mismatched, report.deleted) == (["B"], [], ["C"])
+        assert (report.edited_in_airtable, report.airtable_only) == (["D"], ["E"])
+        assert (report.in_sync, report.failed) == (1, [])
+        assert set(airtable.records) == {"A", "B", "D", "E"}
+        assert airtable.records["D"]["fields"]["Customer Name"] == "Dana"
+        # Repaired rows are not sent again by the outbox
+        assert await outbox.pending_count() == 0
+
+        writes = airtable.writes
+        report = await reconciler.run()
+        assert "LAST_MODIFIED_TIME()" in airtable.formulas[-1]
+        assert report.remote_changed == 1  # B, written by the previous run
+        assert (report.missing, report.mismatched, report.deleted, report.edited_in_airtable) == ([], [], [], [])
+        assert airtable.writes == writes
+    finally:
+        await outbox.aclose()
+        state.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_repairs_are_retried_and_dry_run_writes_nothing(tmp_path):
+    airtable = _FakeAirtable()
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60, max_attempts=1)
+    state = ReconcileState(str(tmp_path / "reconcile.db"))
+    reconciler = Reconciler(airtable, outbox, state)
+    try:
+        await outbox.enqueue("A", _fields("A"))
+        assert await outbox.drain(timeout=5) == 0
+        airtable.fail = True
+        await outbox.amend("A", _fields("A", "Alex"))
+        await outbox.drain(timeout=5)
+
+        report = await reconciler.run(dry_run=True)
+        assert report.mismatched == ["A"] and state.meta() == {}
+
+        report = await reconciler.run()
+        assert report.failed == ["A"] and state.meta()["retry"] == ["A"]
+
+        airtable.fail = False
+        report = await reconciler.run()
+        assert report.mismatched == ["A"] and report.failed == []
+        assert airtable.records["A"]["fields"]["Customer Name"] == "Alex"
+        assert await outbox.pending_count() == 0
+    finally:
+        await outbox.aclose()
+        state.close()
+
+
+@pytest.mark.asyncio
+async def test_full_run_finds_rows_deleted_in_airtable(tmp_path):
+    airtable = _FakeAirtable()
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), airtable, flush_interval=60, max_attempts=1)
+    state = ReconcileState(str(tmp_path / "reconcile.db"))
+    reconciler = Reconciler(airtable, outbox, state)
+    try:
+        await outbox.enqueue("A", _fields("A"))
+        assert await outbox.drain(timeout=5) == 0
+        report = await reconciler.run()
+        assert report.in_sync == 1
+
+        # Someone deletes the row in Airtable; the state still remembers it
+        del airtable.records["A"]
+        report = await reconciler.run(full=True)
+        assert (report.missing, report.in_sync) == (["A"], 0)
+        assert airtable.records["A"]["fields"] == _fields("A")
+    finally:
+        await outbox.aclose()
+        state.close()
@@ -0,0 +1,32 @@
+import copy
+import json
+import math
+from datetime import date
+from pathlib import Path
+
+from replay import diff_baseline, load_transcripts, normalize, run
+
+TRANSCRIPTS = Path(__file__).resolve().parent.parent / "benchmarks" / "transcripts"
+
+
+def test_normalizes_dates_and_reservation_ids():
+    today = date(2026, 10, 17)
+    assert normalize("Reservation A7K2P on 10/18/2026, see 2026-10-20", today) == (
+        "Reservation <ID> on {day+1}, see {day+3}"
+    )
+
+
+def test_sample_transcripts_match_the_baseline():
+    turns = run(load_transcripts([str(TRANSCRIPTS)]), processes=1, concurrency=5)
+
+    assert [f"{t.conversation}#{t.index}: {t.problems}" for t in turns if not t.ok] == []
+    baseline = json.loads((TRANSCRIPTS / "baseline.json").read_text(encoding="utf-8"))
+    assert diff_baseline(turns, baseline, tolerance=math.inf, floor_ms=0) == []
+
+    changed = copy.deepcopy(baseline)
+    changed["conversations"]["en-book"][1]["tools"] = ["check_availability"]
+    del changed["conversations"]["en-cancel"]
+    assert diff_baseline(turns, changed, tolerance=math.inf, floor_ms=0) == [
+        "en-cancel: not in baseline",
+        "en-book#1 tools: ['check_availability'] -> ['book_table']",
+    ]
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from reservation_ids import ALPHABET, ID_SPACE, ReservationIdAllocator, decode, encode
+
+
+def test_alphabet_avoids_lookalikes_and_codes_round_trip() -> None:
+    assert len(ALPHABET) == 31 and not set("01ILO") & set(ALPHABET)
+    for index in (0, 1, 12345, ID_SPACE - 1):
+        assert decode(encode(index)) == index
+    assert decode("A7K2P".lower()) == decode("A7K2P")
+    # Legacy random IDs with 0/O/1/I/L can never clash with ours
+    assert decode("A0K2P") is None and decode("ABCD") is None
+
+
+@pytest.mark.asyncio
+async def test_ids_are_unique_and_survive_a_restart(tmp_path) -> None:
+    path = str(tmp_path / "ids.db")
+    allocator = ReservationIdAllocator(path)
+    first = [await allocator.allocate() for _ in range(200)]
+    await allocator.aclose()
+
+    assert len(set(first)) == 200
+    assert all(len(rid) == 5 and set(rid) <= set(ALPHABET) for rid in first)
+    # Consecutive IDs do not look sequential
+    assert first[0][:3] != first[1][:3]
+
+    restarted = ReservationIdAllocator(path)
+    assert await restarted.warm() == 200
+    assert restarted.is_issued(first[0])
+    assert await restarted.allocate() not in first
+    await restarted.aclose()
+
+
+@pytest.mark.asyncio
+async def test_processes_sharing_the_file_never_collide(tmp_path) -> None:
+    # Two allocators on one file stand in for two job processes
+    a = ReservationIdAllocator(str(tmp_path / "ids.db"))
+    b = ReservationIdAllocator(str(tmp_path / "ids.db"))
+    try:
+        ids = await asyncio.gather(*(x.allocate() for x in (a, b) * 50))
+    finally:
+        await a.aclose()
+        await b.aclose()
+    assert len(set(ids)) == 100
+
+
+@pytest.mark.asyncio
+async def test_known_and_taken_ids_are_skipped(tmp_path) -> None:
+    probe = ReservationIdAllocator(str(tmp_path / "probe.db"))
+    upcoming = [await probe.allocate() for _ in range(3)]
+    await probe.aclose()
+
+    allocator = ReservationIdAllocator(str(tmp_path / "ids.db"))
+    try:
+        # The first ID was journaled before the allocator existed
+        await allocator.warm([upcoming[0]])
+        # The second is already in Airtable, as seen by the slot index
+        issued = await allocator.allocate(taken=lambda rid: rid == upcoming[1])
+        assert issued == upcoming[2]
+    finally:
+        await allocator.aclose()
+
+
+@pytest.mark.asyncio
+async def test_node_lanes_are_disjoint(tmp_path) -> None:
+    lanes = [ReservationIdAllocator(str(tmp_path / f"host{n}.db"), node=n, nodes=2) for n in (0, 1)]
+    try:
+        issued = [await lane.allocate() for lane in lanes for _ in range(50)]
+    finally:
+        for lane in lanes:
+            await lane.aclose()
+    assert len(set(issued)) == 100
+    with pytest.raises(ValueError):
+        ReservationIdAllocator(str(tmp_path / "x.db"), node=2, nodes=2)
+
+
+class _FakeAirtable:
+    base_id = "appTEST"
+    table_name = "Reservations"
+
+    def __init__(self, pages: list[list[dict]]) -> None:
+        self.pages = pages
+        self.calls: list[tuple[str | None, list[str] | None]] = []
+
+    async def iterate(self, *, formula=None, fields=None):
+        self.calls.append((formula, fields))
+        for page in self.pages:
+            yield page
+
+
+@pytest.mark.asyncio
+async def test_past_and_legacy_airtable_rows_are_never_reissued(tmp_path) -> None:
+    probe = ReservationIdAllocator(str(tmp_path / "probe.db"))
+    upcoming = [await probe.allocate() for _ in range(2)]
+    await probe.aclose()
+
+    # A booking from last year, on the second page, and a legacy random ID
+    airtable = _FakeAirtable(
+        [
+            [{"id": "rec1", "fields": {"Reservation ID": "A0K2P"}}, {"id": "rec2", "fields": {}}],
+            [{"id": "rec3", "fields": {"Reservation ID": upcoming[0]}}],
+        ]
+    )
+    path = str(tmp_path / "ids.db")
+    allocator = ReservationIdAllocator(path)
+    try:
+        assert await allocator.sync_airtable(airtable) == 1
+        assert airtable.calls == [(None, ["Reservation ID"])]
+        assert await allocator.allocate() == upcoming[1]
+
+        # Later syncs only read rows modified since the previous one
+        await allocator.sync_airtable(airtable)
+        assert airtable.calls[1][0].startswith("IS_AFTER(LAST_MODIFIED_TIME(), '")
+    finally:
+        await allocator.aclose()
+
+    # Recorded in the file, so other job processes skip it without reading Airtable
+    restarted = ReservationIdAllocator(path)
+    await restarted.warm()
+    assert restarted.is_issued(upcoming[0])
+    await restarted.aclose()
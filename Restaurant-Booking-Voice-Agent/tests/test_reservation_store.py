@@ -0,0 +1,149 @@
+from datetime import date
+
+import pytest
+
+from agent import RestaurantiaAgent
+from booking_outbox import BookingOutbox
+from reservation_store import Reservation, ReservationNotFoundError, ReservationStore
+from slot_holds import SlotHolds
+from slot_index import CapacityRules, SlotIndex
+
+DAY = date(2026, 10, 20)
+
+
+class _NullAirtable:
+    async def batch_upsert(self, records: list[dict], *, merge_on: list[str]) -> list[dict]:
+        return [{"id": f"rec{r['Reservation ID']}"} for r in records]
+
+    async def batch_delete(self, record_ids: list[str]) -> list[dict]:
+        return [{"id": rid, "deleted": True} for rid in record_ids]
+
+
+def _store(tmp_path) -> ReservationStore:
+    outbox = BookingOutbox(str(tmp_path / "outbox.db"), _NullAirtable(), flush_interval=60)
+    return ReservationStore(outbox, SlotIndex(CapacityRules(guests_per_slot=10)))
+
+
+async def _book(store: ReservationStore, reservation: Reservation) -> None:
+    await store.outbox.enqueue(
+        reservation.reservation_id, reservation.airtable_fields(), customer_phone=reservation.customer_phone
+    )
+    store.slots.add(reservation.reservation_id, reservation.day, reservation.minutes, reservation.guests)
+
+
+def test_airtable_fields() -> None:
+    reservation = Reservation("A7K2P", "Ada", "+49151", DAY, 19 * 60, 4, "birthday dinner")
+    fields = reservation.airtable_fields()
+    assert fields["Reservation Date"] == "10/20/2026"
+    assert fields["Reservation Time"] == "19:00"
+    assert fields["Reservation Summary"] == "4 guests. birthday dinner"
+
+
+@pytest.mark.asyncio
+async def test_finds_by_spoken_id_and_by_phone_and_date(tmp_path) -> None:
+    store = _store(tmp_path)
+    try:
+        await _book(store, Reservation("A7K2P", "Ada", "+49151", DAY, 19 * 60, 4, "birthday dinner"))
+        await _book(store, Reservation("B8M3Q", "Ada", "+49151", date(2026, 10, 25), 12 * 60, 2))
+        await _book(store, Reservation("C9N4R", "Grace", "+49170", DAY, 19 * 60, 2))
+
+        found = await store.get("a 7 k-2 p")
+        assert found == Reservation("A7K2P", "Ada", "+49151", DAY, 19 * 60, 4, "birthday dinner")
+
+        upcoming = await store.upcoming("+49151", start=date(2026, 10, 19))
+        assert [r.reservation_id for r in upcoming] == ["A7K2P", "B8M3Q"]
+        assert [r.reservation_id for r in await store.upcoming("+49151", start=DAY, end=DAY)] == ["A7K2P"]
+    finally:
+        await store.outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_modify_checks_capacity_without_counting_itself(tmp_path) -> None:
+    store = _store(tmp_path)
+    try:
+        reservation = Reservation("A7K2P", "Ada", "+49151", DAY, 19 * 60, 6)
+        await _book(store, reservation)
+        await _book(store, Reservation("C9N4R", "Grace", "+49170", DAY, 12 * 60, 6))
+
+        # Growing in place only competes with other bookings
+        grown = await store.modify(reservation, day=DAY, minutes=19 * 60, guests=10)
+        assert grown.guests == 10 and store.slots.remaining(DAY, 19 * 60) == 0
+
+        # Moving into a full slot leaves everything as it was
+        assert await store.modify(grown, day=DAY, minutes=12 * 60, guests=10) is None
+        assert store.slots.remaining(DAY, 19 * 60) == 0
+        assert (await store.get("A7K2P")).guests == 10
+    finally:
+        await store.outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_moving_a_booking_respects_holds_in_other_processes(tmp_path) -> None:
+    path = str(tmp_path / "outbox.db")
+    slots = SlotIndex(CapacityRules(guests_per_slot=10))
+    store = ReservationStore(BookingOutbox(path, _NullAirtable(), flush_interval=60), slots, SlotHolds(slots, path))
+    # Another call, with its own slot index, sharing the journal
+    other = SlotHolds(SlotIndex(CapacityRules(guests_per_slot=10)), path)
+    try:
+        reservation = Reservation("A7K2P", "Ada", "+49151", DAY, 12 * 60, 6)
+        await _book(store, reservation)
+        held = await other.place(DAY, 19 * 60, 6)
+
+        assert await store.modify(reservation, day=DAY, minutes=19 * 60, guests=6) is None
+        assert slots.remaining(DAY, 12 * 60) == 4
+
+        await other.release(held)
+        moved = await store.modify(reservation, day=DAY, minutes=19 * 60, guests=6)
+        assert moved.minutes == 19 * 60 and slots.remaining(DAY, 12 * 60) == 10
+        assert len(store.holds) == 0 and slots.remaining(DAY, 19 * 60) == 4
+        # The other call now counts the moved booking's seats
+        assert await other.place(DAY, 19 * 60, 6) is None
+    finally:
+        await other.aclose()
+        await store.holds.aclose()
+        await store.outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel_frees_the_table(tmp_path) -> None:
+    store = _store(tmp_path)
+    try:
+        reservation = Reservation("A7K2P", "Ada", "+49151", DAY, 19 * 60, 10)
+        await _book(store, reservation)
+
+        assert await store.cancel(reservation)
+        assert store.slots.remaining(DAY, 19 * 60) == 10
+        assert (await store.get("A7K2P")).cancelled
+        assert await store.upcoming("+49151", start=DAY) == []
+        assert not await store.cancel(reservation)
+        with pytest.raises(ReservationNotFoundError):
+            await store.modify(reservation, day=DAY, minutes=12 * 60, guests=2)
+        assert "A7K2P" not in store.slots
+    finally:
+        await store.outbox.aclose()
+
+
+@pytest.mark.asyncio
+async def test_tools_refuse_callers_who_cannot_show_the_reservation_is_theirs(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv("N8N_WEBHOOK_URL", raising=False)
+    store = _store(tmp_path)
+    try:
+        await _book(store, Reservation("A7K2P", "Ada Lovelace", "+49151", DAY, 19 * 60, 4))
+        # Someone else calling, with Ada's reservation ID
+        agent = RestaurantiaAgent(
+            customer_phone="+49170123", outbox=store.outbox, slots=store.slots, reservations=store
+        )
+
+        refused = await agent.find_reservation("A7K2P", "", "")
+        assert "What name was it booked under?" in refused
+        assert "Ada" not in refused and "19:00" not in refused
+        assert "What name" in await agent.modify_reservation("A7K2P", "", "", 2)
+        assert "What name" in await agent.cancel_reservation("A7K2P")
+        reservation = await store.get("A7K2P")
+        assert reservation.guests == 4 and not reservation.cancelled
+
+        # Giving the name it was booked under proves it
+        assert "Ada Lovelace" in await agent.find_reservation("A7K2P", "", "ada  lovelace")
+        assert "cancelled" in await agent.cancel_reservation("A7K2P")
+    finally:
+        await store.outbox.aclose()
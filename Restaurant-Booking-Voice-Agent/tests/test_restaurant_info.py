@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from restaurant_info import RestaurantInfo, build_indexes, tokenize
+
+KNOWLEDGE = {
+    "hours": [
+        {"days": {"en": "Monday to Friday", "de": "Montag bis Freitag"}, "open": "11:30", "close": "22:00"},
+        {"days": {"en": "Sunday", "de": "Sonntag"}, "closed": True},
+    ],
+    "menu": [
+        {
+            "name": {"en": "Margherita pizza", "de": "Pizza Margherita"},
+            "category": {"en": "pizza", "de": "Pizza"},
+            "description": {"en": "tomato, mozzarella and basil", "de": "Tomate, Mozzarella und Basilikum"},
+            "price": 11.5,
+            "allergens": ["gluten", "milk"],
+            "tags": ["vegetarian"],
+        },
+        {"name": "Tiramisu", "category": "Dessert", "price": 7, "allergens": ["eggs", "milk"]},
+        {"name": {"en": "Pistachio cake", "de": "Pistazienkuchen"}, "category": "Dessert", "price": 6, "allergens": ["nuts"]},
+    ],
+    "faq": [
+        {
+            "keywords": {"en": ["address", "directions", "parking"], "de": ["Adresse", "Anfahrt", "Parkplatz"]},
+            "answer": {"en": "We're at Hafenstrasse 12.", "de": "Wir sind in der Hafenstraße 12."},
+        }
+    ],
+}
+
+
+def _write(path, data: dict) -> None:
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_tokenize_folds_umlauts_and_plurals():
+    assert tokenize("Öffnungszeiten am Sonntag?", "de") == tokenize("offnungszeiten sonntag", "de")
+    assert tokenize("desserts", "en") == tokenize("dessert", "en")
+    assert tokenize("Nüsse", "de") == tokenize("Nuss", "de")
+
+
+def test_answers_in_both_languages():
+    indexes = build_indexes(KNOWLEDGE)
+    info = RestaurantInfo("unused")
+    info._indexes = indexes
+
+    assert info.lookup("are you open on sunday", "en") == [
+        "Our opening hours: Monday to Friday 11:30 to 22:00, Sunday closed."
+    ]
+    assert info.lookup("Habt ihr am Sonntag geöffnet?", "de")[0].startswith("Unsere Öffnungszeiten")
+    assert info.lookup("how much is the tiramisu", "en") == ["Tiramisu, 7 euros. Contains eggs, milk."]
+    assert info.lookup("Was kostet die Pizza?", "de")[0] == (
+        "Pizza Margherita, 11,50 Euro: Tomate, Mozzarella und Basilikum (vegetarisch). Enthält Gluten, Milch."
+    )
+    assert info.lookup("Habt ihr etwas mit Nüssen?", "de") == ["Pistazienkuchen, 6 Euro. Enthält Nüsse."]
+    assert info.lookup("what desserts do you have", "en")[0] == "Dessert: Tiramisu, Pistachio cake."
+    assert info.lookup("what's on the menu", "en") == ["On the menu: pizza, Dessert."]
+    # An English word in a German call still answers in German
+    assert info.lookup("parking", "de") == ["Wir sind in der Hafenstraße 12."]
+    assert info.lookup("do you have sushi", "en") == []
+
+
+
+def test_fallback_matches_the_same_fact_when_languages_list_different_categories():
+    # One English category, two German ones: the German index has an extra
+    # snippet, so position no longer lines the languages up
+    knowledge = {
+        **KNOWLEDGE,
+        "menu": [
+            *KNOWLEDGE["menu"],
+            {"name": "Calzone", "category": {"en": "pizza", "de": "Pizzen"}, "price": 12},
+        ],
+    }
+    info = RestaurantInfo("unused")
+    info._indexes = build_indexes(knowledge)
+
+    assert info.lookup("parking", "de") == ["Wir sind in der Hafenstraße 12."]
+    assert info.lookup("Adresse", "en") == ["We're at Hafenstrasse 12."]
+    assert info.lookup("calzone", "de") == ["Calzone, 12 Euro."]
+    assert info.lookup("Pizzen", "de")[0] == "Pizza: Pizza Margherita, Calzone."
+
+@pytest.mark.asyncio
+async def test_reloads_when_the_file_changes(tmp_path):
+    path = tmp_path / "info.json"
+    info = RestaurantInfo(str(path), reload_interval=0)
+
+    await info.refresh()
+    assert info.lookup("opening hours", "en") == []
+
+    _write(path, KNOWLEDGE)
+    await info.refresh()
+    assert info.lookup("tiramisu", "en") == ["Tiramisu, 7 euros. Contains eggs, milk."]
+
+    changed = {**KNOWLEDGE, "menu": [{"name": "Tiramisu", "price": 8}]}
+    _write(path, changed)
+    os.utime(path, (1, 1))
+    await info.refresh()
+    assert info.lookup("tiramisu", "en") == ["Tiramisu, 8 euros."]
+
+    # A broken edit keeps the last good version
+    path.write_text("{", encoding="utf-8")
+    os.utime(path, (2, 2))
+    await info.refresh()
+    assert info.lookup("tiramisu", "en") == ["Tiramisu, 8 euros."]
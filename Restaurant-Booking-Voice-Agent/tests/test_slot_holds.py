@@ -0,0 +1,136 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+import tracing
+from slot_holds import SlotHolds
+from slot_index import CapacityRules, SlotIndex
+
+DAY = date(2025, 10, 15)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _holds(path: str = ":memory:", capacity: int = 4, ttl: float = 60, clock=None):
+    slots = SlotIndex(CapacityRules(guests_per_slot=capacity, seating_minutes=90))
+    clock = clock or _Clock()
+    return SlotHolds(slots, path, ttl=ttl, clock=clock), slots, clock
+
+
+@pytest.mark.asyncio
+async def test_hold_takes_the_seats_and_counts_contention() -> None:
+    holds, slots, _ = _holds()
+    try:
+        hold = await holds.place(DAY, 19 * 60, 3)
+
+        assert hold is not None and holds.held_guests() == 3
+        assert slots.remaining(DAY, 19 * 60) == 1
+        # Another caller asking for an overlapping seating is refused while held
+        assert await holds.place(DAY, 19 * 60 + 30, 2) is None
+        assert holds.events["contended"] == 1
+        # A closed hour is not contention
+        assert await holds.place(DAY, 6 * 60, 2) is None
+        assert holds.events["contended"] == 1
+
+        await holds.release(hold)
+        await holds.release(hold)
+        assert slots.remaining(DAY, 19 * 60) == 4 and len(holds) == 0
+    finally:
+        await holds.aclose()
+
+
+@pytest.mark.asyncio
+async def test_expired_holds_are_swept_unless_claimed() -> None:
+    holds, slots, clock = _holds(ttl=60)
+    try:
+        abandoned = await holds.place(DAY, 12 * 60, 2)
+        booking = await holds.place(DAY, 19 * 60, 2)
+        assert await holds.claim(booking)
+
+        clock.now = 61
+        assert not holds.active(abandoned)
+        assert await holds.sweep() == 1
+        assert holds.events["expired"] == 1
+        assert slots.remaining(DAY, 12 * 60) == 4
+        assert holds.active(booking) and slots.remaining(DAY, 19 * 60) == 2
+        assert not await holds.claim(abandoned)
+    finally:
+        await holds.aclose()
+
+
+@pytest.mark.asyncio
+async def test_convert_keeps_the_seats_taken() -> None:
+    holds, slots, _ = _holds()
+    try:
+        hold = await holds.place(DAY, 19 * 60, 4)
+
+        await holds.convert(hold, "A7K2P")
+        assert len(holds) == 0 and holds.events["converted"] == 1
+        assert slots.remaining(DAY, 19 * 60) == 0
+        slots.remove("A7K2P")
+        assert slots.remaining(DAY, 19 * 60) == 4
+    finally:
+        await holds.aclose()
+
+
+@pytest.mark.asyncio
+async def test_calls_in_other_processes_see_each_others_holds(tmp_path) -> None:
+    # Each call has its own slot index; they only share the outbox journal
+    path = str(tmp_path / "booking_outbox.db")
+    clock = _Clock()
+    first, first_slots, _ = _holds(path, clock=clock)
+    second, second_slots, _ = _holds(path, clock=clock)
+    try:
+        hold = await first.place(DAY, 19 * 60, 3)
+        assert hold is not None
+
+        assert await second.place(DAY, 19 * 60, 2) is None
+        assert second.events["contended"] == 1
+        assert second_slots.remaining(DAY, 19 * 60) == 1
+        assert await second.place(DAY, 19 * 60, 1) is not None
+
+        # Once booked, the seats stay taken for the other call
+        assert await first.claim(hold)
+        await first.convert(hold, "A7K2P")
+        await second.sweep()
+        assert second_slots.remaining(DAY, 19 * 60) == 0
+        clock.now = 61
+        await second.sweep()
+        assert "A7K2P" in second_slots and "A7K2P" in first_slots
+
+        # An abandoned hold frees its seats everywhere once it expires
+        third, _, _ = _holds(path, clock=clock)
+        try:
+            assert await third.place(DAY, 12 * 60, 4) is not None
+            assert await first.place(DAY, 12 * 60, 1) is None
+            clock.now = 122
+            assert await first.place(DAY, 12 * 60, 4) is not None
+        finally:
+            await third.aclose()
+    finally:
+        await first.aclose()
+        await second.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sweeper_and_gauges() -> None:
+    slots = SlotIndex(CapacityRules(guests_per_slot=4, seating_minutes=90))
+    holds = SlotHolds(slots, ttl=0.05, sweep_interval=0.01, name="nord")
+    holds.start()
+    try:
+        await holds.place(DAY, 19 * 60, 3)
+        rendered = tracing.REGISTRY.render()
+        assert 'agent_slot_holds_active{tenant="nord",unit="guests"} 3' in rendered
+        await asyncio.sleep(0.1)
+        assert len(holds) == 0 and holds.events["expired"] == 1
+        assert 'agent_slot_hold_events{event="expired",tenant="nord"} 1' in tracing.REGISTRY.render()
+    finally:
+        await holds.aclose()
+    assert "agent_slot_holds_active" not in tracing.REGISTRY.render()
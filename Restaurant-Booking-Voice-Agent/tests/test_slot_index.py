@@ -0,0 +1,186 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from slot_index import CapacityRules, SlotIndex, parse_airtable_fields
+
+DAY = date(2025, 10, 15)
+
+
+def _index(capacity: int = 10) -> SlotIndex:
+    return SlotIndex(CapacityRules(guests_per_slot=capacity, seating_minutes=90))
+
+
+def test_reservation_occupies_its_seating_window() -> None:
+    index = _index()
+    index.add("A7K2P", DAY, 19 * 60, 6)
+
+    assert index.remaining(DAY, 19 * 60) == 4
+    # A 20:00 arrival overlaps the 19:00 seating, 20:30 does not
+    assert index.remaining(DAY, 20 * 60) == 4
+    assert index.remaining(DAY, 20 * 60 + 30) == 10
+    # An 18:00 seating runs into the 19:00 one
+    assert not index.available(DAY, 18 * 60, 5)
+    assert index.available(DAY, 18 * 60, 4)
+
+
+def test_readding_and_removing_keep_counts_consistent() -> None:
+    index = _index()
+    index.add("A7K2P", DAY, 19 * 60, 6)
+    index.add("A7K2P", DAY, 12 * 60, 2)
+    assert index.remaining(DAY, 19 * 60) == 10
+    assert index.remaining(DAY, 12 * 60) == 8
+
+    index.remove("A7K2P")
+    index.remove("A7K2P")
+    assert index.remaining(DAY, 12 * 60) == 10
+
+
+def test_suggests_nearest_free_slots() -> None:
+    index = _index(capacity=4)
+    index.add("A", DAY, 19 * 60, 4)
+
+    assert not index.available(DAY, 19 * 60, 2)
+    assert index.suggest(DAY, 19 * 60, 2, limit=2) == [17 * 60 + 30, 20 * 60 + 30]
+
+
+def test_closed_hours_are_not_bookable() -> None:
+    index = _index()
+    assert not index.available(DAY, 6 * 60, 2)
+    assert not index.available(DAY, 23 * 60, 2)
+
+
+def test_parses_airtable_rows() -> None:
+    fields = {
+        "Reservation ID": "A7K2P",
+        "Reservation Date": "2025-10-15",
+        "Reservation Time": "19:00",
+        "Reservation Summary": "4 guests. Birthday dinner",
+    }
+    assert parse_airtable_fields(fields) == ("A7K2P", DAY, 19 * 60, 4)
+    assert parse_airtable_fields({"Reservation ID": "X"}) is None
+
+
+class _SlowAirtable:
+    """Answers a direct read of one day at once; the warm-up read takes `delay` seconds."""
+
+    configured = True
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.formulas: list[str] = []
+
+    async def iterate(self, *, formula=None, fields=None, page_size=100):
+        self.formulas.append(formula)
+        if "IS_SAME" not in formula:
+            await asyncio.sleep(self.delay)
+        yield [{"fields": {
+            "Reservation ID": "A7K2P",
+            "Reservation Date": "2025-10-15",
+            "Reservation Time": "19:00",
+            "Reservation Summary": "8 guests",
+        }}]
+
+
+@pytest.mark.asyncio
+async def test_ready_waits_for_the_warm_up() -> None:
+    index = _index()
+    airtable = _SlowAirtable(delay=0.01)
+    index.start(airtable, interval=60)
+    try:
+        await index.ready(DAY, timeout=5)
+        assert index.remaining(DAY, 19 * 60) == 2
+        assert not any("IS_SAME" in formula for formula in airtable.formulas)
+    finally:
+        index.stop()
+
+
+@pytest.mark.asyncio
+async def test_ready_reads_the_day_directly_when_the_warm_up_is_slow() -> None:
+    index = _index()
+    airtable = _SlowAirtable(delay=10)
+    index.start(airtable, interval=60)
+    try:
+        await index.ready(DAY, timeout=0.01)
+        assert index.remaining(DAY, 19 * 60) == 2
+        assert "IS_SAME({Reservation Date}, '2025-10-15', 'day')" in airtable.formulas
+        # The day is not read again
+        await index.ready(DAY, timeout=0.01)
+        assert len(airtable.formulas) == 2
+    finally:
+        index.stop()
+
+
+@pytest.mark.asyncio
+async def test_ready_returns_at_once_without_airtable() -> None:
+    await _index().ready(DAY, timeout=10)
+
+
+class _Table:
+    """Upcoming rows on a full read; nothing changed on a modified-time read."""
+
+    configured = True
+
+    def __init__(self, rows: list[dict]) -> None:
+        self.rows = rows
+
+    async def iterate(self, *, formula=None, fields=None, page_size=100):
+        yield [] if "LAST_MODIFIED_TIME" in formula else [{"fields": fields} for fields in self.rows]
+
+
+@pytest.mark.asyncio
+async def test_full_refresh_drops_rows_deleted_in_airtable() -> None:
+    day = date.today() + timedelta(days=3)
+    row = {
+        "Reservation ID": "A7K2P",
+        "Reservation Date": day.isoformat(),
+        "Reservation Time": "19:00",
+        "Reservation Summary": "8 guests",
+    }
+    table = _Table([row, {**row, "Reservation ID": "B8M3Q", "Reservation Time": "12:00"}])
+    index = _index()
+    # Booked in this call, not sent to Airtable yet
+    index.add("C9N4R", day, 19 * 60, 1)
+
+    await index.refresh(table)
+    assert index.remaining(day, 19 * 60) == 1 and index.remaining(day, 12 * 60) == 2
+
+    table.rows = [row]
+    await index.refresh(table)
+    assert "B8M3Q" in index
+    await index.refresh(table, full=True)
+    assert "B8M3Q" not in index and index.remaining(day, 12 * 60) == 10
+    assert "A7K2P" in index and "C9N4R" in index
+
+
+class _DownAirtable:
+    configured = True
+
+    def __init__(self) -> None:
+        self.reads = 0
+
+    async def iterate(self, *, formula=None, fields=None, page_size=100):
+        self.reads += 1
+        raise ConnectionError("Airtable unreachable")
+        yield []
+
+
+@pytest.mark.asyncio
+async def test_unreachable_airtable_is_not_waited_for_again() -> None:
+    index = _index()
+    airtable = _DownAirtable()
+    index._airtable = airtable
+    # The warm-up is still running: the first answer reads the day and fails
+    with pytest.raises(ConnectionError):
+        await index.ready(DAY, timeout=0.01)
+    await asyncio.wait_for(index.ready(DAY + timedelta(days=1), timeout=5), 0.1)
+    assert airtable.reads == 1
+
+    # A failed warm-up wakes the answers waiting for it
+    index = _index()
+    index.start(airtable, interval=60)
+    try:
+        await asyncio.wait_for(index.ready(DAY, timeout=5), 0.5)
+    finally:
+        index.stop()
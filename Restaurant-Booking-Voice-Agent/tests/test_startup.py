@@ -0,0 +1,39 @@
+import logging
+import time
+
+import tracing
+from startup import StartupTimer, process_started_at
+
+
+def test_phases_accumulate_and_reach_metrics():
+    timer = StartupTimer(started_at=time.time())
+    with timer.phase("prewarm.vad"):
+        pass
+    timer.record("import.app", 0.25)
+    timer.record("import.app", 0.25)
+
+    assert timer.phases["import.app"] == 0.5
+    assert "prewarm.vad" in timer.phases
+    assert tracing.REGISTRY.percentiles("startup.import.app")
+
+
+def test_first_call_reports_breakdown_once(monkeypatch, caplog):
+    monkeypatch.setenv("WORKER_STARTED_AT", str(time.time() - 3))
+    timer = StartupTimer.from_env()
+    timer.record("prewarm.vad", 0.1)
+
+    with caplog.at_level(logging.INFO, logger="agent.startup"):
+        timer.call_answered(0.4)
+        timer.call_answered(0.2)
+
+    assert 3 <= timer.first_call < 10
+    assert timer.phases["call_setup"] == 0.4
+    reports = [r.getMessage() for r in caplog.records if "worker start to first call" in r.getMessage()]
+    assert len(reports) == 1
+    assert "prewarm.vad 0.10s, call_setup 0.40s" in reports[0]
+
+
+def test_falls_back_to_process_start(monkeypatch):
+    monkeypatch.delenv("WORKER_STARTED_AT", raising=False)
+    started_at = StartupTimer.from_env().started_at
+    assert started_at == process_started_at() <= time.time()
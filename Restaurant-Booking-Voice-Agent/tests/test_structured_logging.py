@@ -0,0 +1,105 @@
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueListener
+
+from structured_logging import (
+    REDACTED,
+    JsonFormatter,
+    Redactor,
+    _ContextQueueHandler,
+    _Forward,
+    bind_log_fields,
+    parse_levels,
+)
+
+
+class _Capture(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+class _FormattedOn:
+    """Records which thread turned it into a string."""
+
+    def __init__(self) -> None:
+        self.thread: str | None = None
+
+    def __str__(self) -> str:
+        self.thread = threading.current_thread().name
+        return "value"
+
+
+def test_redacts_env_secrets_and_token_patterns() -> None:
+    redact = Redactor(["patAbCdEf12345678.secretsecretsecretsecret", "short"])
+    text = redact(
+        "token=patAbCdEf12345678.secretsecretsecretsecret "
+        "auth=Bearer abc.def-123 key=sk-proj-aaaaaaaaaaaaaaaaaaaaaaaa short"
+    )
+    assert "secret" not in text
+    assert "abc.def-123" not in text
+    assert "sk-proj" not in text
+    assert text.count(REDACTED) == 3
+    # Too short to redact safely
+    assert "short" in text
+
+
+def test_records_are_formatted_off_the_calling_thread_with_context_fields() -> None:
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    capture = _Capture()
+    capture.setFormatter(JsonFormatter(Redactor(["AIRTABLE-SECRET-VALUE"])))
+    listener = QueueListener(records, capture)
+    listener.start()
+
+    logger = logging.getLogger("agent.test_structured_logging")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = _ContextQueueHandler(records)
+    logger.addHandler(handler)
+    try:
+        value = _FormattedOn()
+        bind_log_fields(reservation_id="A7K2P")
+        logger.info("booked %s with AIRTABLE-SECRET-VALUE", value, extra={"room": "room-1"})
+        listener.stop()
+    finally:
+        logger.removeHandler(handler)
+
+    assert value.thread is not None and value.thread != threading.current_thread().name
+    entry = json.loads(capture.lines[0])
+    assert entry["msg"] == f"booked value with {REDACTED}"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "agent.test_structured_logging"
+    assert entry["room"] == "room-1"
+    assert entry["reservation_id"] == "A7K2P"
+
+
+def test_redacted_records_go_to_the_root_handlers(monkeypatch) -> None:
+    root_capture = _Capture()
+    own_output = _Capture()
+    forward = _Forward(Redactor(["AIRTABLE-SECRET-VALUE"]), own_output)
+    record = logging.LogRecord(
+        "agent.test", logging.INFO, __file__, 1, "token %s", ("AIRTABLE-SECRET-VALUE",), None
+    )
+
+    # A job process: LiveKit's handler on the root logger gets the record
+    monkeypatch.setattr(logging.getLogger(), "handlers", [root_capture])
+    forward.handle(record)
+    assert root_capture.lines == [f"token {REDACTED}"]
+    assert own_output.lines == []
+
+    # Nothing on the root logger: the agent writes the line itself
+    monkeypatch.setattr(logging.getLogger(), "handlers", [])
+    forward.handle(record)
+    assert own_output.lines == ["token AIRTABLE-SECRET-VALUE"]
+
+
+def test_parse_levels() -> None:
+    assert parse_levels("agent.webhook=debug, agent.slots=WARNING,,bad") == {
+        "agent.webhook": "DEBUG",
+        "agent.slots": "WARNING",
+    }
@@ -0,0 +1,90 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from datetime_parser import restaurant_now
+from reservation_store import Reservation
+from tenants import DEFAULT_TENANT, TenantRegistry, UnknownTenantError
+
+
+class _FakeResources:
+    def __init__(self, config) -> None:
+        self.config = config
+        self.leases = 0
+        self.closed = False
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        self.closed = True
+
+
+def _write(directory, tenant_id: str, data: dict) -> None:
+    (directory / f"{tenant_id}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+@pytest.mark.asyncio
+async def test_tenant_file_overlays_environment_defaults(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("TTS_VOICE", "alloy")
+    _write(tmp_path, "nord", {"restaurant_name": "Trattoria Nord", "capacity": {"guests_per_slot": 12}})
+    registry = TenantRegistry(str(tmp_path), build=_FakeResources)
+
+    nord = await registry.acquire("nord")
+    assert nord.config.restaurant_name == "Trattoria Nord"
+    assert nord.config.capacity.guests_per_slot == 12
+    assert nord.config.tts_voice == "alloy"
+    assert nord.config.outbox_path == "var/tenants/nord/booking_outbox.db"
+    assert nord.config.info_path == str(tmp_path / "nord.info.json")
+
+    # Rooms without a tenant get the environment-configured restaurant
+    default = await registry.acquire(None)
+    assert default.config.tenant_id == DEFAULT_TENANT
+    assert default.config.outbox_path is None
+    assert default.config.info_path is None
+
+    # Same tenant, same warm resources
+    assert await registry.acquire("nord") is nord
+    assert nord.leases == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tenant_id", ["missing", "../etc/passwd"])
+async def test_unknown_tenant_is_rejected(tmp_path, tenant_id) -> None:
+    registry = TenantRegistry(str(tmp_path), build=_FakeResources)
+    with pytest.raises(UnknownTenantError):
+        await registry.acquire(tenant_id)
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_last_release_closes_and_next_call_rereads_the_file(tmp_path) -> None:
+    _write(tmp_path, "nord", {"tts_voice": "nova"})
+    registry = TenantRegistry(str(tmp_path), build=_FakeResources)
+
+    first = await registry.acquire("nord")
+    assert await registry.acquire("nord") is first
+    await registry.release(first)
+    assert not first.closed
+    await registry.release(first)
+    assert first.closed and len(registry) == 0
+
+    _write(tmp_path, "nord", {"tts_voice": "shimmer"})
+    second = await registry.acquire("nord")
+    assert second is not first and second.config.tts_voice == "shimmer"
+
+
+@pytest.mark.asyncio
+async def test_start_loads_journaled_bookings_into_the_slot_index(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv("AIRTABLE_API_TOKEN", raising=False)
+    _write(tmp_path, "nord", {"outbox_path": str(tmp_path / "outbox.db"), "reservation_ids_path": str(tmp_path / "ids.db")})
+    registry = TenantRegistry(str(tmp_path))
+    nord = await registry.acquire("nord")
+    try:
+        tomorrow = restaurant_now().date() + timedelta(days=1)
+        unsent = Reservation("A7K2P", "Ada", None, tomorrow, 19 * 60, 6)
+        await nord.outbox.enqueue(unsent.reservation_id, unsent.airtable_fields())
+
+        await nord.start(slot_refresh_interval=60)
+        assert "A7K2P" in nord.slots
+        assert nord.slots.remaining(tomorrow, 19 * 60) == nord.config.capacity.guests_per_slot - 6
+    finally:
+        await nord.aclose(timeout=0)
@@ -0,0 +1,43 @@
+from tracing import LatencyRegistry, bind_labels
+
+
+def test_percentiles_per_stage_and_label():
+    registry = LatencyRegistry()
+    for ms in range(1, 101):
+        registry.observe("book_table", ms / 1000, room="a", language="en")
+    registry.observe("book_table", 5.0, room="b", language="de")
+
+    p = registry.percentiles("book_table", room="a")
+    assert p[0.5] == 0.05
+    assert p[0.95] == 0.095
+    assert p[0.99] == 0.099
+    assert registry.percentiles("book_table", language="de") == {0.5: 5.0, 0.95: 5.0, 0.99: 5.0}
+    assert registry.percentiles("missing") == {}
+
+
+def test_span_uses_bound_labels():
+    registry = LatencyRegistry()
+    bind_labels(room="room-1", language="de")
+    with registry.span("book_table.parse"):
+        pass
+    with registry.span("airtable.batch_upsert", room="", language=""):
+        pass
+
+    text = registry.render()
+    assert '# TYPE agent_stage_latency_seconds summary' in text
+    assert 'agent_stage_latency_seconds_count{stage="book_table.parse",language="de",room="room-1"} 1' in text
+    assert 'agent_stage_latency_seconds_count{stage="airtable.batch_upsert",language="",room=""} 1' in text
+    assert 'quantile="0.99"' in text
+
+
+async def test_metrics_server_does_not_hop_to_another_port():
+    import socket
+
+    import tracing
+
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        assert await tracing.start_metrics_server(port) is None
+    assert tracing._runner is None
@@ -0,0 +1,74 @@
+import pytest
+from livekit import rtc
+
+from tts_cache import PhraseAudioCache
+
+PHRASE = "Thank you for calling! We look forward to seeing you. Goodbye!"
+
+
+def _frame(samples: int = 2400) -> rtc.AudioFrame:
+    return rtc.AudioFrame(
+        data=b"\x01\x00" * samples, sample_rate=24000, num_channels=1, samples_per_channel=samples
+    )
+
+
+class _FakeTTS:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def __call__(self, text: str):
+        self.calls.append(text)
+        yield _frame()
+        yield _frame()
+
+
+async def _speak(cache: PhraseAudioCache, tts: _FakeTTS, text: str = PHRASE) -> list[rtc.AudioFrame]:
+    return [frame async for frame in cache.speak("alloy", "en", text, tts)]
+
+
+@pytest.mark.asyncio
+async def test_phrase_is_written_through_then_served_from_cache(tmp_path) -> None:
+    cache = PhraseAudioCache(str(tmp_path))
+    tts = _FakeTTS()
+
+    first = await _speak(cache, tts)
+    assert len(first) == 2
+    assert tts.calls == [PHRASE]
+
+    second = await _speak(cache, tts)
+    assert len(tts.calls) == 1
+    assert sum(f.samples_per_channel for f in second) == 4800
+
+    # A fresh process finds the audio on disk
+    reloaded = PhraseAudioCache(str(tmp_path))
+    reloaded.load()
+    await _speak(reloaded, tts)
+    assert len(tts.calls) == 1
+    assert reloaded.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_interrupted_phrase_is_not_cached(tmp_path) -> None:
+    cache = PhraseAudioCache(str(tmp_path))
+    tts = _FakeTTS()
+
+    audio = cache.speak("alloy", "en", PHRASE, tts)
+    await audio.__anext__()
+    await audio.aclose()
+    assert list(tmp_path.iterdir()) == []
+
+    await _speak(cache, tts)
+    assert tts.calls == [PHRASE, PHRASE]
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(tmp_path) -> None:
+    cache = PhraseAudioCache(str(tmp_path), max_bytes=12000)
+    await cache.put("alloy", "en", "one", [_frame()])
+    await cache.put("alloy", "en", "two", [_frame()])
+    assert await cache.get("alloy", "en", "one") is not None
+    await cache.put("alloy", "en", "three", [_frame()])
+
+    assert await cache.get("alloy", "en", "two") is None
+    assert await cache.get("alloy", "en", "one") is not None
+    assert len(list(tmp_path.glob("*.wav"))) == 2
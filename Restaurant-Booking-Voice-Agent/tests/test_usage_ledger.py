@@ -0,0 +1,88 @@
+import sqlite3
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from livekit.agents.metrics import LLMMetrics, STTMetrics, TTSMetrics
+
+from usage_ledger import Prices, SessionUsage, UsageLedger, UsageTotals, main
+
+BERLIN = ZoneInfo("Europe/Berlin")
+
+
+def _at(day: date, hour: int) -> float:
+    return datetime(day.year, day.month, day.day, hour, 15, tzinfo=BERLIN).timestamp()
+
+
+def _usage(room: str, language: str, started_at: float, prompt_tokens: int = 1000) -> SessionUsage:
+    usage = SessionUsage("default", room, language, started_at=started_at)
+    usage.collect(LLMMetrics(
+        label="llm", request_id="r1", timestamp=started_at, duration=0.8, ttft=0.3, cancelled=False,
+        completion_tokens=100, prompt_tokens=prompt_tokens, prompt_cached_tokens=400,
+        total_tokens=prompt_tokens + 100, tokens_per_second=50.0,
+    ))
+    usage.collect(TTSMetrics(
+        label="tts", request_id="r2", timestamp=started_at, ttfb=0.2, duration=1.0, audio_duration=30.0,
+        cancelled=False, characters_count=400, streamed=True,
+    ))
+    usage.collect(STTMetrics(
+        label="stt", request_id="r3", timestamp=started_at, duration=0.5, audio_duration=60.0, streamed=True,
+    ))
+    return usage
+
+
+def test_collects_totals_and_turns():
+    usage = _usage("room-1", "en", 0.0)
+    assert (usage.llm_prompt_tokens, usage.llm_cached_tokens, usage.llm_completion_tokens) == (1000, 400, 100)
+    assert (usage.tts_characters, usage.tts_audio_seconds, usage.stt_audio_seconds) == (400, 30.0, 60.0)
+    assert [turn[0] for turn in usage.turns] == ["llm", "tts", "stt"]
+
+
+def test_cost_bills_cached_tokens_at_the_cached_rate():
+    totals = UsageTotals(llm_prompt_tokens=1_000_000, llm_cached_tokens=400_000, llm_completion_tokens=100_000,
+                         stt_audio_seconds=600, tts_audio_seconds=120)
+    prices = Prices(llm_input_per_m=1.0, llm_cached_per_m=0.5, llm_output_per_m=2.0, stt_per_minute=0.01,
+                    tts_per_minute=0.1)
+    assert totals.cost(prices) == pytest.approx(0.6 + 0.2 + 0.2 + 0.1 + 0.2)
+
+
+@pytest.mark.asyncio
+async def test_partitions_by_local_day_and_aggregates(tmp_path):
+    ledger = UsageLedger(str(tmp_path), tz="Europe/Berlin")
+    day1, day2 = date(2026, 9, 30), date(2026, 10, 1)
+    try:
+        await ledger.append(_usage("a", "en", _at(day1, 19)), outcome="booked", bookings=1)
+        await ledger.append(_usage("b", "de", _at(day1, 12)), outcome="none")
+        # 00:15 in Berlin is still the previous day in UTC; the restaurant's date wins
+        await ledger.append(_usage("c", "de", _at(day2, 0), prompt_tokens=2000), outcome="booked", bookings=2)
+    finally:
+        await ledger.aclose()
+
+    assert [day for day, _ in ledger.partitions()] == ["2026-09-30", "2026-10-01"]
+    conn = sqlite3.connect(ledger.path("2026-09-30"))
+    assert conn.execute("SELECT COUNT(*) FROM turns WHERE room = 'a'").fetchone() == (3,)
+    conn.close()
+
+    by_language = ledger.aggregate("language")
+    assert by_language["de"].sessions == 2 and by_language["de"].bookings == 2
+    assert by_language["de"].llm_prompt_tokens == 3000
+    assert {hour: t.sessions for hour, t in ledger.aggregate("hour").items()} == {0: 1, 12: 1, 19: 1}
+    assert ledger.aggregate("outcome")["booked"].bookings == 3
+    assert list(ledger.aggregate("day", start=day2)) == ["2026-10-01"]
+    assert ledger.aggregate("tenant", tenant="nord") == {}
+    with pytest.raises(ValueError):
+        ledger.aggregate("room")
+
+
+@pytest.mark.asyncio
+async def test_report_cli(tmp_path, capsys):
+    ledger = UsageLedger(str(tmp_path))
+    try:
+        await ledger.append(_usage("a", "en", _at(date(2026, 10, 1), 19)), outcome="booked", bookings=1)
+    finally:
+        await ledger.aclose()
+
+    assert main(["report", "--by", "language", "--dir", str(tmp_path), "--from", "2026-10-01"]) == 0
+    out = capsys.readouterr().out
+    assert out.splitlines()[1].split()[:3] == ["en", "1", "1"]
+    assert "total" in out and "(1 calls in" in out
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from webhook_dispatcher import WebhookDispatcher
+
+
+async def _start_server(received: list, *, status: int = 200, delay: float = 0.0):
+    async def hook(request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        received.append(await request.json())
+        return web.json_response({"ok": True}, status=status)
+
+    app = web.Application()
+    app.router.add_post("/webhook/restaurant-booking", hook)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_immediately_and_drain_delivers(tmp_path) -> None:
+    received: list = []
+    server = await _start_server(received, delay=0.05)
+    dispatcher = WebhookDispatcher(
+        str(server.make_url("/webhook/restaurant-booking")),
+        dead_letter_path=str(tmp_path / "dead.jsonl"),
+    )
+    try:
+        for i in range(5):
+            assert dispatcher.submit({"reservationId": f"R{i}"})
+        assert received == []
+
+        await dispatcher.drain(timeout=5)
+        assert sorted(e["reservationId"] for e in received) == [f"R{i}" for i in range(5)]
+        assert not (tmp_path / "dead.jsonl").exists()
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_batched_mode_coalesces_events(tmp_path) -> None:
+    received: list = []
+    server = await _start_server(received)
+    dispatcher = WebhookDispatcher(
+        str(server.make_url("/webhook/restaurant-booking")),
+        workers=1,
+        batch_size=10,
+        batch_window=0.2,
+        dead_letter_path=str(tmp_path / "dead.jsonl"),
+    )
+    try:
+        for i in range(4):
+            dispatcher.submit({"reservationId": f"R{i}"})
+        await dispatcher.drain(timeout=5)
+        assert len(received) == 1
+        assert len(received[0]["events"]) == 4
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_dead_lettered(tmp_path) -> None:
+    received: list = []
+    server = await _start_server(received, status=400)
+    dead_letter = tmp_path / "dead.jsonl"
+    dispatcher = WebhookDispatcher(
+        str(server.make_url("/webhook/restaurant-booking")),
+        dead_letter_path=str(dead_letter),
+    )
+    try:
+        dispatcher.submit({"reservationId": "A7K2P"})
+        await dispatcher.drain(timeout=5)
+        # 4xx is not retried
+        assert len(received) == 1
+        entry = json.loads(dead_letter.read_text().splitlines()[0])
+        assert entry["event"]["reservationId"] == "A7K2P"
+        assert entry["error"].startswith("HTTP 400")
+    finally:
+        await server.close()